@@ -0,0 +1,122 @@
+import itertools
+import time
+from threading import Lock
+
+from PluginSheldonVision.Constants import ADAPTIVE_STREAM_MIN_JPEG_QUALITY, ADAPTIVE_STREAM_MAX_JPEG_QUALITY, \
+    ADAPTIVE_STREAM_JPEG_QUALITY_STEP, ADAPTIVE_STREAM_MIN_SCALE, ADAPTIVE_STREAM_SCALE_STEP, ADAPTIVE_STREAM_RECOVERY_FRAMES
+
+FPS_SMOOTHING_FACTOR = 0.1
+
+
+class AdaptiveStreamController:
+    """
+    Track how fast a single MJPEG client consumes frames and adapt the stream to it.
+    A client which falls behind (frames had to be skipped to send the newest one) first gets a lower JPEG quality and then a
+    lower resolution, within the configured bounds. Both are restored step by step once the client keeps up again.
+    """
+
+    def __init__(self, name: str, is_adaptive: bool = True, min_quality: int = ADAPTIVE_STREAM_MIN_JPEG_QUALITY,
+                 max_quality: int = ADAPTIVE_STREAM_MAX_JPEG_QUALITY, quality_step: int = ADAPTIVE_STREAM_JPEG_QUALITY_STEP,
+                 min_scale: float = ADAPTIVE_STREAM_MIN_SCALE, scale_step: float = ADAPTIVE_STREAM_SCALE_STEP,
+                 recovery_frames: int = ADAPTIVE_STREAM_RECOVERY_FRAMES):
+        """
+        :param name: Stream name, reported on the stream stats
+        :param is_adaptive: Adapt quality and resolution, otherwise only measure the stream
+        :param recovery_frames: Number of frames sent without skipping before quality or resolution are raised a step
+        """
+        self.name = name
+        self.is_adaptive = is_adaptive
+        self.__min_quality = min_quality
+        self.__max_quality = max_quality
+        self.__quality_step = quality_step
+        self.__min_scale = min_scale
+        self.__scale_step = scale_step
+        self.__recovery_frames = recovery_frames
+        self.__quality = max_quality
+        self.__scale = 1.0
+        self.__frames_without_skip = 0
+        self.__last_sent_time: float | None = None
+        self.__average_interval_seconds: float | None = None
+        self.sent_count = 0
+        self.skipped_count = 0
+
+    @property
+    def jpeg_quality(self) -> int | None:
+        """
+        :return: JPEG quality to encode with, None keeps the frames as rendered
+        """
+        return None if self.__quality >= self.__max_quality and self.__scale >= 1.0 else self.__quality
+
+    @property
+    def scale(self) -> float:
+        return self.__scale
+
+    def on_frame_received(self, skipped_frames: int) -> None:
+        """
+        :param skipped_frames: Number of stale frames skipped to get the newest frame
+        """
+        self.skipped_count += skipped_frames
+        if not self.is_adaptive:
+            return
+        if skipped_frames:
+            self.__frames_without_skip = 0
+            self.__degrade()
+            return
+        self.__frames_without_skip += 1
+        if self.__frames_without_skip >= self.__recovery_frames:
+            self.__frames_without_skip = 0
+            self.__recover()
+
+    def on_frame_sent(self) -> None:
+        now = time.perf_counter()
+        if self.__last_sent_time is not None:
+            interval_seconds = now - self.__last_sent_time
+            self.__average_interval_seconds = interval_seconds if self.__average_interval_seconds is None else \
+                (1 - FPS_SMOOTHING_FACTOR) * self.__average_interval_seconds + FPS_SMOOTHING_FACTOR * interval_seconds
+        self.__last_sent_time = now
+        self.sent_count += 1
+
+    def get_fps(self) -> float:
+        return 1 / self.__average_interval_seconds if self.__average_interval_seconds else 0.0
+
+    def __degrade(self) -> None:
+        if self.__quality > self.__min_quality:
+            self.__quality = max(self.__min_quality, self.__quality - self.__quality_step)
+        elif self.__scale > self.__min_scale:
+            self.__scale = max(self.__min_scale, self.__scale - self.__scale_step)
+
+    def __recover(self) -> None:
+        if self.__scale < 1.0:
+            self.__scale = min(1.0, self.__scale + self.__scale_step)
+        elif self.__quality < self.__max_quality:
+            self.__quality = min(self.__max_quality, self.__quality + self.__quality_step)
+
+    def get_stats(self) -> dict:
+        return {'name': self.name, 'adaptive': self.is_adaptive, 'fps': self.get_fps(), 'sent': self.sent_count,
+                'skipped': self.skipped_count, 'jpeg_quality': self.jpeg_quality or self.__max_quality, 'scale': self.__scale}
+
+
+class StreamClientsRegistry:
+    """
+    Active streaming clients, for reporting the effective fps of every stream
+    """
+
+    def __init__(self):
+        self.__clients: dict[int, AdaptiveStreamController] = {}
+        self.__ids = itertools.count(1)
+        self.__lock = Lock()
+
+    def register(self, client: AdaptiveStreamController) -> int:
+        with self.__lock:
+            client_id = next(self.__ids)
+            self.__clients[client_id] = client
+            return client_id
+
+    def unregister(self, client_id: int) -> None:
+        with self.__lock:
+            self.__clients.pop(client_id, None)
+
+    def get_stats(self) -> dict[str, dict]:
+        with self.__lock:
+            clients = dict(self.__clients)
+        return {f'{client.name}-{client_id}': client.get_stats() for client_id, client in clients.items()}
@@ -2,6 +2,7 @@ import inspect
 from enum import Enum
 
 PLUGIN_LOG_PATH = f"logs\\SheldonVisionUiPluginPy"
+VIDEO_CACHE_PATH = f"cache\\SheldonVisionUiPluginPy"
 DECIMATION_COLOR_OFF = '#71042F'
 DECIMATION_COLOR_ON = '#046816'
 NO_FRAME_SELECTED = [0, 0]
@@ -35,7 +36,38 @@ INDICATION_TEXT_STYLE = {"color": "lightgray", "font-size": "20px"}
 MARGIN_0_STYLE = {'margin': '0'}
 PLOT_WIDTH = 640
 PLOT_HEIGHT = 480
+PLOT_SIZE = (PLOT_WIDTH, PLOT_HEIGHT)
 DEFAULT_FPS = 30
+FRAMES_BUFFER_CAPACITY = 3 * DEFAULT_FPS
+FRAMES_CACHE_MAX_BYTES = 256 * 1024 * 1024
+OVERLAYS_CACHE_MAX_BYTES = 128 * 1024 * 1024
+OFFLINE_FIGURES_CACHE_MAX_BYTES = 64 * 1024 * 1024
+FRAME_IMAGES_CACHE_MAX_BYTES = 64 * 1024 * 1024
+PREFETCH_FRAMES_AHEAD = 10
+PREFETCH_FRAMES_BEHIND = 3
+PREFETCH_FRAME_TIMEOUT_SECONDS = 1
+FRAME_REQUEST_TIMEOUT_SECONDS = 2
+PLUGIN_REQUEST_TIMEOUT_SECONDS = 10
+DISPATCH_QUEUE_SIZE = 16
+SHARED_MEMORY_SLOTS_COUNT = 8
+SHARED_MEMORY_SLOT_SIZE = 8 * 1024 * 1024
+ADAPTIVE_STREAM_MIN_JPEG_QUALITY = 40
+ADAPTIVE_STREAM_MAX_JPEG_QUALITY = 75
+ADAPTIVE_STREAM_JPEG_QUALITY_STEP = 10
+ADAPTIVE_STREAM_MIN_SCALE = 0.5
+ADAPTIVE_STREAM_SCALE_STEP = 0.25
+ADAPTIVE_STREAM_RECOVERY_FRAMES = DEFAULT_FPS
+GOP_CACHE_SIZE = 2
+THUMBNAIL_SPRITE_MAX_THUMBNAILS = 200
+THUMBNAIL_SPRITE_COLUMNS = 10
+THUMBNAIL_WIDTH = 160
+THUMBNAIL_SPRITE_JPEG_QUALITY = 70
+STATIC_FRAME_FINGERPRINT_SIZE = 16
+STATIC_FRAME_DIFF_THRESHOLD = 2.0
+METRICS_LATENCY_BUCKETS_SECONDS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+METRICS_PERCENTILES_WINDOW = 1024
+RENDER_PIPELINE_THREADS = 4
+RENDER_PIPELINE_DEPTH = 4
 ONLINE_FONT_SIZE = 65
 JSON_SUFFIX = 'json'
 MP4_SUFFIX = '.mp4'
@@ -151,6 +183,12 @@ class PathStatus(Enum):
     Invalid = "Invalid"
 
 
+class FrameEncoding(Enum):
+    Jpeg = "jpeg"
+    RawRgb = "raw_rgb"
+    RawBgr = "raw_bgr"
+
+
 # SheldonVisionUI plugin input types
 CAMERA_FRAMES_MESSAGE_TYPE = f"CameraFrame"
 GET_TOTAL_VIDEO_FRAMES_MSG_NAME = "GetTotalVideoFrames"
@@ -159,6 +197,7 @@ FPS_STATUS_MESSAGE = "FpsStatus"
 FINISH_UPLOAD_FILE_MSG_TYPE = "FinishedUploadBlob"
 FINISH_DOWNLOAD_FILE_MSG_TYPE = "FinishedDownloadBlob"
 FILES_LIST_IN_BLOB_RESPONSE = "FilesListInBlobResponse"
+SHARED_MEMORY_FRAME_MESSAGE_TYPE = "SharedMemoryFrame"
 
 
 # SheldonVisionUI plugin output types
@@ -195,6 +234,7 @@ URI_INPUT_ID = "URIInput"
 PAUSE_BUTTON_ID = "PauseButton"
 FAST_BACK_BUTTON_ID = "FastBackButton"
 SLIDER_INTERVAL_ID = "SliderInterval"
+FRAME_STREAM_NUMBER_LABEL_ID = "FrameStreamNumberLabel"
 VIDEO_LOADED_FILES_LIST_ID = "VideoLoadedFilesList"
 METADATA_LOADED_FILES_LIST_ID = "MetadataLoadedFilesList"
 METADATA_SECONDARY_LOADED_FILES_LIST_ID = "MetadataLoadedFilesListSecondary"
@@ -1,3 +1,7 @@
 
 class FrameRangeNotValid(Exception):
+    pass
+
+
+class FrameOverwritten(Exception):
     pass
\ No newline at end of file
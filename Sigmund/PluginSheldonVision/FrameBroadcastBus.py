@@ -0,0 +1,64 @@
+from threading import Lock
+
+from PluginSheldonVision.Constants import FRAMES_BUFFER_CAPACITY
+from PluginSheldonVision.FramesRingBuffer import FramesRingBuffer
+
+
+class FrameSubscription(FramesRingBuffer):
+    """
+    A single viewer cursor on the frames bus, frames are consumed with get() like any FramesRingBuffer
+    """
+
+    def __init__(self, name: str, backlog: int):
+        FramesRingBuffer.__init__(self, backlog)
+        self.name = name
+
+
+class FrameBroadcastBus:
+    """
+    Fan out every received frame to all subscribed viewers.
+    Each subscriber has its own bounded backlog, so a slow viewer drops its own oldest frames without stalling the others.
+    The same frame object is handed to all subscribers, frames are never copied by the bus.
+    """
+
+    def __init__(self, subscriber_backlog: int = FRAMES_BUFFER_CAPACITY):
+        self.__subscriber_backlog = subscriber_backlog
+        self.__subscriptions: list[FrameSubscription] = []
+        self.__lock = Lock()
+        self.published_count = 0
+
+    def set_subscriber_backlog(self, subscriber_backlog: int) -> None:
+        with self.__lock:
+            self.__subscriber_backlog = subscriber_backlog
+            subscriptions = list(self.__subscriptions)
+        for subscription in subscriptions:
+            subscription.set_capacity(subscriber_backlog)
+
+    def subscribe(self, name: str, backlog: int | None = None) -> FrameSubscription:
+        subscription = FrameSubscription(name, backlog or self.__subscriber_backlog)
+        with self.__lock:
+            self.__subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: FrameSubscription) -> None:
+        with self.__lock:
+            if subscription in self.__subscriptions:
+                self.__subscriptions.remove(subscription)
+
+    def publish(self, frame, frame_number: int) -> None:
+        with self.__lock:
+            subscriptions = list(self.__subscriptions)
+            self.published_count += 1
+        for subscription in subscriptions:
+            subscription.put(frame, frame_number)
+
+    def clear(self) -> None:
+        with self.__lock:
+            subscriptions = list(self.__subscriptions)
+        for subscription in subscriptions:
+            subscription.clear()
+
+    def get_subscribers_counters(self) -> dict[str, dict[str, int]]:
+        with self.__lock:
+            subscriptions = list(self.__subscriptions)
+        return {f'{subscription.name}-{index}': subscription.get_counters() for index, subscription in enumerate(subscriptions)}
@@ -0,0 +1,84 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Hashable
+
+from PluginSheldonVision.Constants import FRAMES_CACHE_MAX_BYTES
+
+
+class FrameCache:
+    """
+    Thread safe LRU cache of frames, keyed by (video path, frame number).
+    The cache is bounded by the total size of the cached values, least recently used entries are evicted first.
+    """
+
+    def __init__(self, max_bytes: int = FRAMES_CACHE_MAX_BYTES, size_of: Callable[[object], int] = len):
+        self.__max_bytes = max_bytes
+        self.__size_of = size_of
+        self.__entries: OrderedDict[Hashable, tuple[object, int]] = OrderedDict()
+        self.__lock = Lock()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable):
+        """
+        :param key: Cache key, usually (video path, frame number)
+        :return: The cached value or None on a cache miss
+        """
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.__entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value) -> None:
+        value_size = self.__size_of(value)
+        if value_size > self.__max_bytes:
+            return
+        with self.__lock:
+            previous_entry = self.__entries.pop(key, None)
+            if previous_entry is not None:
+                self.size_bytes -= previous_entry[1]
+            self.__entries[key] = (value, value_size)
+            self.size_bytes += value_size
+            while self.size_bytes > self.__max_bytes:
+                _, (_, evicted_size) = self.__entries.popitem(last=False)
+                self.size_bytes -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """
+        Remove all entries which their key matches the given predicate
+        :return: Number of removed entries
+        """
+        with self.__lock:
+            keys_to_remove = [key for key in self.__entries if predicate(key)]
+            for key in keys_to_remove:
+                self.size_bytes -= self.__entries.pop(key)[1]
+            return len(keys_to_remove)
+
+    def invalidate_video(self, video_path: str) -> int:
+        return self.invalidate(lambda key: key[0] == video_path)
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__entries.clear()
+            self.size_bytes = 0
+
+    def __len__(self) -> int:
+        with self.__lock:
+            return len(self.__entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self.__lock:
+            return key in self.__entries
+
+    def get_stats(self) -> dict[str, int | float]:
+        with self.__lock:
+            lookups = self.hits + self.misses
+            return {'entries': len(self.__entries), 'size_bytes': self.size_bytes, 'max_bytes': self.__max_bytes, 'hits': self.hits,
+                    'misses': self.misses, 'evictions': self.evictions, 'hit_rate': self.hits / lookups if lookups else 0.0}
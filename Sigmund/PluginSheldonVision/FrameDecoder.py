@@ -0,0 +1,141 @@
+import base64
+import io
+
+import numpy as np
+from PIL import Image
+
+from PluginSheldonVision.Constants import FrameEncoding
+from PluginSheldonVision.SharedMemoryFrames import SharedMemoryFrame
+
+JPEG_FORMAT = 'JPEG'
+JPEG_DATA_URI_PREFIX = 'data:image/jpeg;base64,'
+RAW_FRAME_MODES = {1: 'L', 3: 'RGB', 4: 'RGBA'}
+
+
+class RawFrame:
+    """
+    Uncompressed frame pixels and their shape, carried through the pipeline instead of JPEG bytes.
+    The frame is encoded exactly once, when it leaves the UI.
+    """
+
+    def __init__(self, pixels: bytes | memoryview | np.ndarray, shape: tuple, encoding: str = FrameEncoding.RawRgb.value):
+        """
+        :param pixels: Row major pixels buffer, e.g. the BGR image array of an in process frame source
+        :param shape: (height, width) or (height, width, channels)
+        :param encoding: FrameEncoding.RawRgb or FrameEncoding.RawBgr
+        """
+        self.pixels = pixels
+        self.shape = tuple(shape)
+        self.encoding = encoding
+
+    @property
+    def width(self) -> int:
+        return self.shape[1]
+
+    @property
+    def height(self) -> int:
+        return self.shape[0]
+
+    @property
+    def channels(self) -> int:
+        return self.shape[2] if len(self.shape) > 2 else 1
+
+    def __len__(self) -> int:
+        return memoryview(self.pixels).nbytes
+
+    def to_image(self) -> Image.Image:
+        mode = RAW_FRAME_MODES[self.channels]
+        raw_mode = 'BGR' if self.encoding == FrameEncoding.RawBgr.value and mode == 'RGB' else mode
+        return Image.frombuffer(mode, (self.width, self.height), self.pixels, 'raw', raw_mode, 0, 1)
+
+    def to_rgb_array(self) -> np.ndarray:
+        """
+        :return: Writable RGB copy of a 3 channels frame, the frame itself may be cached and shown again
+        """
+        pixels = np.frombuffer(self.pixels, dtype=np.uint8).reshape(self.shape)
+        return pixels[..., ::-1].copy() if self.encoding == FrameEncoding.RawBgr.value else pixels.copy()
+
+
+def is_raw_frame(frame) -> bool:
+    return isinstance(frame, RawFrame)
+
+
+def is_shared_memory_frame(frame) -> bool:
+    return isinstance(frame, SharedMemoryFrame)
+
+
+def is_frame_valid(frame) -> bool:
+    """
+    :return: False if the frame is a shared memory frame which its slot was already overwritten
+    """
+    return not is_shared_memory_frame(frame) or frame.is_valid()
+
+
+def mapped_frame(frame: SharedMemoryFrame, frame_view: memoryview) -> memoryview | RawFrame:
+    """
+    :return: The encoded frame or the RawFrame on the mapped slot of a shared memory frame
+    """
+    if frame.descriptor.encoding == FrameEncoding.Jpeg.value:
+        return frame_view
+    return RawFrame(frame_view, frame.descriptor.shape, frame.descriptor.encoding)
+
+
+def fits_size(image: Image.Image, size: tuple[int, int] | None) -> bool:
+    return size is None or (image.width <= size[0] and image.height <= size[1])
+
+
+def decode_frame(frame: bytes | RawFrame | SharedMemoryFrame, size: tuple[int, int] | None = None) -> Image.Image:
+    """
+    :param size: Display size (width, height), larger frames are decoded straight to this size.
+                 A JPEG frame is downscaled by the decoder in the DCT domain before it's resized, so its full resolution is never decoded
+    :raise PIL.UnidentifiedImageError: if an encoded frame isn't a valid image
+    :raise FrameOverwritten: if a shared memory frame was overwritten before it was decoded
+    """
+    if is_shared_memory_frame(frame):
+        with frame.view() as frame_view:
+            image = decode_frame(mapped_frame(frame, frame_view), size)
+            image.load()
+            # An image sharing the slot memory would change with the slot, the slot is decoded into its own image
+            return image.copy() if image.readonly else image
+    image = frame.to_image() if is_raw_frame(frame) else Image.open(io.BytesIO(frame))
+    if fits_size(image, size):
+        return image
+    # Only the header was read so far, draft picks the smallest JPEG scale which is still at least the display size
+    image.draft(image.mode, size)
+    return image.resize(size, Image.BILINEAR)
+
+
+def encode_jpeg(image: Image.Image, quality: int | None = None, scale: float = 1.0) -> bytes:
+    """
+    :param quality: JPEG quality, None uses the PIL default quality
+    :param scale: Resize factor applied before encoding
+    """
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    if scale != 1.0:
+        image = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))), Image.BILINEAR)
+    buffer = io.BytesIO()
+    if quality is None:
+        image.save(buffer, format=JPEG_FORMAT)
+    else:
+        image.save(buffer, format=JPEG_FORMAT, quality=quality)
+    return buffer.getvalue()
+
+
+def frame_to_jpeg(frame: bytes | RawFrame | SharedMemoryFrame, size: tuple[int, int] | None = None) -> bytes:
+    """
+    Encoded frames are returned as is, so a JPEG frame is never decoded and encoded again, unless it's larger than the size
+    :param size: Display size (width, height), larger frames are downscaled to it
+    :raise FrameOverwritten: if a shared memory frame was overwritten before it was encoded
+    """
+    if is_shared_memory_frame(frame):
+        with frame.view() as frame_view:
+            return frame_to_jpeg(mapped_frame(frame, frame_view), size)
+    if is_raw_frame(frame) or (size is not None and not fits_size(Image.open(io.BytesIO(frame)), size)):
+        return encode_jpeg(decode_frame(frame, size))
+    # A JPEG frame mapped from the shared memory is copied once, to the output
+    return frame.tobytes() if isinstance(frame, memoryview) else frame
+
+
+def frame_to_data_uri(frame: bytes | RawFrame | SharedMemoryFrame, size: tuple[int, int] | None = None) -> str:
+    return JPEG_DATA_URI_PREFIX + base64.b64encode(frame_to_jpeg(frame, size)).decode('utf-8')
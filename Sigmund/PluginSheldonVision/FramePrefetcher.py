@@ -0,0 +1,116 @@
+import logging
+import traceback
+from threading import Condition, Thread
+from typing import Callable
+
+from PluginSheldonVision.Constants import PREFETCH_FRAMES_AHEAD, PREFETCH_FRAMES_BEHIND
+
+
+class FramePrefetcher:
+    """
+    Warm the frames cache around the displayed frame while the player is paused.
+    Frames in the stepping direction are fetched first, then frames behind the cursor.
+    The plan is rebuilt from the latest cursor before every fetch, so jumping elsewhere cancels the frames which are no longer
+    relevant and at most one already sent request is completed.
+    """
+
+    def __init__(self, fetch_frame: Callable[[int], bool], is_frame_cached: Callable[[int], bool],
+                 get_step_frame_number: Callable[[int, bool], int | None], frames_ahead: int = PREFETCH_FRAMES_AHEAD,
+                 frames_behind: int = PREFETCH_FRAMES_BEHIND):
+        """
+        :param fetch_frame: Fetch a frame into the frames cache, return False if the frame wasn't received
+        :param is_frame_cached: Return True if the frame is already on the frames cache
+        :param get_step_frame_number: Return the frame number a single step away from the given frame or None on the range edge
+        """
+        self.__fetch_frame = fetch_frame
+        self.__is_frame_cached = is_frame_cached
+        self.__get_step_frame_number = get_step_frame_number
+        self.__frames_ahead = frames_ahead
+        self.__frames_behind = frames_behind
+        self.__condition = Condition()
+        self.__cursor: int | None = None
+        self.__is_forward = True
+        self.__failed_frames: set[int] = set()
+        self.__is_running = False
+        self.__thread: Thread | None = None
+        self.prefetched_count = 0
+        self.failed_count = 0
+
+    def start(self) -> None:
+        with self.__condition:
+            if self.__is_running:
+                return
+            self.__is_running = True
+        self.__thread = Thread(target=self.__prefetch_loop, name='FramePrefetcher', daemon=True)
+        self.__thread.start()
+
+    def stop(self) -> None:
+        with self.__condition:
+            self.__is_running = False
+            self.__cursor = None
+            self.__condition.notify_all()
+
+    def on_frame_displayed(self, frame_number: int, is_forward: bool | None = None) -> None:
+        """
+        Move the prefetch window to the displayed frame
+        :param frame_number: Displayed frame number
+        :param is_forward: Stepping direction, None keeps the last direction
+        """
+        with self.__condition:
+            if frame_number != self.__cursor:
+                self.__failed_frames.clear()
+            self.__cursor = frame_number
+            if is_forward is not None:
+                self.__is_forward = is_forward
+            self.__condition.notify_all()
+
+    def cancel(self) -> None:
+        with self.__condition:
+            self.__cursor = None
+            self.__failed_frames.clear()
+
+    def get_prefetch_plan(self, frame_number: int, is_forward: bool) -> list[int]:
+        plan = []
+        for direction, frames_count in ((is_forward, self.__frames_ahead), (not is_forward, self.__frames_behind)):
+            step_frame_number = frame_number
+            for _ in range(frames_count):
+                step_frame_number = self.__get_step_frame_number(step_frame_number, direction)
+                if step_frame_number is None:
+                    break
+                plan.append(step_frame_number)
+        return plan
+
+    def __next_frame_to_fetch(self) -> int | None:
+        if self.__cursor is None:
+            return None
+        for frame_number in self.get_prefetch_plan(self.__cursor, self.__is_forward):
+            if frame_number not in self.__failed_frames and not self.__is_frame_cached(frame_number):
+                return frame_number
+        return None
+
+    def __prefetch_loop(self) -> None:
+        while True:
+            with self.__condition:
+                frame_number = None
+                while self.__is_running:
+                    try:
+                        frame_number = self.__next_frame_to_fetch()
+                    except:
+                        logging.error(traceback.format_exc())
+                        self.__cursor = None
+                    if frame_number is not None:
+                        break
+                    self.__condition.wait()
+                if not self.__is_running:
+                    return
+            try:
+                is_fetched = self.__fetch_frame(frame_number)
+            except:
+                logging.error(traceback.format_exc())
+                is_fetched = False
+            with self.__condition:
+                if is_fetched:
+                    self.prefetched_count += 1
+                else:
+                    self.failed_count += 1
+                    self.__failed_frames.add(frame_number)
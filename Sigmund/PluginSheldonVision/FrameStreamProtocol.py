@@ -0,0 +1,44 @@
+import struct
+import time
+
+from PluginSheldonVision.MetaDataHandler import MetaDataType
+
+FRAME_MESSAGE_MAGIC = b'SVFR'
+FRAME_MESSAGE_VERSION = 1
+# Magic, version, view, frame number, received timestamp, sent timestamp (seconds since epoch), little endian.
+# Must match assets/frame_stream.js
+FRAME_MESSAGE_HEADER = struct.Struct('<4sBBIdd')
+FRAME_MESSAGE_VIEWS = [MetaDataType.PRIMARY, MetaDataType.SECONDARY]
+
+
+class FrameMessageHeader:
+    def __init__(self, view: MetaDataType, frame_number: int, received_timestamp: float, sent_timestamp: float):
+        self.view = view
+        self.frame_number = frame_number
+        self.received_timestamp = received_timestamp
+        self.sent_timestamp = sent_timestamp
+
+
+def pack_frame_message(view: MetaDataType, frame_number: int, frame: bytes, received_timestamp: float,
+                       sent_timestamp: float | None = None) -> bytes:
+    """
+    Build a binary frame message: fixed size header followed by the JPEG frame
+    :param received_timestamp: Time the frame was taken from the frames bus
+    :param sent_timestamp: Time the frame is sent, None for now
+    """
+    header = FRAME_MESSAGE_HEADER.pack(FRAME_MESSAGE_MAGIC, FRAME_MESSAGE_VERSION, FRAME_MESSAGE_VIEWS.index(view), frame_number,
+                                       received_timestamp, sent_timestamp if sent_timestamp is not None else time.time())
+    return header + frame
+
+
+def unpack_frame_message(message: bytes) -> tuple[FrameMessageHeader, bytes]:
+    """
+    :raise ValueError: if the message isn't a frame message
+    """
+    if len(message) < FRAME_MESSAGE_HEADER.size:
+        raise ValueError(f'Frame message of {len(message)} bytes is shorter than its header')
+    magic, version, view_index, frame_number, received_timestamp, sent_timestamp = FRAME_MESSAGE_HEADER.unpack_from(message)
+    if magic != FRAME_MESSAGE_MAGIC or version != FRAME_MESSAGE_VERSION:
+        raise ValueError(f'Unsupported frame message {magic} version {version}')
+    header = FrameMessageHeader(FRAME_MESSAGE_VIEWS[view_index], frame_number, received_timestamp, sent_timestamp)
+    return header, message[FRAME_MESSAGE_HEADER.size:]
@@ -0,0 +1,120 @@
+from collections import deque
+from queue import Empty
+from threading import Condition, Lock
+
+from PluginSheldonVision.Constants import FRAMES_BUFFER_CAPACITY
+
+
+class FramesRingBuffer:
+    """
+    Bounded FIFO of (frame, frame_number) items which can also be looked up by frame number.
+    When the buffer is full the oldest frame is dropped, so a slow consumer never makes memory grow.
+    """
+
+    def __init__(self, capacity: int = FRAMES_BUFFER_CAPACITY):
+        if capacity <= 0:
+            raise ValueError(f'Frames buffer capacity must be positive, got {capacity}')
+        self.__capacity = capacity
+        self.__frames: deque[tuple] = deque()
+        self.__frames_by_number: dict[int, tuple] = {}
+        self.__not_empty = Condition(Lock())
+        self.enqueued_count = 0
+        self.dropped_count = 0
+        self.skipped_count = 0
+        self.high_water_mark = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.__capacity
+
+    def set_capacity(self, capacity: int) -> None:
+        if capacity <= 0:
+            raise ValueError(f'Frames buffer capacity must be positive, got {capacity}')
+        with self.__not_empty:
+            self.__capacity = capacity
+            while len(self.__frames) > self.__capacity:
+                self.__drop_oldest()
+
+    def put(self, frame, frame_number: int) -> None:
+        """
+        Add a frame to the buffer, dropping the oldest frame if the buffer is full
+        :param frame: Frame data as received from the frames source
+        :param frame_number: Frame number of the given frame
+        """
+        item = (frame, frame_number)
+        with self.__not_empty:
+            if len(self.__frames) >= self.__capacity:
+                self.__drop_oldest()
+            self.__frames.append(item)
+            self.__frames_by_number[frame_number] = item
+            self.enqueued_count += 1
+            self.high_water_mark = max(self.high_water_mark, len(self.__frames))
+            self.__not_empty.notify()
+
+    def get(self, block: bool = True, timeout: float | None = None) -> tuple:
+        """
+        Remove and return the oldest (frame, frame_number) item, same semantics as queue.Queue.get
+        :raise Empty: if no frame is available
+        """
+        with self.__not_empty:
+            if not block:
+                if not self.__frames:
+                    raise Empty
+            elif not self.__not_empty.wait_for(lambda: len(self.__frames) > 0, timeout=timeout):
+                raise Empty
+            item = self.__frames.popleft()
+            self.__forget(item)
+            return item
+
+    def get_latest(self, block: bool = True, timeout: float | None = None) -> tuple:
+        """
+        Remove and return the newest (frame, frame_number) item, the older buffered frames are skipped
+        :raise Empty: if no frame is available
+        """
+        with self.__not_empty:
+            if not block:
+                if not self.__frames:
+                    raise Empty
+            elif not self.__not_empty.wait_for(lambda: len(self.__frames) > 0, timeout=timeout):
+                raise Empty
+            self.skipped_count += len(self.__frames) - 1
+            item = self.__frames.pop()
+            self.__frames.clear()
+            self.__frames_by_number.clear()
+            return item
+
+    def get_frame(self, frame_number: int):
+        """
+        Look up a buffered frame by its frame number without removing it
+        :return: The frame data or None if the frame isn't buffered
+        """
+        with self.__not_empty:
+            item = self.__frames_by_number.get(frame_number)
+            return item[0] if item else None
+
+    def clear(self) -> None:
+        with self.__not_empty:
+            self.__frames.clear()
+            self.__frames_by_number.clear()
+
+    def qsize(self) -> int:
+        with self.__not_empty:
+            return len(self.__frames)
+
+    def __len__(self) -> int:
+        return self.qsize()
+
+    def get_counters(self) -> dict[str, int]:
+        with self.__not_empty:
+            return {'size': len(self.__frames), 'capacity': self.__capacity, 'enqueued': self.enqueued_count,
+                    'dropped': self.dropped_count, 'skipped': self.skipped_count,
+                    'high_water_mark': self.high_water_mark}
+
+    def __drop_oldest(self) -> None:
+        self.__forget(self.__frames.popleft())
+        self.dropped_count += 1
+
+    def __forget(self, item: tuple) -> None:
+        # The same frame number may be buffered more than once, only forget the lookup entry if it belongs to this item
+        if self.__frames_by_number.get(item[1]) is item:
+            del self.__frames_by_number[item[1]]
@@ -0,0 +1,220 @@
+import bisect
+import hashlib
+import json
+import logging
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from PluginSheldonVision.Constants import VIDEO_CACHE_PATH, GOP_CACHE_SIZE, DEFAULT_FPS
+
+KEYFRAME_INDEX_VERSION = 1
+KEYFRAME_INDEX_SUFFIX = '.keyframes.json'
+
+
+def get_video_hash(file_path: str) -> str:
+    """
+    Identify a video file by its path, size and modification time, without reading the whole file
+    """
+    file_stat = os.stat(file_path)
+    video_key = f'{os.path.abspath(file_path)}|{file_stat.st_size}|{file_stat.st_mtime_ns}'
+    return hashlib.sha1(video_key.encode('utf-8')).hexdigest()
+
+
+class KeyframeIndex:
+    """
+    Frame number to PTS table of a video stream and the frame numbers (and byte offsets) of its keyframes.
+    Built once by demuxing the stream without decoding it, then persisted next to the other cached data of the video.
+    """
+
+    def __init__(self, frames_pts: list[int], keyframes: list[int], keyframes_offsets: list[int], fps: float):
+        """
+        :param frames_pts: PTS of every frame, in presentation order
+        :param keyframes: Sorted frame numbers of the keyframes
+        :param keyframes_offsets: Byte offset of every keyframe packet, -1 if unknown
+        """
+        self.frames_pts = frames_pts
+        self.keyframes = keyframes
+        self.keyframes_offsets = keyframes_offsets
+        self.fps = fps
+        self.__frame_numbers = {pts: frame_number for frame_number, pts in enumerate(frames_pts)}
+
+    @property
+    def frames_count(self) -> int:
+        return len(self.frames_pts)
+
+    def get_frame_number(self, pts: int | None) -> int | None:
+        return self.__frame_numbers.get(pts)
+
+    def get_keyframe(self, frame_number: int) -> int:
+        """
+        :return: Frame number of the nearest keyframe at or before the given frame
+        """
+        return self.keyframes[max(0, bisect.bisect_right(self.keyframes, frame_number) - 1)]
+
+    @staticmethod
+    def build(file_path: str) -> 'KeyframeIndex':
+        # PyAV is needed only by the Python frame source and the thumbnails, not by the UI itself
+        import av
+
+        with av.open(file_path) as container:
+            stream = container.streams.video[0]
+            packets = sorted((packet.pts, packet.is_keyframe, packet.pos if packet.pos is not None else -1)
+                             for packet in container.demux(stream) if packet.pts is not None)
+            fps = float(stream.average_rate or stream.guessed_rate or DEFAULT_FPS)
+        keyframes = [frame_number for frame_number, (_, is_keyframe, _) in enumerate(packets) if is_keyframe]
+        keyframes_offsets = [offset for _, is_keyframe, offset in packets if is_keyframe]
+        if not keyframes or keyframes[0] != 0:
+            # Seeking to the first frame always starts from the beginning of the stream
+            keyframes.insert(0, 0)
+            keyframes_offsets.insert(0, -1)
+        return KeyframeIndex([pts for pts, _, _ in packets], keyframes, keyframes_offsets, fps)
+
+    def save(self, index_path: str) -> None:
+        with open(index_path, 'w') as index_file:
+            json.dump({'version': KEYFRAME_INDEX_VERSION, 'fps': self.fps, 'frames_pts': self.frames_pts,
+                       'keyframes': self.keyframes, 'keyframes_offsets': self.keyframes_offsets}, index_file)
+
+    @staticmethod
+    def load(index_path: str) -> 'KeyframeIndex':
+        """
+        :raise ValueError: if the index was saved by another version
+        """
+        with open(index_path, 'r') as index_file:
+            index = json.load(index_file)
+        if index.get('version') != KEYFRAME_INDEX_VERSION:
+            raise ValueError(f'Unsupported keyframe index version {index.get("version")}')
+        return KeyframeIndex(index['frames_pts'], index['keyframes'], index['keyframes_offsets'], index['fps'])
+
+    @staticmethod
+    def load_or_build(file_path: str, cache_path: str = VIDEO_CACHE_PATH) -> 'KeyframeIndex':
+        """
+        Load the persisted index of the video, build and persist it on the first load
+        """
+        index_path = os.path.join(cache_path, get_video_hash(file_path) + KEYFRAME_INDEX_SUFFIX)
+        if os.path.isfile(index_path):
+            try:
+                return KeyframeIndex.load(index_path)
+            except (OSError, ValueError, KeyError):
+                logging.warning(f'Rebuilding corrupted keyframe index {index_path}')
+        index = KeyframeIndex.build(file_path)
+        try:
+            os.makedirs(cache_path, exist_ok=True)
+            index.save(index_path)
+        except OSError:
+            logging.warning(f"Couldn't save keyframe index {index_path}")
+        return index
+
+
+class KeyframeIndexedVideoReader:
+    """
+    Random access video reader with the same interface as OpenCvVideoReader.
+    A frame is read by seeking to its nearest keyframe and decoding forward, the decoded frames of the last GOPs are cached,
+    so random access costs at most a single GOP decode and stepping back and forth within a GOP doesn't decode at all.
+    Sequential reads continue decoding without seeking.
+    """
+
+    def __init__(self, cache_path: str = VIDEO_CACHE_PATH, gop_cache_size: int = GOP_CACHE_SIZE):
+        """
+        :param cache_path: Directory of the persisted keyframe indexes
+        :param gop_cache_size: Number of decoded GOPs kept in memory
+        """
+        self.__cache_path = cache_path
+        self.__gop_cache_size = gop_cache_size
+        self.__container = None
+        self.__stream = None
+        self.__index: KeyframeIndex | None = None
+        self.__decoded_frames = None
+        self.__decoded_position = 0
+        self.__gops: OrderedDict[int, dict[int, np.ndarray]] = OrderedDict()
+        self.position = 0
+        self.seeks_count = 0
+        self.gop_hits = 0
+
+    @property
+    def frames_count(self) -> int:
+        return self.__index.frames_count if self.__index else 0
+
+    @property
+    def fps(self) -> float:
+        return self.__index.fps if self.__index else 0
+
+    def open(self, file_path: str) -> bool:
+        import av
+
+        try:
+            index = KeyframeIndex.load_or_build(file_path, self.__cache_path)
+            container = av.open(file_path)
+        except (av.error.FFmpegError, OSError, IndexError):
+            return False
+        self.release()
+        self.__index = index
+        self.__container = container
+        self.__stream = container.streams.video[0]
+        self.__stream.thread_type = 'AUTO'
+        return True
+
+    def set_position(self, frame_number: int) -> None:
+        self.position = frame_number
+
+    def read(self) -> np.ndarray | None:
+        """
+        :return: BGR image of the frame at the current position, None at the end of the video
+        """
+        image = self.get_frame(self.position)
+        if image is not None:
+            self.position += 1
+        return image
+
+    def get_frame(self, frame_number: int) -> np.ndarray | None:
+        if self.__index is None or not 0 <= frame_number < self.frames_count:
+            return None
+        keyframe = self.__index.get_keyframe(frame_number)
+        gop = self.__gops.get(keyframe)
+        if gop is not None and frame_number in gop:
+            self.__gops.move_to_end(keyframe)
+            self.gop_hits += 1
+            return gop[frame_number]
+        if self.__decoded_frames is None or not keyframe <= self.__decoded_position <= frame_number:
+            self.__seek(keyframe)
+        return self.__decode_until(frame_number)
+
+    def release(self) -> None:
+        if self.__container is not None:
+            self.__container.close()
+        self.__container = None
+        self.__stream = None
+        self.__index = None
+        self.__decoded_frames = None
+        self.__gops.clear()
+        self.position = 0
+
+    def __seek(self, keyframe: int) -> None:
+        self.__container.seek(self.__index.frames_pts[keyframe], stream=self.__stream, backward=True, any_frame=False)
+        self.__decoded_frames = self.__container.decode(self.__stream)
+        self.__decoded_position = keyframe
+        self.seeks_count += 1
+
+    def __decode_until(self, frame_number: int) -> np.ndarray | None:
+        for frame in self.__decoded_frames:
+            decoded_frame_number = self.__index.get_frame_number(frame.pts)
+            # Frames before the keyframe (open GOP) belong to the previous GOP
+            if decoded_frame_number is None or decoded_frame_number < self.__decoded_position:
+                continue
+            image = frame.to_ndarray(format='bgr24')
+            self.__get_gop(self.__index.get_keyframe(decoded_frame_number))[decoded_frame_number] = image
+            self.__decoded_position = decoded_frame_number + 1
+            if decoded_frame_number >= frame_number:
+                return image if decoded_frame_number == frame_number else None
+        self.__decoded_frames = None
+        return None
+
+    def __get_gop(self, keyframe: int) -> dict[int, np.ndarray]:
+        gop = self.__gops.get(keyframe)
+        if gop is None:
+            gop = self.__gops[keyframe] = {}
+            while len(self.__gops) > self.__gop_cache_size:
+                self.__gops.popitem(last=False)
+        self.__gops.move_to_end(keyframe)
+        return gop
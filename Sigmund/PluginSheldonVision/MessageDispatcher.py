@@ -0,0 +1,179 @@
+import logging
+import time
+import traceback
+from collections import deque
+from threading import Condition, Lock, Thread
+from typing import Callable
+
+from PluginSheldonVision.Constants import DISPATCH_QUEUE_SIZE
+
+
+class MessageTypeCounters:
+    """
+    Counters of a single message type handled by the dispatcher
+    """
+
+    def __init__(self):
+        self.received_count = 0
+        self.handled_count = 0
+        self.dropped_count = 0
+        self.errors_count = 0
+        self.total_latency_seconds = 0.0
+        self.max_latency_seconds = 0.0
+
+    def add_latency(self, latency_seconds: float) -> None:
+        self.handled_count += 1
+        self.total_latency_seconds += latency_seconds
+        self.max_latency_seconds = max(self.max_latency_seconds, latency_seconds)
+
+    def get_counters(self) -> dict[str, int | float]:
+        average_latency_seconds = self.total_latency_seconds / self.handled_count if self.handled_count else 0.0
+        return {'received': self.received_count, 'handled': self.handled_count, 'dropped': self.dropped_count,
+                'errors': self.errors_count, 'avg_latency_ms': average_latency_seconds * 1000,
+                'max_latency_ms': self.max_latency_seconds * 1000}
+
+
+class MessageHandlerWorker:
+    """
+    Run the handler of a single message type on its own thread, fed by a queue.
+    With a bounded queue the oldest pending message is dropped when the queue is full, so a burst never blocks the transport
+    thread. Replies someone is waiting for get an unbounded queue, a dropped reply would only show up as a timeout.
+    """
+
+    def __init__(self, msg_type: str, handler: Callable, counters: MessageTypeCounters, lock: Lock,
+                 on_error: Callable[[str, str], None], queue_size: int | None):
+        """
+        :param queue_size: Maximal number of pending messages, None never drops a message
+        """
+        self.__msg_type = msg_type
+        self.__handler = handler
+        self.__counters = counters
+        self.__counters_lock = lock
+        self.__on_error = on_error
+        self.__queue: deque = deque(maxlen=queue_size)
+        self.__condition = Condition()
+        self.__is_running = True
+        self.__thread = Thread(target=self.__worker_loop, name=f'MessageHandler-{msg_type}', daemon=True)
+        self.__thread.start()
+
+    def put(self, message) -> bool:
+        """
+        :return: False if the oldest pending message was dropped to make room
+        """
+        with self.__condition:
+            is_dropped = self.__queue.maxlen is not None and len(self.__queue) == self.__queue.maxlen
+            self.__queue.append(message)
+            self.__condition.notify()
+        return not is_dropped
+
+    def stop(self) -> None:
+        with self.__condition:
+            self.__is_running = False
+            self.__condition.notify_all()
+
+    def qsize(self) -> int:
+        with self.__condition:
+            return len(self.__queue)
+
+    def __worker_loop(self) -> None:
+        while True:
+            with self.__condition:
+                while self.__is_running and not self.__queue:
+                    self.__condition.wait()
+                if not self.__is_running:
+                    return
+                message = self.__queue.popleft()
+            MessageDispatcher.run_handler(self.__msg_type, self.__handler, message, self.__counters, self.__counters_lock,
+                                          self.__on_error)
+
+
+class MessageDispatcher:
+    """
+    Route incoming plugin messages to their handlers by message type.
+    Fast handlers run inline on the transport thread, slow handlers are registered as asynchronous and run on a worker per
+    message type, so a slow message never delays the messages of other types.
+    """
+
+    def __init__(self, on_error: Callable[[str, str], None] | None = None, queue_size: int = DISPATCH_QUEUE_SIZE):
+        """
+        :param on_error: Called with the message type and the traceback when a handler raises
+        :param queue_size: Maximal number of pending messages per asynchronous message type which drops its oldest messages
+        """
+        self.__on_error = on_error or (lambda msg_type, traceback_string: logging.error(traceback_string))
+        self.__queue_size = queue_size
+        self.__handlers: dict[str, Callable] = {}
+        self.__workers: dict[str, MessageHandlerWorker] = {}
+        self.__counters: dict[str, MessageTypeCounters] = {}
+        self.__lock = Lock()
+        self.__start_time = time.perf_counter()
+        self.dispatched_count = 0
+        self.unhandled_count = 0
+        self.transport_busy_seconds = 0.0
+
+    def register(self, msg_type: str, handler: Callable, is_async: bool = False, drop_oldest: bool = False) -> None:
+        """
+        :param msg_type: Message type to handle
+        :param handler: Called with the received message
+        :param is_async: Run the handler on a worker thread instead of the transport thread
+        :param drop_oldest: Drop the oldest pending message of an asynchronous type when queue_size messages are pending.
+                            Only for frames and status streams, where a newer message replaces an older one, never for replies
+        """
+        self.__handlers[msg_type] = handler
+        self.__counters[msg_type] = MessageTypeCounters()
+        if is_async:
+            self.__workers[msg_type] = MessageHandlerWorker(msg_type, handler, self.__counters[msg_type], self.__lock,
+                                                            self.__on_error, self.__queue_size if drop_oldest else None)
+
+    def get_message_types(self) -> list[str]:
+        return list(self.__handlers.keys())
+
+    def dispatch(self, message) -> None:
+        start_time = time.perf_counter()
+        msg_type = message.msg_type
+        handler = self.__handlers.get(msg_type)
+        if handler is None:
+            with self.__lock:
+                self.unhandled_count += 1
+        else:
+            counters = self.__counters[msg_type]
+            with self.__lock:
+                counters.received_count += 1
+            worker = self.__workers.get(msg_type)
+            if worker is None:
+                self.run_handler(msg_type, handler, message, counters, self.__lock, self.__on_error)
+            elif not worker.put(message):
+                with self.__lock:
+                    counters.dropped_count += 1
+        with self.__lock:
+            self.dispatched_count += 1
+            self.transport_busy_seconds += time.perf_counter() - start_time
+
+    @staticmethod
+    def run_handler(msg_type: str, handler: Callable, message, counters: MessageTypeCounters, lock: Lock,
+                    on_error: Callable[[str, str], None]) -> None:
+        start_time = time.perf_counter()
+        try:
+            handler(message)
+        except:
+            with lock:
+                counters.errors_count += 1
+            on_error(msg_type, traceback.format_exc())
+        with lock:
+            counters.add_latency(time.perf_counter() - start_time)
+
+    def stop(self) -> None:
+        for worker in self.__workers.values():
+            worker.stop()
+
+    def get_stats(self) -> dict:
+        with self.__lock:
+            uptime_seconds = time.perf_counter() - self.__start_time
+            message_types = {msg_type: counters.get_counters() for msg_type, counters in self.__counters.items()}
+            transport = {'dispatched': self.dispatched_count, 'unhandled': self.unhandled_count,
+                         'busy_seconds': self.transport_busy_seconds,
+                         'messages_per_busy_second': self.dispatched_count / self.transport_busy_seconds
+                         if self.transport_busy_seconds else 0.0,
+                         'messages_per_second': self.dispatched_count / uptime_seconds if uptime_seconds else 0.0}
+        for msg_type, worker in self.__workers.items():
+            message_types[msg_type]['queued'] = worker.qsize()
+        return {'transport': transport, 'message_types': message_types}
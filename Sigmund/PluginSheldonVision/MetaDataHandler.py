@@ -1,3 +1,4 @@
+import bisect
 import glob
 import os
 import time
@@ -123,6 +124,8 @@ class MetaDataHandler:
         self.__multiple_recordings_debug_header = {}
         self.__current_decimation_index: int | None = None
         self.loading_metadata = False
+        # Incremented whenever a metadata file is (re)loaded, identifies the metadata anything rendered from it was based on
+        self.metadata_version = 0
         self.verify_blob_path = verify_blob_path
         self.verify_local_path = verify_local_path
         self.get_blob_files = get_blob_files
@@ -224,6 +227,18 @@ class MetaDataHandler:
 
         return self.__current_decimation_index
 
+    def get_decimation_step_value(self, frame_number: int, is_next_frame: bool) -> int | None:
+        """
+        Same as get_decimation_value without changing the decimation state or notifying errors, used for frames read-ahead
+        :return: The next / previous metadata frame or None if there isn't one
+        """
+        primary_metadata_indices = self.__metadata[MetaDataType.PRIMARY.value][DECIMATION]
+        if is_next_frame:
+            index = bisect.bisect_right(primary_metadata_indices, frame_number)
+            return primary_metadata_indices[index] if index < len(primary_metadata_indices) else None
+        index = bisect.bisect_left(primary_metadata_indices, frame_number) - 1
+        return primary_metadata_indices[index] if index >= 0 else None
+
     def get_data_by_frame_number(self, frame_number: float):
         no_data = [{"name": NO_DATA_MESSAGE,
                     "id": NO_DATA_MESSAGE}]
@@ -261,6 +276,7 @@ class MetaDataHandler:
         self.loading_metadata = True
         self.__metadata[meta_data_type.value][METADATA].clear()
         self.__meta_data_list.clear()
+        self.metadata_version += 1
         if not self.is_file_exist(file_name):
             return
 
@@ -268,6 +284,7 @@ class MetaDataHandler:
         self.__create_metadata_by_frame_id(meta_data_type)
         self.__metadata[meta_data_type.value][FILENAME] = file_name
         self.__metadata[meta_data_type.value][DECIMATION] = list(self.__metadata[meta_data_type.value][METADATA].keys())
+        self.metadata_version += 1
         if error_counter == 0:
             self.notifications.notify_info('SheldonVision', f'{meta_data_type.value} metadata file loaded successfully')
         else:
@@ -389,8 +406,8 @@ class MetaDataHandler:
                         self.find_metadata_file = False
                         return None
                 else:
-                    self.get_blob_files(self.verify_blob_path(jump_folder.replace('\\', '/')))
-                    jump_files = [f for f in self.files_list_on_blob() if f.endswith(JSON_EXTENSION)]
+                    jump_files = [f for f in self.get_blob_files(self.verify_blob_path(jump_folder.replace('\\', '/')))
+                                  if f.endswith(JSON_EXTENSION)]
             
             
                 if not jump_files and not notify_local_error:
@@ -482,8 +499,8 @@ class MetaDataHandler:
             jump_folder = relevant_metadata_path if relevant_metadata_path.endswith(JSON_EXTENSION) else \
                 os.path.join(relevant_metadata_path, video_name)
             jump_folder = str(Path(jump_folder))
-            self.get_blob_files(self.verify_blob_path(jump_folder.replace('\\', '/')))
-            jump_files = [f for f in self.files_list_on_blob() if f.endswith(JSON_EXTENSION)]
+            jump_files = [f for f in self.get_blob_files(self.verify_blob_path(jump_folder.replace('\\', '/')))
+                          if f.endswith(JSON_EXTENSION)]
             if not jump_files:
                 given_path = jump_folder if '/' not in jump_folder else jump_folder.replace('\\', '/')
                 error_message = f"No metadata files were found at the given blob path - {given_path}"
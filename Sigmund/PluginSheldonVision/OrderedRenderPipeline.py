@@ -0,0 +1,53 @@
+from collections import deque
+from concurrent.futures import Executor, Future
+from typing import Any, Callable
+
+from PluginSheldonVision.Constants import RENDER_PIPELINE_DEPTH
+
+
+class OrderedRenderPipeline:
+    """
+    Frames of a single stream rendered concurrently on a shared bounded thread pool, and returned in the order they were submitted.
+    A stream submits frames only while the pipeline isn't full and takes the oldest result otherwise, so a slow consumer stops
+    the stream from taking new frames instead of queueing renders.
+    """
+
+    def __init__(self, executor: Executor, depth: int = RENDER_PIPELINE_DEPTH):
+        """
+        :param depth: Maximal number of frames rendered or waiting to be taken
+        """
+        if depth <= 0:
+            raise ValueError(f'Render pipeline depth must be positive, got {depth}')
+        self.__executor = executor
+        self.__depth = depth
+        self.__pending: deque[tuple[Future, Any]] = deque()
+
+    def __len__(self) -> int:
+        return len(self.__pending)
+
+    @property
+    def is_full(self) -> bool:
+        return len(self.__pending) >= self.__depth
+
+    def submit(self, context: Any, render: Callable, *args) -> None:
+        """
+        :param context: Returned with the render result, e.g. the frame number
+        """
+        self.__pending.append((self.__executor.submit(render, *args), context))
+
+    def get_next(self) -> tuple[Any, Any]:
+        """
+        Wait for the oldest submitted frame
+        :return: (render result, context)
+        :raise Exception: raised by the render of the frame
+        """
+        future, context = self.__pending.popleft()
+        return future.result(), context
+
+    def cancel(self) -> None:
+        """
+        Drop the pending frames, renders which already started run to completion and their results are ignored
+        """
+        for future, _ in self.__pending:
+            future.cancel()
+        self.__pending.clear()
@@ -0,0 +1,160 @@
+import bisect
+import time
+from collections import OrderedDict, deque
+from threading import Lock
+from typing import Callable
+
+from PluginSheldonVision.Constants import METRICS_LATENCY_BUCKETS_SECONDS, METRICS_PERCENTILES_WINDOW, FRAMES_BUFFER_CAPACITY
+
+METRICS_PREFIX = 'sheldon_vision'
+PERCENTILES = (50, 95, 99)
+
+
+class PipelineStage:
+    RECEIVE = 'receive'
+    QUEUE_WAIT = 'queue_wait'
+    DECODE = 'decode'
+    DRAW = 'draw'
+    ENCODE = 'encode'
+    SEND = 'send'
+
+
+class LatencyHistogram:
+    """
+    Cumulative latency buckets for Prometheus, and a window of the latest samples for the percentiles
+    """
+
+    def __init__(self, buckets: tuple = METRICS_LATENCY_BUCKETS_SECONDS, window: int = METRICS_PERCENTILES_WINDOW):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.__window: deque[float] = deque(maxlen=window)
+        self.__lock = Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self.__lock:
+            self.bucket_counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self.count += 1
+            self.sum += seconds
+            self.__window.append(seconds)
+
+    def get_percentiles(self) -> dict[str, float]:
+        with self.__lock:
+            samples = sorted(self.__window)
+        if not samples:
+            return {f'p{percentile}_ms': 0.0 for percentile in PERCENTILES}
+        return {f'p{percentile}_ms': samples[min(len(samples) - 1, len(samples) * percentile // 100)] * 1000
+                for percentile in PERCENTILES}
+
+    def get_stats(self) -> dict[str, int | float]:
+        return dict(count=self.count, avg_ms=self.sum / self.count * 1000 if self.count else 0.0, **self.get_percentiles())
+
+    def to_prometheus(self, name: str, labels: str) -> list[str]:
+        with self.__lock:
+            bucket_counts = list(self.bucket_counts)
+            count, total = self.count, self.sum
+        lines = []
+        cumulative_count = 0
+        for bucket, bucket_count in zip(self.buckets + ('+Inf',), bucket_counts):
+            cumulative_count += bucket_count
+            lines.append(f'{name}_bucket{{{labels},le="{bucket}"}} {cumulative_count}')
+        lines.append(f'{name}_sum{{{labels}}} {total}')
+        lines.append(f'{name}_count{{{labels}}} {count}')
+        return lines
+
+
+class PipelineMetrics:
+    """
+    Per frame timing of every pipeline stage and every layer, aggregated into histograms.
+    Disabled by default: now() returns None and observe_since() returns immediately, so instrumented code costs a single call.
+    Gauges and counters are read from their owners only when the metrics are exported.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.__stages: dict[str, LatencyHistogram] = {}
+        self.__layers: dict[str, LatencyHistogram] = {}
+        self.__received_times: OrderedDict[int, float] = OrderedDict()
+        self.__collectors: list[tuple[str, str, str, str, Callable[[], dict[str, float]]]] = []
+        self.__lock = Lock()
+
+    def now(self) -> float | None:
+        return time.perf_counter() if self.enabled else None
+
+    def observe_since(self, stage: str, start: float | None) -> None:
+        if start is not None:
+            self.__get_histogram(self.__stages, stage).observe(time.perf_counter() - start)
+
+    def observe_layer_since(self, layer_name: str, start: float | None) -> None:
+        if start is not None:
+            self.__get_histogram(self.__layers, layer_name).observe(time.perf_counter() - start)
+
+    def on_frame_received(self, frame_number: int) -> None:
+        """
+        Start the queue wait of a frame, ended by on_frame_dequeued
+        """
+        if not self.enabled:
+            return
+        with self.__lock:
+            self.__received_times[frame_number] = time.perf_counter()
+            while len(self.__received_times) > 2 * FRAMES_BUFFER_CAPACITY:
+                self.__received_times.popitem(last=False)
+
+    def on_frame_dequeued(self, frame_number: int) -> None:
+        if not self.enabled:
+            return
+        with self.__lock:
+            received_time = self.__received_times.get(frame_number)
+        self.observe_since(PipelineStage.QUEUE_WAIT, received_time)
+
+    def register_gauge(self, name: str, description: str, label: str, collect: Callable[[], dict[str, float]]) -> None:
+        """
+        :param label: Label name of the collected values
+        :param collect: Returns the current value of every label value
+        """
+        self.__collectors.append((name, 'gauge', description, label, collect))
+
+    def register_counter(self, name: str, description: str, label: str, collect: Callable[[], dict[str, float]]) -> None:
+        self.__collectors.append((f'{name}_total', 'counter', description, label, collect))
+
+    def reset(self) -> None:
+        with self.__lock:
+            self.__stages.clear()
+            self.__layers.clear()
+            self.__received_times.clear()
+
+    def get_stats(self) -> dict:
+        with self.__lock:
+            stages, layers = dict(self.__stages), dict(self.__layers)
+        return {'enabled': self.enabled,
+                'stages': {stage: histogram.get_stats() for stage, histogram in stages.items()},
+                'layers': {layer: histogram.get_stats() for layer, histogram in layers.items()},
+                **{name: collect() for name, _, _, _, collect in self.__collectors}}
+
+    def to_prometheus(self) -> str:
+        """
+        :return: Prometheus text exposition format
+        """
+        with self.__lock:
+            stages, layers = dict(self.__stages), dict(self.__layers)
+        lines = []
+        for name, label, histograms, description in ((f'{METRICS_PREFIX}_stage_seconds', 'stage', stages, 'Frame pipeline stage latency'),
+                                                     (f'{METRICS_PREFIX}_layer_seconds', 'layer', layers, 'Layer content latency')):
+            lines += [f'# HELP {name} {description}', f'# TYPE {name} histogram']
+            for label_value, histogram in histograms.items():
+                lines += histogram.to_prometheus(name, f'{label}="{label_value}"')
+        for name, metric_type, description, label, collect in self.__collectors:
+            lines += [f'# HELP {METRICS_PREFIX}_{name} {description}', f'# TYPE {METRICS_PREFIX}_{name} {metric_type}']
+            lines += [f'{METRICS_PREFIX}_{name}{{{label}="{label_value}"}} {value}' for label_value, value in collect().items()]
+        return '\n'.join(lines) + '\n'
+
+    def __get_histogram(self, histograms: dict[str, LatencyHistogram], name: str) -> LatencyHistogram:
+        histogram = histograms.get(name)
+        if histogram is None:
+            with self.__lock:
+                histogram = histograms.setdefault(name, LatencyHistogram())
+        return histogram
+
+
+pipeline_metrics = PipelineMetrics()
@@ -0,0 +1,125 @@
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image, ImageColor
+
+from PluginSheldonVision.PlotLayers.Elements import GUIRect
+
+COLORS_CACHE_SIZE = 256
+
+
+@lru_cache(maxsize=COLORS_CACHE_SIZE)
+def get_fill_color(color: str | tuple, mode: str) -> tuple:
+    """
+    Same conversion as ImageDraw outline colors, resolved once per color and image mode
+    """
+    if not isinstance(color, str):
+        color = '#' + ''.join(f'{int(channel):02x}' for channel in color)
+    fill_color = ImageColor.getcolor(color, mode)
+    return fill_color if isinstance(fill_color, tuple) else (fill_color,)
+
+
+def rects_to_arrays(rects: list[GUIRect], mode: str) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    :return: Boxes (left, top, right, bottom), colors and line widths arrays of the rectangles, for draw_boxes
+    """
+    boxes = np.array([(rect.left, rect.top, rect.right, rect.bottom) for rect in rects], dtype=np.float64).reshape(-1, 4)
+    colors = np.array([get_fill_color(rect.color, mode) for rect in rects], dtype=np.uint8)
+    line_widths = np.array([rect.line_width for rect in rects], dtype=np.int64)
+    return boxes, colors, line_widths
+
+
+def get_boxes_bounds(boxes: np.ndarray, line_widths: np.ndarray, size: tuple[int, int]) -> tuple[int, int, int, int] | None:
+    """
+    :param size: (width, height) of the image
+    :return: Bounding box (left, top, right, bottom) of the outlines clipped to the image, right and bottom exclusive.
+             None if no box is in the image
+    """
+    if not len(boxes):
+        return None
+    # The outlines of boxes thinner than twice their line width reach out of the box by up to the line width
+    margins = np.maximum(np.asarray(line_widths, dtype=np.int64), 1)
+    coordinates = np.trunc(boxes).astype(np.int64)
+    left, top = max(0, (coordinates[:, 0] - margins).min()), max(0, (coordinates[:, 1] - margins).min())
+    right = min(size[0], (coordinates[:, 2] + margins).max() + 1)
+    bottom = min(size[1], (coordinates[:, 3] + margins).max() + 1)
+    return (int(left), int(top), int(right), int(bottom)) if left < right and top < bottom else None
+
+
+def draw_boxes(pixels: np.ndarray, boxes: np.ndarray, colors: np.ndarray, line_widths: np.ndarray,
+               offset: tuple[int, int] = (0, 0)) -> np.ndarray:
+    """
+    Draw the outlines of all the boxes into the pixels array, the same pixels as ImageDraw.rectangle with outline and width.
+    Every outline is split into 4 bands clipped to the array, the coordinates of all the bands pixels are generated at once,
+    so the cost grows with the number of pixels touched and not with the number of boxes.
+    Boxes are drawn in order: where boxes overlap, the pixel gets the color of the last box.
+    Boxes thinner than twice their line width get the same bands as ImageDraw, which reach out of the box.
+    :param pixels: (height, width) or (height, width, channels) array, drawn in place
+    :param boxes: (N, 4) left, top, right, bottom of every box, inclusive like ImageDraw, truncated to integers like ImageDraw
+    :param colors: (N, channels) color of every box, in the pixels channels order
+    :param line_widths: (N,) outline width of every box, drawn inwards, 0 is drawn as 1 like ImageDraw
+    :param offset: (x, y) of pixels[0, 0] in the boxes coordinates, to draw into a crop of the image
+    :return: The pixels array
+    """
+    if not len(boxes):
+        return pixels
+    height, width = pixels.shape[:2]
+    coordinates = np.trunc(boxes).astype(np.int64) - np.array([offset[0], offset[1], offset[0], offset[1]])
+    left, top, right, bottom = (coordinates[:, i] for i in range(4))
+    right, bottom = right + 1, bottom + 1
+    line_widths = np.maximum(np.asarray(line_widths, dtype=np.int64), 1)
+
+    # Top, bottom, left and right bands of every box: [band_top, band_bottom) x [band_left, band_right).
+    # Same as ImageDraw: horizontal lines of the full box width, then vertical lines between them which exclude their end
+    # point. On thin boxes the horizontal lines cross each other and the vertical lines run backwards, out of the box
+    vertical_start, vertical_end = top + line_widths, bottom - line_widths
+    is_backwards = vertical_end < vertical_start
+    vertical_top = np.where(is_backwards, vertical_end + 1, vertical_start)
+    vertical_bottom = np.where(is_backwards, vertical_start + 1, vertical_end)
+    band_top = np.concatenate((top, bottom - line_widths, vertical_top, vertical_top))
+    band_bottom = np.concatenate((top + line_widths, bottom, vertical_bottom, vertical_bottom))
+    band_left = np.concatenate((left, left, left, right - line_widths))
+    band_right = np.concatenate((right, right, left + line_widths, right))
+    band_boxes = np.tile(np.arange(len(boxes)), 4)
+
+    band_top, band_bottom = np.clip(band_top, 0, height), np.clip(band_bottom, 0, height)
+    band_left, band_right = np.clip(band_left, 0, width), np.clip(band_right, 0, width)
+    band_heights = np.maximum(band_bottom - band_top, 0)
+    band_widths = np.maximum(band_right - band_left, 0)
+    visible = (band_heights * band_widths) > 0
+    if not visible.any():
+        return pixels
+    band_top, band_left, band_widths, band_boxes = band_top[visible], band_left[visible], band_widths[visible], band_boxes[visible]
+    band_sizes = band_heights[visible] * band_widths
+
+    # Bands are ordered by box within every side, keep the pixels in box order so the last box wins
+    order = np.argsort(band_boxes, kind='stable')
+    band_top, band_left, band_widths, band_boxes, band_sizes = \
+        band_top[order], band_left[order], band_widths[order], band_boxes[order], band_sizes[order]
+
+    pixel_bands = np.repeat(np.arange(len(band_sizes)), band_sizes)
+    band_pixels = np.arange(pixel_bands.size) - np.repeat(np.cumsum(band_sizes) - band_sizes, band_sizes)
+    rows = band_top[pixel_bands] + band_pixels // band_widths[pixel_bands]
+    columns = band_left[pixel_bands] + band_pixels % band_widths[pixel_bands]
+    flat_indexes = rows * width + columns
+
+    # The first occurrence of every pixel in the reversed order is its last box, np.unique sorts stably for return_index
+    unique_indexes, last_occurrences = np.unique(flat_indexes[::-1], return_index=True)
+    pixel_boxes = band_boxes[pixel_bands[::-1][last_occurrences]]
+    flat_pixels = pixels.reshape(height * width, -1)
+    flat_pixels[unique_indexes] = np.asarray(colors, dtype=pixels.dtype).reshape(len(boxes), -1)[pixel_boxes]
+    return pixels
+
+
+def draw_rects(image: Image.Image, rects: list[GUIRect]) -> Image.Image:
+    """
+    Draw the rectangles into the image in place, only the area covered by the rectangles is copied to and from NumPy
+    """
+    boxes, colors, line_widths = rects_to_arrays(rects, image.mode)
+    bounds = get_boxes_bounds(boxes, line_widths, image.size)
+    if bounds is None:
+        return image
+    pixels = np.array(image.crop(bounds))
+    draw_boxes(pixels, boxes, colors, line_widths, offset=bounds[:2])
+    image.paste(Image.fromarray(pixels, image.mode), bounds[:2])
+    return image
@@ -0,0 +1,101 @@
+from functools import lru_cache
+
+import numpy as np
+from matplotlib import colors
+from PIL import Image, ImageDraw, ImageFont
+
+from PluginSheldonVision.Constants import Font
+from PluginSheldonVision.PlotLayers.BoxesRasterizer import draw_rects
+from PluginSheldonVision.PlotLayers.Elements import GUIRect, GUIText
+
+FONTS_CACHE_SIZE = 64
+COLORS_CACHE_SIZE = 256
+TRANSPARENT = (0, 0, 0, 0)
+OVERLAY_OVERHEAD_BYTES = 64
+
+
+@lru_cache(maxsize=FONTS_CACHE_SIZE)
+def get_font(font: str, font_size: int) -> ImageFont.FreeTypeFont:
+    """
+    Fonts are loaded from disk once per family and size
+    """
+    return ImageFont.truetype(font, font_size)
+
+
+@lru_cache(maxsize=COLORS_CACHE_SIZE)
+def get_text_color(color: str) -> tuple:
+    """
+    Same conversion as PlotLayerBase.create_text_in_pil, resolved once per color
+    """
+    return tuple([int(c * 256) for c in colors.to_rgb(color)])
+
+
+class LayersDisplayList:
+    """
+    GUI elements of all the active layers of a single frame, drawn with a single draw context.
+    Elements are drawn in the order they were added: every layer rectangles and then its texts, same as drawing layer by layer.
+    """
+
+    def __init__(self, font: str = Font.Arial):
+        self.__font = font
+        self.elements: list[GUIRect | GUIText] = []
+
+    def add_layer_elements(self, rects: list[GUIRect], texts: list[GUIText]) -> None:
+        self.elements.extend(rects)
+        self.elements.extend(texts)
+
+    def draw(self, image: Image.Image) -> Image.Image:
+        if not self.elements:
+            return image
+        draw = ImageDraw.Draw(image)
+        rects: list[GUIRect] = []
+        for element in self.elements:
+            if isinstance(element, GUIRect):
+                rects.append(element)
+                continue
+            # Consecutive rectangles are rasterized together, before the texts drawn over them
+            if rects:
+                draw_rects(image, rects)
+                rects = []
+            draw.text((element.x, element.y), str(element.text_message), font=get_font(self.__font, element.font_size),
+                      fill=get_text_color(element.color))
+        if rects:
+            draw_rects(image, rects)
+        return image
+
+
+class LayersOverlay:
+    """
+    The GUI elements of a display list rendered once into a transparent raster, cropped to the drawn area.
+    The same overlay is composited onto the frame on every replay or seek, without running the layers logic or drawing again.
+    """
+
+    def __init__(self, display_list: LayersDisplayList, size: tuple[int, int]):
+        """
+        :param size: Size of the frames the overlay is composited onto
+        """
+        overlay = display_list.draw(Image.new('RGBA', size, TRANSPARENT)) if display_list.elements else None
+        bounding_box = overlay.getbbox() if overlay else None
+        self.image: Image.Image | None = overlay.crop(bounding_box) if bounding_box else None
+        self.offset = bounding_box[:2] if bounding_box else (0, 0)
+
+    def __len__(self) -> int:
+        return OVERLAY_OVERHEAD_BYTES + (self.image.width * self.image.height * 4 if self.image else 0)
+
+    def composite(self, image: Image.Image) -> Image.Image:
+        if self.image is not None:
+            image.paste(self.image, self.offset, self.image)
+        return image
+
+    def composite_array(self, pixels: np.ndarray) -> np.ndarray:
+        """
+        Alpha blend the overlay into an RGB frame array in place, only the drawn area of the frame is touched
+        """
+        if self.image is None:
+            return pixels
+        left, top = self.offset
+        overlay = np.asarray(self.image, dtype=np.uint16)
+        area = pixels[top:top + overlay.shape[0], left:left + overlay.shape[1]]
+        alpha = overlay[..., 3:]
+        area[...] = (overlay[..., :3] * alpha + area * (255 - alpha) + 127) // 255
+        return pixels
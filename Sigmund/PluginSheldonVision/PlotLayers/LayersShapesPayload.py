@@ -0,0 +1,59 @@
+from PluginSheldonVision.Constants import FontFamily, PLOT_WIDTH, PLOT_HEIGHT
+from PluginSheldonVision.PlotLayers.Elements import GUIRect, GUIText
+
+OVERLAY_META_KEY = 'overlay'
+COORDINATES_DECIMALS = 1
+PAPER_COORDINATES_DECIMALS = 4
+
+
+class LayersShapesPayload:
+    """
+    GUI elements of all the active layers of a single frame as columns of coordinates, colors and labels.
+    The payload is shipped in the figure layout meta and turned into plotly shapes and annotations by a clientside callback,
+    instead of an add_shape / add_annotation call per element on the server. Same order as drawing layer by layer.
+    """
+
+    def __init__(self, font: str = FontFamily.Arial):
+        self.__font = font
+        self.rects = dict(x0=[], y0=[], x1=[], y1=[], color=[], width=[])
+        self.texts = dict(x=[], y=[], text=[], color=[], size=[], align=[])
+
+    def __len__(self) -> int:
+        return len(self.rects['x0']) + len(self.texts['x'])
+
+    def add_layer_elements(self, rects: list[GUIRect], texts: list[GUIText]) -> None:
+        for rect in rects:
+            self.rects['x0'].append(round(rect.left, COORDINATES_DECIMALS))
+            self.rects['y0'].append(round(rect.top, COORDINATES_DECIMALS))
+            self.rects['x1'].append(round(rect.right, COORDINATES_DECIMALS))
+            self.rects['y1'].append(round(rect.bottom, COORDINATES_DECIMALS))
+            self.rects['color'].append(rect.color)
+            self.rects['width'].append(rect.line_width)
+        for text in texts:
+            # Same paper coordinates as PlotLayerBase.draw_text
+            self.texts['x'].append(round(text.x / PLOT_WIDTH, PAPER_COORDINATES_DECIMALS))
+            self.texts['y'].append(round(1 - text.y / PLOT_HEIGHT, PAPER_COORDINATES_DECIMALS))
+            self.texts['text'].append(str(text.text_message))
+            self.texts['color'].append(text.color)
+            self.texts['size'].append(text.font_size)
+            self.texts['align'].append(text.align)
+
+    def to_dict(self) -> dict:
+        return {'font': self.__font, 'rects': self.rects, 'texts': self.texts}
+
+
+def payload_to_shapes(payload: dict) -> tuple[list[dict], list[dict]]:
+    """
+    The shapes and annotations the clientside callback creates from the payload, same as PlotLayerBase.create_rect_in_plotly
+    and create_text_in_plotly
+    :return: shapes, annotations
+    """
+    rects, texts = payload['rects'], payload['texts']
+    shapes = [dict(type='rect', x0=x0, y0=y0, x1=x1, y1=y1, line=dict(color=color, width=width))
+              for x0, y0, x1, y1, color, width in zip(rects['x0'], rects['y0'], rects['x1'], rects['y1'], rects['color'],
+                                                      rects['width'])]
+    annotations = [dict(text=text, xref='paper', yref='paper', x=x, y=y, showarrow=False,
+                        font=dict(color=color, size=size, family=payload['font']), align=align)
+                   for x, y, text, color, size, align in zip(texts['x'], texts['y'], texts['text'], texts['color'], texts['size'],
+                                                             texts['align'])]
+    return shapes, annotations
@@ -3,14 +3,16 @@ import os
 import logging
 import time
 from dash.html import Div
-from matplotlib import colors
 from plotly.graph_objects import Figure
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
 import pandas as pd
 from PluginSheldonVision.MetaDataHandler import MetaDataHandler, MetaDataType
 from PluginSheldonVision.Constants import KEYS, TENTH_SECOND, Color, FontFamily, Font, PRIMARY_GENERAL_DIV, SECONDARY_GENERAL_DIV, \
     PLOT_WIDTH, PLOT_HEIGHT, ONLINE_FONT_SIZE, HEADER, EMULATED_RESOLUTION, EMUMLATION_MATRIX
 from PluginSheldonVision.PlotLayers.Elements import Box, GUIRect, GUIText
+from PluginSheldonVision.PlotLayers.BoxesRasterizer import draw_rects
+from PluginSheldonVision.PlotLayers.LayersCompositor import LayersDisplayList, get_font, get_text_color
+from PluginSheldonVision.PlotLayers.LayersShapesPayload import LayersShapesPayload
 import numpy as np
 
 DEFAULT_DATA = {"name": "No Data available for this frame number"}
@@ -116,6 +118,13 @@ class PlotLayerBase:
             self.image_with_layers = frame_data.copy()
         else:
             self.figure_with_layers = Figure(frame_data)
+        self.set_frame_metadata(frame_number)
+
+    def set_frame_metadata(self, frame_number: int) -> None:
+        """
+        Set the frame number and its metadata without keeping a copy of the frame, for drawing through a LayersDisplayList
+        :param frame_number: frame numer
+        """
         self.frame_number = frame_number
         self.frame_metadata = self.meta_data_handler.get_data_by_frame_number(frame_number)
         #TODO: Find an indication that a new metadata file is loaded, so the resolution in it can be checked instead of this flag
@@ -129,8 +138,12 @@ class PlotLayerBase:
                 self.frame_size_check[metadata_type.value] = not updated
 
     def draw_layer_GUI_elements(self, image: Image.Image | Figure , is_online_mode) -> Image.Image | Figure:
-        for GUI_element in self.all_GUI_elements[RECTS]:
-            image = self.draw_rectangular(image, GUI_element, is_online_mode)
+        if is_online_mode:
+            # All the layer rectangles are rasterized at once
+            image = draw_rects(image, self.all_GUI_elements[RECTS])
+        else:
+            for GUI_element in self.all_GUI_elements[RECTS]:
+                image = self.draw_rectangular(image, GUI_element, is_online_mode)
         for GUI_element in self.all_GUI_elements[TEXT]:
             image = self.draw_text(image, GUI_element, is_online_mode)
         return image
@@ -159,6 +172,16 @@ class PlotLayerBase:
 
         return image
 
+    def add_to_display_list(self, display_list: LayersDisplayList | LayersShapesPayload, meta_data_type: MetaDataType) -> None:
+        """
+        Add the layer GUI elements of the current frame to the display list, the layer doesn't draw them
+        :param display_list: display list or shapes payload of all the active layers
+        :param meta_data_type: metadata for specific frame
+        """
+        self.reset_GUI_elemets()
+        self.add_layer_content(meta_data_type)
+        display_list.add_layer_elements(self.all_GUI_elements[RECTS], self.all_GUI_elements[TEXT])
+
     @staticmethod
     def create_rect_in_pil(image: Image.Image, x0: float, x1: float, y0: float, y1: float, color: Color,
                            width: int = 3 + PIL_PLOTLY_WIDTH_OFFSET) -> Image.Image:
@@ -193,9 +216,7 @@ class PlotLayerBase:
         :return: image with text
         """
         draw = ImageDraw.Draw(image)
-        rgb_color = tuple([int(c * 256) for c in colors.to_rgb(color)])
-        my_font = ImageFont.truetype(font, font_size)
-        draw.text((x, y), str(text_message), font=my_font, fill=rgb_color)#, align=align)
+        draw.text((x, y), str(text_message), font=get_font(font, font_size), fill=get_text_color(color))#, align=align)
 
         return image
 
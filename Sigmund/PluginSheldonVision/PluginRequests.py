@@ -0,0 +1,121 @@
+import itertools
+from concurrent.futures import CancelledError, Future, InvalidStateError, TimeoutError
+from threading import Lock
+from typing import Hashable
+
+
+class PluginRequest:
+    """
+    A single request sent to another plugin, resolved when its reply is received
+    """
+
+    def __init__(self, request_id: int, reply_type: str, key: Hashable = None, context: str | None = None):
+        """
+        :param request_id: Correlation id of the request
+        :param reply_type: Message type of the expected reply
+        :param key: Expected reply key (e.g. frame number), None accepts any reply of the given type
+        :param context: Free text describing who is waiting on the request
+        """
+        self.request_id = request_id
+        self.reply_type = reply_type
+        self.key = key
+        self.context = context
+        self.future: Future = Future()
+
+    def result(self, timeout: float | None = None):
+        """
+        Wait for the reply
+        :raise TimeoutError: if the reply wasn't received in time
+        :raise CancelledError: if the request was cancelled
+        """
+        return self.future.result(timeout=timeout)
+
+    def done(self) -> bool:
+        return self.future.done()
+
+
+class PluginRequestsTracker:
+    """
+    Assign correlation ids to outgoing requests and resolve them as replies arrive.
+    The players don't echo the correlation id back, so a reply resolves every pending request of its type waiting for the
+    reply key and the oldest pending request of its type which accepts any key. Several requests can be in flight at once.
+    """
+
+    def __init__(self):
+        self.__ids = itertools.count(1)
+        self.__pending: dict[str, list[PluginRequest]] = {}
+        self.__lock = Lock()
+        self.timeouts_count = 0
+
+    def create_request(self, reply_type: str, key: Hashable = None, context: str | None = None) -> PluginRequest:
+        request = PluginRequest(next(self.__ids), reply_type, key, context)
+        with self.__lock:
+            self.__pending.setdefault(reply_type, []).append(request)
+        return request
+
+    def resolve(self, reply_type: str, value, key: Hashable = None) -> list[PluginRequest]:
+        """
+        Resolve the pending requests waiting for the given reply
+        :return: The resolved requests, empty list if the reply wasn't requested
+        """
+        with self.__lock:
+            pending_requests = self.__pending.get(reply_type, [])
+            resolved_requests = [request for request in pending_requests if request.key is not None and request.key == key]
+            any_key_request = next((request for request in pending_requests if request.key is None), None)
+            if any_key_request:
+                resolved_requests.append(any_key_request)
+            for request in resolved_requests:
+                pending_requests.remove(request)
+        for request in resolved_requests:
+            try:
+                request.future.set_result(value)
+            except InvalidStateError:
+                # The waiter gave up on this request while the reply was being resolved
+                pass
+        return resolved_requests
+
+    def wait(self, request: PluginRequest, timeout: float | None, default=None, discard_on_timeout: bool = True):
+        """
+        Wait for the request reply
+        :param request: Request to wait for
+        :param timeout: Timeout in seconds, None waits forever
+        :param default: Value to return on timeout
+        :param discard_on_timeout: Stop tracking the request on timeout, otherwise a late reply is still consumed by this request
+        """
+        try:
+            return request.result(timeout)
+        except TimeoutError:
+            self.timeouts_count += 1
+            if discard_on_timeout:
+                self.discard(request)
+            return default
+        except CancelledError:
+            return default
+
+    def discard(self, request: PluginRequest) -> None:
+        with self.__lock:
+            pending_requests = self.__pending.get(request.reply_type, [])
+            if request not in pending_requests:
+                return
+            pending_requests.remove(request)
+        request.future.cancel()
+
+    def cancel_all(self, reply_type: str | None = None, context: str | None = None) -> None:
+        """
+        Cancel pending requests, optionally only the ones of the given reply type and / or context
+        """
+        with self.__lock:
+            reply_types = [reply_type] if reply_type else list(self.__pending.keys())
+            cancelled_requests = []
+            for pending_type in reply_types:
+                pending_requests = self.__pending.get(pending_type, [])
+                cancelled_requests.extend(request for request in pending_requests if context is None or request.context == context)
+                self.__pending[pending_type] = [request for request in pending_requests if request not in cancelled_requests]
+        for request in cancelled_requests:
+            request.future.cancel()
+
+    def pending_count(self, reply_type: str | None = None) -> int:
+        with self.__lock:
+            if reply_type:
+                return len(self.__pending.get(reply_type, []))
+            return sum(len(pending_requests) for pending_requests in self.__pending.values())
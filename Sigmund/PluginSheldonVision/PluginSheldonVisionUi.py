@@ -2,15 +2,20 @@ import argparse
 import sys
 import os
 import re
+import time
 import traceback
+import uuid
 import webbrowser
-from threading import Thread, Event, Timer
+from concurrent.futures import ThreadPoolExecutor
+from queue import Empty
+from threading import Thread, Timer
 from PyPluginBase.SigmundPluginBase import SigmundPluginBase
 from PyPluginBase.Transport import ISigmundTransport
 from PyPluginBase.ProtosParser import ProtosParser
-from flask import Flask, Response, request
+from PyPluginBase.SigmundMsg import SigmundMsg
+from flask import Flask, Response, request, jsonify, send_file
+from flask_sock import Sock, ConnectionClosed
 from plotly.graph_objs import Figure
-from queue import Queue
 from winreg import HKEY_CURRENT_USER, QueryValueEx, OpenKey
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
@@ -19,65 +24,145 @@ from PluginSheldonVision.Constants import NO_FRAME_SELECTED, CAMERA_FRAMES_MESSA
     PATH_STATUS_MSG, GET_TOTAL_VIDEO_FRAMES_MSG_NAME, PLAY_MESSAGE, SET_FRAME_MESSAGE, PAUSE_MESSAGE, PREVIOUS_FRAME_MESSAGE, \
     NEXT_FRAME_MESSAGE, STOP_MESSAGE, LOAD_REQUEST_MESSAGE, GET_CURRENT_FRAME_MESSAGE, SET_FRAME_PER_SECOND, GET_FRAME_PER_SECOND, \
     FPS_STATUS_MESSAGE, FINISH_UPLOAD_FILE_MSG_TYPE, FINISH_DOWNLOAD_FILE_MSG_TYPE, AZURE_BLOB_MSG_TYPE, AZURE_BLOB_MSG_DOWNLOAD_TYPE, \
-    FILES_LIST_IN_BLOB_REQUEST, FILES_LIST_IN_BLOB_RESPONSE
+    FILES_LIST_IN_BLOB_REQUEST, FILES_LIST_IN_BLOB_RESPONSE, SHARED_MEMORY_FRAME_MESSAGE_TYPE
+from PluginSheldonVision.AdaptiveStreaming import AdaptiveStreamController, StreamClientsRegistry
+from PluginSheldonVision.FrameBroadcastBus import FrameBroadcastBus, FrameSubscription
+from PluginSheldonVision.FrameCache import FrameCache
+from PluginSheldonVision.Exceptions import FrameOverwritten
+from PluginSheldonVision.FrameDecoder import frame_to_jpeg, is_frame_valid
+from PluginSheldonVision.FrameStreamProtocol import pack_frame_message
+from PluginSheldonVision.MessageDispatcher import MessageDispatcher
+from PluginSheldonVision.OrderedRenderPipeline import OrderedRenderPipeline
+from PluginSheldonVision.PipelineMetrics import pipeline_metrics, PipelineStage
+from PluginSheldonVision.PluginRequests import PluginRequest, PluginRequestsTracker
+from PluginSheldonVision.KeyframeIndex import get_video_hash
+from PluginSheldonVision.SharedMemoryFrames import FrameDescriptor, SharedMemoryFrame, SharedMemoryFrameRing
+from PluginSheldonVision.ThumbnailSprites import ThumbnailSpriteGenerator
 from PluginSheldonVision.PluginSheldonVisionUiDashModule import *
 from SheldonCommon.Constants import EMPTY_STRING, TIMEOUT_BEFORE_OPEN_SHELDON_TAB_IN_SEC
 from SigmundProtobufPy.AzureBlobProto_pb2 import AzureBlobUploadProto, AzureBlobUploadStatusEnum, AzureBlobDownloadProto, \
     AzureBlobDownloadStatusEnum
 
 server = Flask(__name__)
-FramesQueue = Queue()
-e_frame_paused_md = {
-    MetaDataType.PRIMARY: Event(),
-    MetaDataType.SECONDARY: Event()
-}
+sock = Sock(server)
+FRAMES_SOCKET_FLASK_ROUTE = '/video_socket/<view>'
+FRAMES_SOCKET_ROUTE = '/video_socket/{view}'
+THUMBNAILS_SPRITE_ROUTE = '/thumbnails/{video_hash}.jpg'
+THUMBNAILS_SPRITE_MAX_AGE_SECONDS = 24 * 60 * 60
+FRAME_IMAGE_FLASK_ROUTE = '/frame/<video_id>/<int:frame_number>.jpg'
+FRAME_IMAGE_ROUTE = '/frame/{video_id}/{frame_number}.jpg'
+FRAME_IMAGE_MAX_AGE_SECONDS = 24 * 60 * 60
+FRAME_WAIT_TIMEOUT_SECONDS = 1
+FRAME_SOURCE_PLUGIN = 'plugin'
+FRAME_SOURCE_PYTHON = 'python'
+FRAME_SOURCE_PYTHON_KEYFRAME_INDEX = 'python_keyframe_index'
+FramesBus = FrameBroadcastBus(SheldonVisionConstants.FRAMES_BUFFER_CAPACITY)
 current_frame_number: int | None = None
 current_frame = None
+PREFETCH_REQUEST_CONTEXT = 'Prefetch'
+plugin = None
+adaptive_streaming = False
+StreamClients = StreamClientsRegistry()
+# PIL releases the GIL while decoding and encoding, so the frames of all the streams are rendered concurrently
+RenderPool = ThreadPoolExecutor(max_workers=SheldonVisionConstants.RENDER_PIPELINE_THREADS, thread_name_prefix='FrameRender')
+METRICS_CONTENT_TYPE = 'text/plain; version=0.0.4'
+pipeline_metrics.register_gauge('frames_queue_depth', 'Frames waiting in each viewer backlog', 'subscriber',
+                                lambda: {name: counters['size'] for name, counters in FramesBus.get_subscribers_counters().items()})
+pipeline_metrics.register_counter('frames_dropped', 'Frames dropped from a full viewer backlog', 'subscriber',
+                                  lambda: {name: counters['dropped'] for name, counters in FramesBus.get_subscribers_counters().items()})
+pipeline_metrics.register_counter('frames_skipped', 'Stale frames skipped by adaptive viewers', 'subscriber',
+                                  lambda: {name: counters['skipped'] for name, counters in FramesBus.get_subscribers_counters().items()})
+
+
+def take_frame(subscription: FrameSubscription, stream: AdaptiveStreamController, block: bool = True):
+    """
+    Take the next frame of a view from its own subscription, every viewer is woken up by its own subscription
+    :param block: Wait up to FRAME_WAIT_TIMEOUT_SECONDS for a frame, otherwise return None if there is no frame to take
+    :return: (frame, frame number, timestamp the frame was taken from the frames bus) or None
+    """
+    timeout = FRAME_WAIT_TIMEOUT_SECONDS if block else None
+    try:
+        if stream.is_adaptive:
+            # Always send the newest frame, stale frames of a slow client are skipped
+            skipped_count = subscription.skipped_count
+            frame, frame_number = subscription.get_latest(block=block, timeout=timeout)
+            stream.on_frame_received(subscription.skipped_count - skipped_count)
+        else:
+            frame, frame_number = subscription.get(block=block, timeout=timeout)
+    except Empty:
+        return None
+    pipeline_metrics.on_frame_dequeued(frame_number)
+    return frame, frame_number, time.time()
+
+
+def get_rendered_frames(meta_data_type: MetaDataType = MetaDataType.PRIMARY):
+    """
+    Render the frames received for the given view with their layers.
+    Several frames are rendered concurrently by the render pool and sent in frame order, new frames are taken only while
+    the stream consumer keeps up with the rendered frames
+    :return: Generator of (JPEG frame, frame number, timestamp the frame was taken from the frames bus)
+    """
+    subscription = FramesBus.subscribe(meta_data_type.value)
+    stream = AdaptiveStreamController(meta_data_type.value, is_adaptive=adaptive_streaming)
+    stream_id = StreamClients.register(stream)
+    render_pipeline = OrderedRenderPipeline(RenderPool)
+    try:
+        while True:
+            try:
+                # Wait for a frame only when nothing is being rendered, otherwise take the frames which are already waiting
+                while not render_pipeline.is_full:
+                    taken_frame = take_frame(subscription, stream, block=len(render_pipeline) == 0)
+                    if taken_frame is None:
+                        break
+                    frame, frame_number, received_timestamp = taken_frame
+                    if not frame:
+                        continue
+                    render_pipeline.submit((frame_number, received_timestamp), main_sheldonUi.create_online_graph, frame, frame_number,
+                                           meta_data_type, stream.jpeg_quality, stream.scale)
+                if len(render_pipeline) == 0:
+                    continue
+                current_frame_with_layers, (frame_number, received_timestamp) = render_pipeline.get_next()
+                if type(current_frame_with_layers) is Figure:
+                    continue
+                send_start = pipeline_metrics.now()
+                try:
+                    yield current_frame_with_layers, frame_number, received_timestamp
+                except GeneratorExit:
+                    # This may happen while the loop is running no component available for update.
+                    # For example, on page refresh
+                    return
+                else:
+                    pipeline_metrics.observe_since(PipelineStage.SEND, send_start)
+                    stream.on_frame_sent()
+                    continue
+            except:
+                traceback_string = traceback.format_exc()
+                main_sheldonUi.notifications.notify_error(title='Get Frames From Queue',
+                                                          body="An exception raised during reading queue, see logs for more details")
+                main_sheldonUi.log_method(logging.ERROR, traceback_string)
+    finally:
+        render_pipeline.cancel()
+        FramesBus.unsubscribe(subscription)
+        StreamClients.unregister(stream_id)
 
 
 def get_frames_from_queue(meta_data_type: MetaDataType = MetaDataType.PRIMARY):
-    global current_frame_number
-    global current_frame
-    while True:
-        try:
-            e_frame_paused_md[meta_data_type].wait()
-            e_frame_paused_md[meta_data_type].clear()
-            if meta_data_type == MetaDataType.PRIMARY:
-                current_frame, current_frame_number = FramesQueue.get()
-
-            if not current_frame:
-                e_frame_paused_md[meta_data_type].clear()
-                continue
-            current_frame_with_layers = main_sheldonUi.create_online_graph(current_frame,
-                                                                           current_frame_number,
-                                                                           meta_data_type)
-            if type(current_frame_with_layers) is Figure:
-                e_frame_paused_md[meta_data_type].clear()
-                continue
-            try:
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + current_frame_with_layers + b'\r\n\r\n')
-            except GeneratorExit:
-                # This may happen while the loop is running no component available for update.
-                # For example, on page refresh
-                return
-            else:
-                continue
-        except:
-            traceback_string = traceback.format_exc()
-            main_sheldonUi.notifications.notify_error(title='Get Frames From Queue',
-                                                      body="An exception raised during reading queue, see logs for more details")
-            main_sheldonUi.log_method(logging.ERROR, traceback_string)
-            get_frames_from_queue()
+    rendered_frames = get_rendered_frames(meta_data_type)
+    try:
+        for frame, _, _ in rendered_frames:
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n\r\n')
+    finally:
+        rendered_frames.close()
+
 
 def clear_frames_queue(clear_queue_only: bool = False):
     global current_frame_number
     global current_frame
-    with FramesQueue.mutex:
-        if not clear_queue_only:
-            current_frame_number = 0
-            current_frame = None
-        FramesQueue.queue.clear()
+    if not clear_queue_only:
+        current_frame_number = 0
+        current_frame = None
+    FramesBus.clear()
 
 
 @server.route('/video_feed_primary')
@@ -92,6 +177,23 @@ def video_feed_secondary():
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
 
+@sock.route(FRAMES_SOCKET_FLASK_ROUTE)
+def video_socket(ws, view):
+    """
+    Push the rendered frames of the given view as binary messages, each one carries its own frame number
+    """
+    meta_data_type = MetaDataType(view)
+    rendered_frames = get_rendered_frames(meta_data_type)
+    try:
+        for frame, frame_number, received_timestamp in rendered_frames:
+            ws.send(pack_frame_message(meta_data_type, frame_number, frame, received_timestamp))
+    except ConnectionClosed:
+        # The page was refreshed or closed
+        return
+    finally:
+        rendered_frames.close()
+
+
 @server.route('/autorun_from_mail')
 def autorun_from_mail():
     video_path = request.args.get('video_path')
@@ -107,8 +209,76 @@ def load_jump():
     return Response(main_sheldonUi.handle_load_jump_http(jump_path))
 
 
+@server.route('/stream_stats')
+def stream_stats():
+    return jsonify(StreamClients.get_stats())
+
+
+@server.route('/dispatch_stats')
+def dispatch_stats():
+    return jsonify(plugin.get_dispatch_stats() if plugin else {})
+
+
+@server.route('/metrics')
+def metrics():
+    """
+    Pipeline metrics in Prometheus text format, or as JSON with ?format=json
+    """
+    if request.args.get('format') == 'json':
+        return jsonify(pipeline_metrics.get_stats())
+    return Response(pipeline_metrics.to_prometheus(), mimetype=METRICS_CONTENT_TYPE)
+
+
+@server.route('/static_frames_stats')
+def static_frames_stats():
+    return jsonify(main_sheldonUi.get_static_frames_stats())
+
+
+@server.route('/thumbnails')
+def thumbnails_index():
+    index = plugin.thumbnail_sprites.get_index(plugin.loaded_video_path) if plugin else None
+    if index is None:
+        return Response(status=404)
+    return jsonify(dict(index, sprite_url=THUMBNAILS_SPRITE_ROUTE.format(video_hash=index['video_hash'])))
+
+
+@server.route('/thumbnails/<video_hash>.jpg')
+def thumbnails_sprite(video_hash):
+    sprite_path = os.path.abspath(plugin.thumbnail_sprites.get_sprite_path(video_hash)) if plugin else ''
+    if not re.fullmatch('[0-9a-f]+', video_hash) or not os.path.isfile(sprite_path):
+        return Response(status=404)
+    # The video hash changes with the video file, so a sprite never changes
+    return send_file(sprite_path, mimetype='image/jpeg', max_age=THUMBNAILS_SPRITE_MAX_AGE_SECONDS)
+
+
+@server.route(FRAME_IMAGE_FLASK_ROUTE)
+def frame_image(video_id, frame_number):
+    """
+    A frame of the loaded video at the plot size, referenced by URL from the offline graphs so the browser caches the frames
+    """
+    # The video id changes with the loaded video, so the image of a frame never changes
+    etag = f'{video_id}-{frame_number}'
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        frame_image = plugin.get_frame_image(video_id, frame_number) if plugin else None
+        if frame_image is None:
+            return Response(status=404)
+        response = Response(frame_image, mimetype='image/jpeg')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f'private, max-age={FRAME_IMAGE_MAX_AGE_SECONDS}, immutable'
+    return response
+
+
+def set_current_frame(msg, frame_number):
+    global current_frame_number
+    global current_frame
+    current_frame, current_frame_number = msg, frame_number
+
+
 def store_data(msg, frame_number):
-    FramesQueue.put((msg, frame_number))
+    set_current_frame(msg, frame_number)
+    FramesBus.publish(msg, frame_number)
 
 
 class SheldonVisionUiPlugin(SigmundPluginBase):
@@ -117,57 +287,164 @@ class SheldonVisionUiPlugin(SigmundPluginBase):
         self.query_cycle_range = None
         self.frames_range = NO_FRAME_SELECTED
         self._proto_parser = ProtosParser()
-        self.frames_range_received = Event()
-        self.frame_received = Event()
-        self.path_check_received = Event()
-        self.frame_per_second_received = Event()
-        self.finish_upload_received = Event()
-        self.finish_download_received = Event()
-        self.get_files_list_blob = Event()
+        self.requests = PluginRequestsTracker()
+        self.load_request: PluginRequest | None = None
         self.recording_information = None
         self.reload_application_callback = None
         self.path_status = None
         self.fps_status = None
         self.files_on_blob = []
+        self.frames_cache = FrameCache(SheldonVisionConstants.FRAMES_CACHE_MAX_BYTES)
+        # Plot size JPEG of the frames referenced by URL, keyed by URL
+        self.frame_images = FrameCache(SheldonVisionConstants.FRAME_IMAGES_CACHE_MAX_BYTES)
+        self.loaded_video_path = None
+        self.loaded_video_id = None
+        self.player_frame_number = None
+        self.shared_memory_frames: SharedMemoryFrameRing | None = None
+        self.__shared_memory_sequence = 0
+        self.frame_source = None
+        self.frame_source_name: str | None = None
+        self.thumbnail_sprites = ThumbnailSpriteGenerator()
+        self.dispatcher = MessageDispatcher(self.__on_message_handler_error)
+        self.__register_message_handlers()
 
     def plugin_logic(self):
-        message = self.get_next_message()
-        try:
-            if message.msg_type == TOTAL_VIDEO_FRAMES_MSG_NAME:
-                if message.get_string_message():
-                    total_frames_strings = message.get_string_message()
-                    self.frames_range = [0, int(total_frames_strings)]
-                self.frames_range_received.set()
-            if message.msg_type == CAMERA_FRAMES_MESSAGE_TYPE:
-                store_data(message.msg, int(message.msg_metadata))
-                self.frame_received.set()
-                for event in e_frame_paused_md.values():
-                    event.set()
-            if message.msg_type == PATH_STATUS_MSG:
-                self.path_status = message.get_string_message()
-                self.path_check_received.set()
-            if message.msg_type == FPS_STATUS_MESSAGE:
-                self.fps_status = int(message.get_string_message())
-                self.frame_per_second_received.set()
-            if message.msg_type == FINISH_UPLOAD_FILE_MSG_TYPE:
-                self.finish_upload_received.set()
-            if message.msg_type == FINISH_DOWNLOAD_FILE_MSG_TYPE:
-                self.finish_download_received.set()
-            if message.msg_type == AZURE_BLOB_MSG_TYPE:
-                self.on_error_azure_received(message.msg, AzureBlobUploadProto)
-            if message.msg_type == AZURE_BLOB_MSG_DOWNLOAD_TYPE:
-                self.on_error_azure_received(message.msg, AzureBlobDownloadProto)
-            if message.msg_type == FILES_LIST_IN_BLOB_RESPONSE:
-                self.get_files_list_on_blob(message.msg)
-                self.get_files_list_blob.set()
-        except:
-            traceback_string = traceback.format_exc()
-            self.send_log(logging.ERROR, traceback_string)
-            main_sheldonUi.notifications.notify_error(title='Plugin Logic',
-                                                      body=f'An exception raised on plugin logic, see logs for more details')
-
-    def get_files_list_on_blob(self, files_list):
+        self.dispatcher.dispatch(self.get_next_message())
+
+    def __register_message_handlers(self):
+        self.dispatcher.register(TOTAL_VIDEO_FRAMES_MSG_NAME, self.on_total_video_frames_received)
+        self.dispatcher.register(CAMERA_FRAMES_MESSAGE_TYPE, self.on_camera_frame_received)
+        self.dispatcher.register(PATH_STATUS_MSG, self.on_path_status_received)
+        self.dispatcher.register(FPS_STATUS_MESSAGE, self.on_fps_status_received)
+        self.dispatcher.register(FINISH_UPLOAD_FILE_MSG_TYPE,
+                                 lambda message: self.requests.resolve(FINISH_UPLOAD_FILE_MSG_TYPE, True))
+        self.dispatcher.register(FINISH_DOWNLOAD_FILE_MSG_TYPE,
+                                 lambda message: self.requests.resolve(FINISH_DOWNLOAD_FILE_MSG_TYPE, True))
+        # Slow handlers, run off the transport thread so frames never wait behind them
+        self.dispatcher.register(AZURE_BLOB_MSG_TYPE,
+                                 lambda message: self.on_error_azure_received(message.msg, AzureBlobUploadProto), is_async=True)
+        self.dispatcher.register(AZURE_BLOB_MSG_DOWNLOAD_TYPE,
+                                 lambda message: self.on_error_azure_received(message.msg, AzureBlobDownloadProto), is_async=True)
+        self.dispatcher.register(FILES_LIST_IN_BLOB_RESPONSE, self.on_files_list_on_blob_received, is_async=True)
+
+    def __on_message_handler_error(self, msg_type: str, traceback_string: str):
+        self.send_log(logging.ERROR, traceback_string)
+        main_sheldonUi.notifications.notify_error(title='Plugin Logic',
+                                                  body=f'An exception raised on plugin logic while handling {msg_type}, '
+                                                       f'see logs for more details')
+
+    def on_total_video_frames_received(self, message):
+        frames_range = self.frames_range
+        if message.get_string_message():
+            total_frames_strings = message.get_string_message()
+            frames_range = [0, int(total_frames_strings)]
+            self.frames_range = frames_range
+        self.requests.resolve(TOTAL_VIDEO_FRAMES_MSG_NAME, frames_range)
+
+    def on_camera_frame_received(self, message):
+        receive_start = pipeline_metrics.now()
+        self.__on_frame_received(message.msg, int(message.msg_metadata))
+        pipeline_metrics.observe_since(PipelineStage.RECEIVE, receive_start)
+
+    def on_shared_memory_frame_received(self, message):
+        receive_start = pipeline_metrics.now()
+        if self.shared_memory_frames is None:
+            return
+        descriptor = FrameDescriptor.from_message(message.get_string_message())
+        # A restarted capture source creates the ring again and starts its sequence over, the new ring is mapped instead
+        if descriptor.sequence <= self.__shared_memory_sequence:
+            self.send_log(logging.INFO, f'Shared memory frames sequence restarted, attaching {self.shared_memory_frames.name} again')
+            self.attach_shared_memory_frames(self.shared_memory_frames.name)
+        self.__shared_memory_sequence = descriptor.sequence
+        # The frame stays on its slot until it's decoded, decoding a frame whose slot was overwritten meanwhile fails
+        frame = SharedMemoryFrame(self.shared_memory_frames, descriptor)
+        if not frame.is_valid():
+            self.send_log(logging.WARNING, f'Frame {descriptor.frame_number} was overwritten on the shared memory before it was read')
+            return
+        self.__on_frame_received(frame, descriptor.frame_number)
+        pipeline_metrics.observe_since(PipelineStage.RECEIVE, receive_start)
+
+    def __on_frame_received(self, frame, frame_number: int):
+        self.player_frame_number = frame_number
+        self.frames_cache.put((self.loaded_video_path, frame_number), frame)
+        resolved_requests = self.requests.resolve(CAMERA_FRAMES_MESSAGE_TYPE, frame, key=frame_number)
+        # Read-ahead frames only warm the cache, they are not displayed
+        if not resolved_requests or any(request.context != PREFETCH_REQUEST_CONTEXT for request in resolved_requests):
+            pipeline_metrics.on_frame_received(frame_number)
+            store_data(frame, frame_number)
+
+    def attach_frame_source(self, use_keyframe_index: bool = False, raw_frames: bool = False):
+        """
+        Play videos with the in process Python frame source instead of the player plugin, player messages become direct calls
+        :param use_keyframe_index: Read videos through a persisted keyframe index, for fast seeking on long clips
+        :param raw_frames: Receive the decoded BGR frames as is, they are encoded only once the layers are drawn
+        """
+        # The Python frame source needs opencv and PyAV, which the UI doesn't need with the player plugin
+        from PluginSheldonVision.KeyframeIndex import KeyframeIndexedVideoReader
+        from PluginSheldonVision.PythonFrameSource import VideoFileFrameSource, OpenCvVideoReader, FRAME_SOURCE_NAME
+
+        self.frame_source_name = FRAME_SOURCE_NAME
+        self.frame_source = VideoFileFrameSource(self.on_frame_source_message, self.send_log,
+                                                 reader_factory=KeyframeIndexedVideoReader if use_keyframe_index else OpenCvVideoReader,
+                                                 raw_frames=raw_frames)
+
+    def on_frame_source_message(self, msg_type: str, msg, metadata: str = ''):
+        self.dispatcher.dispatch(SigmundMsg(msg_type, self.frame_source_name, msg, metadata))
+
+    def send_message(self, message_type: str, message, metadata=""):
+        if self.frame_source and self.frame_source.handle_message(message_type, message):
+            return
+        SigmundPluginBase.send_message(self, message_type, message, metadata)
+
+    def attach_shared_memory_frames(self, shared_memory_name: str):
+        """
+        Receive frames through the given shared memory ring, the capture source sends only the frames descriptors.
+        A previously attached ring is closed, its frames fail to decode from now on
+        """
+        is_attached = self.shared_memory_frames is not None
+        self.detach_shared_memory_frames()
+        self.shared_memory_frames = SharedMemoryFrameRing(shared_memory_name)
+        if not is_attached:
+            self.dispatcher.register(SHARED_MEMORY_FRAME_MESSAGE_TYPE, self.on_shared_memory_frame_received)
+
+    def detach_shared_memory_frames(self):
+        if self.shared_memory_frames is not None:
+            self.shared_memory_frames.close()
+            self.shared_memory_frames = None
+            self.__shared_memory_sequence = 0
+
+    def close_network(self, *args, **kwargs):
+        self.detach_shared_memory_frames()
+        SigmundPluginBase.close_network(self, *args, **kwargs)
+
+    def on_path_status_received(self, message):
+        self.path_status = message.get_string_message()
+        for request in self.requests.resolve(PATH_STATUS_MSG, self.path_status):
+            if self.path_status == SheldonVisionConstants.PathStatus.Valid.value:
+                self.set_loaded_video(request.context)
+
+    def set_loaded_video(self, video_path: str):
+        self.loaded_video_path = video_path
+        # Blob videos are streamed by the player, they get a new id on every load
+        self.loaded_video_id = get_video_hash(video_path) if os.path.isfile(video_path) else uuid.uuid4().hex
+        # Thumbnails are generated only for local files
+        if os.path.isfile(video_path):
+            self.thumbnail_sprites.generate_async(video_path)
+
+    def on_fps_status_received(self, message):
+        self.fps_status = int(message.get_string_message())
+        self.requests.resolve(FPS_STATUS_MESSAGE, self.fps_status)
+
+    def on_files_list_on_blob_received(self, message):
+        files_on_blob = self.get_files_list_on_blob(message.msg)
+        self.requests.resolve(FILES_LIST_IN_BLOB_RESPONSE, files_on_blob)
+
+    def get_dispatch_stats(self) -> dict:
+        return self.dispatcher.get_stats()
+
+    def get_files_list_on_blob(self, files_list) -> list[str]:
         self.files_on_blob = [x.decode("utf-8") for x in files_list.split()]
+        return self.files_on_blob
 
     def files_list_on_blob(self):
         return self.files_on_blob
@@ -191,28 +468,46 @@ class SheldonVisionUiPlugin(SigmundPluginBase):
             main_sheldonUi.notifications.notify_error(title='Sheldon Vision', body=f'Path not found - {file_path}')
         return file_path_with_base_path if os.path.exists(file_path_with_base_path) else file_path if os.path.exists(file_path) else None
 
-    def validate_path(self):
-        self.path_check_received.wait()
-        self.path_check_received.clear()
-        return self.path_status == SheldonVisionConstants.PathStatus.Valid.value
+    def validate_path(self, timeout_seconds: float = SheldonVisionConstants.PLUGIN_REQUEST_TIMEOUT_SECONDS):
+        if not self.load_request:
+            return False
+        path_status = self.requests.wait(self.load_request, timeout_seconds)
+        self.load_request = None
+        if path_status is None:
+            self.send_log(logging.ERROR, f'No {PATH_STATUS_MSG} received after {timeout_seconds} seconds')
+        return path_status == SheldonVisionConstants.PathStatus.Valid.value
 
     def get_recording_information_method(self):
         return self.recording_information
 
-    def get_frames_range(self):
-        self.frames_range_received.clear()
+    def get_frames_range(self, timeout_seconds: float = SheldonVisionConstants.PLUGIN_REQUEST_TIMEOUT_SECONDS):
+        request = self.requests.create_request(TOTAL_VIDEO_FRAMES_MSG_NAME)
         self.__send_get_frames_range()
-        self.frames_range_received.wait()
-
-        return self.frames_range
-
-    def send_get_files_list(self, blob_path):
-        self.files_on_blob = []
-        self.get_files_list_blob.clear()
+        frames_range = self.requests.wait(request, timeout_seconds)
+        if frames_range is None:
+            self.send_log(logging.ERROR, f'No {TOTAL_VIDEO_FRAMES_MSG_NAME} received after {timeout_seconds} seconds')
+            return NO_FRAME_SELECTED
+
+        return frames_range
+
+    def send_get_files_list(self, blob_path,
+                            timeout_seconds: float = SheldonVisionConstants.PLUGIN_REQUEST_TIMEOUT_SECONDS) -> list[str]:
+        """
+        :return: The files found on the blob path, empty list if no reply was received
+        """
+        request = self.requests.create_request(FILES_LIST_IN_BLOB_RESPONSE, context=blob_path)
         self.send_message(FILES_LIST_IN_BLOB_REQUEST, blob_path)
-        self.get_files_list_blob.wait()
+        files_on_blob = self.requests.wait(request, timeout_seconds)
+        if files_on_blob is None:
+            self.send_log(logging.ERROR, f'No {FILES_LIST_IN_BLOB_RESPONSE} received for {blob_path} after {timeout_seconds} seconds')
+            return []
+        return files_on_blob
 
     def send_play_message(self):
+        self.requests.cancel_all(CAMERA_FRAMES_MESSAGE_TYPE, context=PREFETCH_REQUEST_CONTEXT)
+        if self.player_frame_number is not None and current_frame_number != self.player_frame_number:
+            # The displayed frame was served from the frames cache, move the player to it before playing
+            self.send_message(SET_FRAME_MESSAGE, str(current_frame_number))
         self.send_message(PLAY_MESSAGE, EMPTY_STRING)
 
     def send_next_frame_message(self):
@@ -222,13 +517,9 @@ class SheldonVisionUiPlugin(SigmundPluginBase):
         self.send_message(PREVIOUS_FRAME_MESSAGE, EMPTY_STRING)
 
     def send_pause_message(self):
-        for event in e_frame_paused_md.values():
-            event.clear()
         self.send_message(PAUSE_MESSAGE, EMPTY_STRING)
 
     def send_set_frame_message(self, frame_number):
-        for event in e_frame_paused_md.values():
-            event.set()
         self.send_message(SET_FRAME_MESSAGE, str(frame_number))
 
     def send_stop_message(self):
@@ -238,53 +529,172 @@ class SheldonVisionUiPlugin(SigmundPluginBase):
         return current_frame_number
 
     def send_new_load_request(self, file_path):
-        self.send_message(LOAD_REQUEST_MESSAGE, file_path)
+        # The video may have changed since it was last loaded, reloading the same path must not serve its old frames
+        self.frames_cache.invalidate_video(file_path)
         self.path_status = None
+        self.load_request = self.requests.create_request(PATH_STATUS_MSG, context=file_path)
+        self.send_message(LOAD_REQUEST_MESSAGE, file_path)
 
     def __send_get_frames_range(self):
         self.send_message(GET_TOTAL_VIDEO_FRAMES_MSG_NAME, EMPTY_STRING)
 
-    def send_get_current_frame(self):
-        self.frame_received.clear()
+    def send_get_current_frame(self, frame_number: int | None = None,
+                               timeout_seconds: float = SheldonVisionConstants.FRAME_REQUEST_TIMEOUT_SECONDS):
+        """
+        Request the player current frame and wait for it to be received
+        :param frame_number: Expected frame number, None accepts any received frame
+        """
+        request = self.requests.create_request(CAMERA_FRAMES_MESSAGE_TYPE, key=frame_number)
         self.send_message(GET_CURRENT_FRAME_MESSAGE, EMPTY_STRING)
-        self.frame_received.wait()
+        if self.requests.wait(request, timeout_seconds) is None:
+            self.send_log(logging.WARNING, f'Frame {frame_number} not received after {timeout_seconds} seconds')
 
     def clear_frames_queue(self, clear_queue_only: bool = False):
+        if not clear_queue_only:
+            self.player_frame_number = None
+            self.requests.cancel_all(CAMERA_FRAMES_MESSAGE_TYPE, context=PREFETCH_REQUEST_CONTEXT)
         return clear_frames_queue(clear_queue_only)
 
+    def load_cached_frame(self, frame_number: int) -> bool:
+        """
+        Set the current frame from the frames cache without a round trip to the player
+        :param frame_number: Frame number as reported by the player
+        :return: True if the frame was found on cache
+        """
+        frame = self.__get_cached_frame(frame_number)
+        if frame is None:
+            return False
+        set_current_frame(frame, frame_number)
+        return True
+
+    def is_frame_cached(self, frame_number: int) -> bool:
+        return (self.loaded_video_path, frame_number) in self.frames_cache and self.__get_cached_frame(frame_number) is not None
+
+    def __get_cached_frame(self, frame_number: int):
+        """
+        :return: The cached frame, None on a cache miss or if the frame was overwritten on the shared memory
+        """
+        key = (self.loaded_video_path, frame_number)
+        frame = self.frames_cache.get(key)
+        if frame is not None and not is_frame_valid(frame):
+            self.frames_cache.invalidate(lambda cached_key: cached_key == key)
+            return None
+        return frame
+
+    def get_frame_url(self, frame_number: int) -> str | None:
+        """
+        :param frame_number: Frame number as reported by the player
+        :return: URL of the frame image, None if the frame isn't on cache
+        """
+        frame_image = self.encode_frame_image(frame_number)
+        return frame_image[0] if frame_image else None
+
+    def encode_frame_image(self, frame_number: int) -> tuple[str, bytes] | None:
+        """
+        Encode a cached frame at the plot size once, the frame image route serves the encoded image from then on
+        :param frame_number: Frame number as reported by the player
+        :return: (URL, JPEG) of the frame image, None if the frame isn't on cache
+        """
+        if self.loaded_video_id is None:
+            return None
+        frame_url = FRAME_IMAGE_ROUTE.format(video_id=self.loaded_video_id, frame_number=frame_number)
+        frame_image = self.frame_images.get(frame_url) or self.__encode_frame_image(frame_url, self.__get_cached_frame(frame_number))
+        return (frame_url, frame_image) if frame_image else None
+
+    def put_frame_image(self, frame_url: str, frame_image: bytes):
+        """
+        Serve the image of a frame again, a cached offline figure referencing it may outlive the frame on the frames cache
+        """
+        self.frame_images.put(frame_url, frame_image)
+
+    def get_frame_image(self, video_id: str, frame_number: int) -> bytes | None:
+        """
+        :return: The encoded image of a frame, encoded again only if it was evicted while the frame is still on cache.
+                 None if the video isn't loaded anymore and the image was evicted
+        """
+        frame_url = FRAME_IMAGE_ROUTE.format(video_id=video_id, frame_number=frame_number)
+        return self.frame_images.get(frame_url) or self.__encode_frame_image(frame_url, self.get_cached_frame(video_id, frame_number))
+
+    def __encode_frame_image(self, frame_url: str, frame) -> bytes | None:
+        if frame is None:
+            return None
+        try:
+            frame_image = frame_to_jpeg(frame, SheldonVisionConstants.PLOT_SIZE)
+        except FrameOverwritten:
+            return None
+        self.frame_images.put(frame_url, frame_image)
+        return frame_image
+
+    def get_cached_frame(self, video_id: str, frame_number: int):
+        """
+        :return: The frame of the loaded video from the frames cache, None if the video isn't loaded anymore or the frame was evicted
+        """
+        if video_id != self.loaded_video_id:
+            return None
+        frame = self.__get_cached_frame(frame_number)
+        if frame is None and frame_number == current_frame_number and is_frame_valid(current_frame):
+            frame = current_frame
+        return frame
+
+    def send_prefetch_frame_request(self, frame_number: int) -> PluginRequest:
+        """
+        Ask the player for a frame to fetch into the frames cache without displaying it
+        :param frame_number: Frame number as reported by the player
+        :return: The request, resolved once the frame is received
+        """
+        request = self.requests.create_request(CAMERA_FRAMES_MESSAGE_TYPE, key=frame_number, context=PREFETCH_REQUEST_CONTEXT)
+        self.send_message(SET_FRAME_MESSAGE, str(frame_number - 1))
+        self.send_message(GET_CURRENT_FRAME_MESSAGE, EMPTY_STRING)
+        return request
+
+    def wait_for_prefetched_frame(self, request: PluginRequest,
+                                  timeout_seconds: float = SheldonVisionConstants.PREFETCH_FRAME_TIMEOUT_SECONDS) -> bool:
+        """
+        :return: True if the prefetched frame was received before the timeout
+        """
+        # Keep tracking a late frame, so it won't be displayed as if it was requested by the UI
+        return self.requests.wait(request, timeout_seconds, discard_on_timeout=False) is not None
+
     def get_current_frame(self):
         return current_frame
 
-    def send_get_fps(self):
-        self.frame_per_second_received.clear()
+    def send_get_fps(self, timeout_seconds: float = SheldonVisionConstants.PLUGIN_REQUEST_TIMEOUT_SECONDS):
+        request = self.requests.create_request(FPS_STATUS_MESSAGE)
         self.send_message(GET_FRAME_PER_SECOND, EMPTY_STRING)
-        self.frame_per_second_received.wait()
+        fps = self.requests.wait(request, timeout_seconds)
+        if fps is None:
+            self.send_log(logging.ERROR, f'No {FPS_STATUS_MESSAGE} received after {timeout_seconds} seconds')
+            return SheldonVisionConstants.DEFAULT_FPS
 
-        return self.fps_status
+        return fps
 
     def send_set_fps(self, fps):
         self.send_message(SET_FRAME_PER_SECOND, str(fps))
 
-    def send_upload_file_to_blob(self, file_path: str, destination_path: str) -> str:
-        self.finish_upload_received.clear()
+    def send_upload_file_to_blob(self, file_path: str, destination_path: str, timeout_seconds: float | None = None) -> str:
+        """
+        :param timeout_seconds: None waits until the upload is finished, however long the file takes to upload
+        """
+        request = self.requests.create_request(FINISH_UPLOAD_FILE_MSG_TYPE, context=file_path)
         azure_proto = AzureBlobUploadProto()
         azure_proto.DestinationFolderPath = destination_path
         azure_proto.Command = AzureBlobUploadStatusEnum.StartUpload
         azure_proto.SourceFilePath.append(file_path)
         self.send_message(AZURE_BLOB_MSG_TYPE, azure_proto.SerializeToString())
-        self.finish_upload_received.wait()
+        if not self.requests.wait(request, timeout_seconds):
+            main_sheldonUi.notifications.notify_error(title='Upload To Blob', body=f'Failed to upload to blob - {file_path}')
+            return ''
         return f'{SheldonVisionConstants.SHELDON_VISION_BLOB_URL}/{SheldonVisionConstants.BLOB_CONTAINER_NAME}/{destination_path}/' \
                f'{os.path.basename(file_path)}'
 
     def send_download_file_from_blob(self, file_path: str, destination_path: str, timeout_seconds: float = 30) -> str:
-        self.finish_download_received.clear()
+        request = self.requests.create_request(FINISH_DOWNLOAD_FILE_MSG_TYPE, context=file_path)
         azure_proto = AzureBlobDownloadProto()
         azure_proto.DestinationFolderPath = destination_path
         azure_proto.Command = AzureBlobDownloadStatusEnum.StartDownload
         azure_proto.SourceFilePath.append(file_path)
         self.send_message(AZURE_BLOB_MSG_DOWNLOAD_TYPE, azure_proto.SerializeToString())
-        self.finish_download_received.wait(timeout=timeout_seconds)
-        if not self.finish_download_received.is_set():
+        if not self.requests.wait(request, timeout_seconds):
             error_message = f'Failed to download from blob, check given path - {file_path}'
             main_sheldonUi.notifications.notify_error(title='Download From Blob', body=error_message)
             return ''
@@ -311,6 +721,23 @@ def parse_args(args=None):
     parser.add_argument('-c', '--config_file', default='', help="Configuration JSON file to load Video, MetaData files and Debug file")
     parser.add_argument('--storage_account_name', default='', help="Azure Blob storage account name")
     parser.add_argument('--container_name', default='', help="Azure Blob container name")
+    parser.add_argument('--frames_buffer_capacity', type=int, default=SheldonVisionConstants.FRAMES_BUFFER_CAPACITY,
+                        help="Maximum number of received frames kept per viewer before the oldest one is dropped")
+    parser.add_argument('--adaptive_streaming', action='store_true',
+                        help="Skip stale frames and lower the JPEG quality / resolution of video feed clients which fall behind")
+    parser.add_argument('--frames_websocket', action='store_true',
+                        help="Push the frames to the browser on a WebSocket, the frame number of each frame is shown with it")
+    parser.add_argument('--frame_source', choices=[FRAME_SOURCE_PLUGIN, FRAME_SOURCE_PYTHON, FRAME_SOURCE_PYTHON_KEYFRAME_INDEX],
+                        default=FRAME_SOURCE_PLUGIN,
+                        help="Play videos with the player plugin or with the in process Python frame source, "
+                             "optionally seeking through a persisted keyframe index")
+    parser.add_argument('--raw_frames', action='store_true',
+                        help="The in process Python frame source hands over raw BGR frames instead of JPEG, "
+                             "the layers are drawn on the pixels and every frame is encoded once")
+    parser.add_argument('--pipeline_metrics', action='store_true',
+                        help="Time every frame pipeline stage and layer, served on /metrics")
+    parser.add_argument('--shared_memory_name', default='',
+                        help="Shared memory frames ring name, when set frames are received as descriptors of the ring slots")
 
     args = parser.parse_args(args)
     return args
@@ -327,7 +754,8 @@ def open_browser():
     webbrowser.open_new(SheldonVisionConstants.SHELDON_VISION_URL)
 
 
-def start_new_ui(plugin: SheldonVisionUiPlugin, configuration: str, storage_account_name: str, container_name: str) -> MainSheldonVisionUI:
+def start_new_ui(plugin: SheldonVisionUiPlugin, configuration: str, storage_account_name: str, container_name: str,
+                 frames_websocket: bool = False) -> MainSheldonVisionUI:
     global server
     # Create new UI.
     sheldonUi = MainSheldonVisionUI(plugin.send_get_current_frame, plugin.get_current_frame, plugin.clear_frames_queue,
@@ -338,7 +766,21 @@ def start_new_ui(plugin: SheldonVisionUiPlugin, configuration: str, storage_acco
                                     plugin.send_set_fps, plugin.close_network, plugin.send_upload_file_to_blob,
                                     plugin.send_download_file_from_blob, plugin.verify_blob_path, plugin.send_get_files_list,
                                     plugin.files_list_on_blob, plugin.verify_local_path, server, configuration, storage_account_name,
-                                    container_name)
+                                    container_name, load_cached_frame_method=plugin.load_cached_frame,
+                                    send_prefetch_frame_method=plugin.send_prefetch_frame_request,
+                                    wait_prefetched_frame_method=plugin.wait_for_prefetched_frame,
+                                    is_frame_cached_method=plugin.is_frame_cached,
+                                    frames_socket_route=FRAMES_SOCKET_ROUTE if frames_websocket else None,
+                                    encode_frame_image_method=plugin.encode_frame_image,
+                                    put_frame_image_method=plugin.put_frame_image)
+
+    pipeline_metrics.register_counter('static_frames_skipped', 'Static frames whose rendered output was reused', 'view',
+                                      lambda: {view: stats['skipped'] for view, stats in sheldonUi.get_static_frames_stats().items()})
+    pipeline_metrics.register_counter('overlays_cache_lookups', 'Layers overlays looked up on the overlays cache', 'result',
+                                      lambda: {'hit': sheldonUi.overlays_cache.hits, 'miss': sheldonUi.overlays_cache.misses})
+    pipeline_metrics.register_counter('offline_figures_cache_lookups', 'Offline figures looked up on the rendered figures cache',
+                                      'result', lambda: {'hit': sheldonUi.offline_figures_cache.hits,
+                                                         'miss': sheldonUi.offline_figures_cache.misses})
 
     # Start UI.
     sheldonUi.start_ui()
@@ -359,6 +801,8 @@ if __name__ == '__main__':
         input_types_list.append(AZURE_BLOB_MSG_TYPE)
         input_types_list.append(AZURE_BLOB_MSG_DOWNLOAD_TYPE)
         input_types_list.append(FILES_LIST_IN_BLOB_RESPONSE)
+        if parsed_args.shared_memory_name:
+            input_types_list.append(SHARED_MEMORY_FRAME_MESSAGE_TYPE)
         input_types_list.pop(0)
         configurations = parsed_args.config_file
         storage_account_name = parsed_args.storage_account_name
@@ -367,15 +811,22 @@ if __name__ == '__main__':
             storage_account_name = "presencecv0851576016"
         if container_name == '':
             container_name = "dev-data"
+        FramesBus.set_subscriber_backlog(parsed_args.frames_buffer_capacity)
+        adaptive_streaming = parsed_args.adaptive_streaming
+        pipeline_metrics.enabled = parsed_args.pipeline_metrics
 
         plugin = SheldonVisionUiPlugin(parsed_args.name, input_types_list, output_types_list)
+        if parsed_args.shared_memory_name:
+            plugin.attach_shared_memory_frames(parsed_args.shared_memory_name)
+        if parsed_args.frame_source in (FRAME_SOURCE_PYTHON, FRAME_SOURCE_PYTHON_KEYFRAME_INDEX):
+            plugin.attach_frame_source(parsed_args.frame_source == FRAME_SOURCE_PYTHON_KEYFRAME_INDEX, parsed_args.raw_frames)
         # Run plugin in thread
         thread = Thread(target=plugin.start_plugin, daemon=True)
         thread.start()
 
         Timer(TIMEOUT_BEFORE_OPEN_SHELDON_TAB_IN_SEC, open_browser).start()
 
-        main_sheldonUi = start_new_ui(plugin, configurations, storage_account_name, container_name)
+        main_sheldonUi = start_new_ui(plugin, configurations, storage_account_name, container_name, parsed_args.frames_websocket)
         run_server()
 
     except:
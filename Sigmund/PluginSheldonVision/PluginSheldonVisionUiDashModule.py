@@ -12,6 +12,7 @@ import plotly.express as px
 from PIL import Image
 import plotly.graph_objects as go
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from dash import html, dcc, ctx
 from dash.dependencies import Input, Output, State
 import dash_bootstrap_components as dbc
@@ -23,12 +24,15 @@ import dash_mantine_components as dmc
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 import PluginSheldonVision.Helpers as sheldon_helpers
-from PluginSheldonVision.Exceptions import FrameRangeNotValid
+import PluginSheldonVision.FrameDecoder as frame_decoder
+from PluginSheldonVision.Exceptions import FrameRangeNotValid, FrameOverwritten
 import PluginSheldonVision.Constants as SheldonVisionConstants
 from PluginSheldonVision.PlotLayers.BoundingBoxLayer import BoundingBoxLayer, BOUNDING_BOX_LAYER_NAME
 from PluginSheldonVision.PlotLayers.GTLogLayer import GTLogLayer, GT_LOG_LAYER_NAME
 from PluginSheldonVision.PlotLayers.BoundingBoxLayerForMF import BoundingBoxLayerForMF, BOUNDING_BOX_LAYER_FOR_MF_NAME
 from PluginSheldonVision.PlotLayers.Elements import GUIRect
+from PluginSheldonVision.PlotLayers.LayersCompositor import LayersDisplayList, LayersOverlay
+from PluginSheldonVision.PlotLayers.LayersShapesPayload import LayersShapesPayload, OVERLAY_META_KEY
 from PluginSheldonVision.MetaDataHandler import MetaDataHandler, MetaDataType, is_checked_modify_value, IS_CHECKED_ID, COLUMN_ID, ROW, \
     VIDEO_LOCATION
 from SheldonCommon.Constants import RECORDING_INFO_CARD_ID, BACK_BUTTON_ID, FORWARD_BUTTON_ID, PLAY_BUTTON_ID, CYCLE_RANGE_SLIDER_ID, \
@@ -40,12 +44,19 @@ from SheldonCommon.ReusableComponents import BOOTSTRAP_ICONS
 from PluginSheldonVision.ConfigurationHandler import ConfigurationHandler
 from SigmundProtobufPy.CloseType_pb2 import SigmundCloseTypeProto
 from PluginSheldonVision.ClickHandler import ClickHandler
+from PluginSheldonVision.FrameCache import FrameCache
+from PluginSheldonVision.FramePrefetcher import FramePrefetcher
+from PluginSheldonVision.StaticFrameDetector import StaticFrameDetector, frame_fingerprint
+from PluginSheldonVision.PipelineMetrics import pipeline_metrics, PipelineStage
 from PluginSheldonVision.MailHandler import MailHandler
 from PluginSheldonVision.NotificationsHandler import Notification, NotificationTypes
 
 setting_file_name = os.path.abspath(os.path.join(__file__, '..', 'settings.json'))
 settings = ConfigurationHandler(setting_file_name,perform_validation=False)
 
+FIGURE_UPDATE_OVERHEAD_BYTES = 1024
+FIGURE_ELEMENT_BYTES = 256
+
 global app
 app = None
 
@@ -65,6 +76,17 @@ def run_server():
     app.run_server(debug=False)
 
 
+def get_figure_update_size(figure_update: dict) -> int:
+    """
+    Estimated size of a cached offline figure update, mostly the frame image, embedded as a data URI or kept for its URL
+    """
+    overlay = (figure_update['meta'] or {}).get(OVERLAY_META_KEY)
+    elements_count = len(figure_update['shapes']) + len(figure_update['annotations']) + \
+        (len(overlay['rects']['x0']) + len(overlay['texts']['x']) if overlay else 0)
+    return FIGURE_UPDATE_OVERHEAD_BYTES + len(figure_update['source'] or '') + len(figure_update.get('frame_image') or b'') + \
+        FIGURE_ELEMENT_BYTES * elements_count
+
+
 class AutoRunStatus(Enum):
     UNAVAILABLE = 0
     WAITING = 1
@@ -78,7 +100,9 @@ class MainSheldonVisionUI:
                  get_recording_information_method, get_frames_range_method, log_method, validate_path, get_fps, set_fps,
                  close_network, send_upload_file_to_blob_method, send_download_file_from_bolb_method, verify_blob_path,
                  get_files_list_on_blob, files_list_on_blob, verify_local_path, server, configurations, storage_account_name,
-                 container_name):
+                 container_name, load_cached_frame_method=None, send_prefetch_frame_method=None, wait_prefetched_frame_method=None,
+                 is_frame_cached_method=None, frames_socket_route=None, encode_frame_image_method=None,
+                 put_frame_image_method=None):
         set_app_instance(server)
         self.close_network = close_network
         self.log_method = log_method
@@ -95,6 +119,18 @@ class MainSheldonVisionUI:
         self.clear_frames_queue_method_callback = clear_frames_queue_method
         self.get_current_frame_method_callback = get_current_frame_method
         self.send_get_current_frame_method_callback = send_get_current_frame_method
+        self.load_cached_frame_method_callback = load_cached_frame_method
+        self.send_prefetch_frame_method_callback = send_prefetch_frame_method
+        self.wait_prefetched_frame_method_callback = wait_prefetched_frame_method
+        self.is_frame_cached_method_callback = is_frame_cached_method
+        self.encode_frame_image_method_callback = encode_frame_image_method
+        self.put_frame_image_method_callback = put_frame_image_method
+        # Route of the frames WebSocket with a {view} placeholder, None streams the frames as MJPEG only
+        self.frames_socket_route = frames_socket_route
+        self.__player_lock = threading.Lock()
+        self.__is_stepping_forward = True
+        self.frame_prefetcher = FramePrefetcher(self.__prefetch_frame, self.__is_frame_cached, self.__get_step_frame_number) if \
+            send_prefetch_frame_method and wait_prefetched_frame_method and is_frame_cached_method else None
         self.validate_path_callback = validate_path
         self.get_fps_callback = get_fps
         self.set_fps_callback = set_fps
@@ -133,6 +169,13 @@ class MainSheldonVisionUI:
         self.on_loading = True
         self.primary_plot_layer = self.__initialize_plot_layers_handlers(MetaDataType.PRIMARY)
         self.secondary_plot_layer = self.__initialize_plot_layers_handlers(MetaDataType.SECONDARY)
+        self.static_frames = {MetaDataType.PRIMARY: StaticFrameDetector(), MetaDataType.SECONDARY: StaticFrameDetector()}
+        self.overlays_cache = FrameCache(SheldonVisionConstants.OVERLAYS_CACHE_MAX_BYTES)
+        self.offline_figures_cache = FrameCache(SheldonVisionConstants.OFFLINE_FIGURES_CACHE_MAX_BYTES, size_of=get_figure_update_size)
+        # Frames are rendered concurrently, the layers of a view keep the state of the frame they are working on
+        self.layers_locks = {MetaDataType.PRIMARY: threading.Lock(), MetaDataType.SECONDARY: threading.Lock()}
+        # The offline views of a frame are rendered concurrently, a worker per view
+        self.offline_render_pool = ThreadPoolExecutor(max_workers=len(MetaDataType), thread_name_prefix='OfflineRender')
         self.autorun_from_mail = {}
         self.waiting_autorun_main_ui = AutoRunStatus.UNAVAILABLE
         self.waiting_autorun_metadata_primary = AutoRunStatus.UNAVAILABLE
@@ -176,6 +219,8 @@ class MainSheldonVisionUI:
         """
 
         # self.__validate_basic_data_to_load_ui()
+        if self.frame_prefetcher:
+            self.frame_prefetcher.start()
         self.__create_app()
 
     def __on_interval_kill_application(self, n):
@@ -387,12 +432,14 @@ class MainSheldonVisionUI:
                 return self.__create_offline_graph_for_frame(frame_number, MetaDataType.PRIMARY)
 
         if self.current_frame_number > 0 and any(BACK_BUTTON_ID in s for s in triggered_callback):
+            self.__is_stepping_forward = False
             if self.is_decimated:
                 self.current_frame_number = self.meta_data_handler.get_decimation_value(self.current_frame_number, is_next_frame=False)
             elif self.current_frame_number - SheldonVisionConstants.MAX_NUM_FRAMES_SELECTED > self.frames_range[0]:
                 self.current_frame_number = self.current_frame_number - SheldonVisionConstants.MAX_NUM_FRAMES_SELECTED
 
         elif self.current_frame_number >= 0 and any(FORWARD_BUTTON_ID in s for s in triggered_callback):
+            self.__is_stepping_forward = True
             if self.is_decimated:
                 self.current_frame_number = self.meta_data_handler.get_decimation_value(self.current_frame_number, is_next_frame=True)
             elif self.current_frame_number + SheldonVisionConstants.MAX_NUM_FRAMES_SELECTED < self.frames_range[1]:
@@ -407,7 +454,10 @@ class MainSheldonVisionUI:
             return click_handler.handle_figure_click(figure_click_data, meta_data_type, current_frame_number)
 
         logging.info(f"On {BACK_BUTTON_ID} or {FORWARD_BUTTON_ID}\n")
-        return self.__create_offline_graph_for_frame(self.current_frame_number)
+        main_ui_output_callbacks = self.__create_offline_graph_for_frame(self.current_frame_number)
+        if self.frame_prefetcher and not self.is_playing:
+            self.frame_prefetcher.on_frame_displayed(self.current_frame_number, self.__is_stepping_forward)
+        return main_ui_output_callbacks
 
     def __on_page_loading(self):
         conf_div = html.Div(SheldonVisionConstants.NO_SETTINGS_FILE_SELECTED, style=SheldonVisionConstants.INDICATION_TEXT_STYLE) if \
@@ -678,9 +728,14 @@ class MainSheldonVisionUI:
                                        button_style=SheldonVisionConstants.BUTTONS_STYLE,
                                        access_key=SheldonVisionConstants.FORWARD_BUTTON,
                                        title=SheldonVisionConstants.FORWARD_BUTTON_SHORTCUT),
-            rc.slider(input_range_id=FRAME_INPUT_ID, component_id=CYCLE_RANGE_SLIDER_ID,
-                      min_slider_range=cycles_range[0], max_slider_range=cycles_range[1], label="Selected Frame:", is_range_slider=False,
-                      input_disabled=True, slider_disabled=True),
+            html.Div([
+                rc.slider(input_range_id=FRAME_INPUT_ID, component_id=CYCLE_RANGE_SLIDER_ID,
+                          min_slider_range=cycles_range[0], max_slider_range=cycles_range[1], label="Selected Frame:",
+                          is_range_slider=False, input_disabled=True, slider_disabled=True),
+                # Display only, assets/frame_stream.js writes the frame number of every frame pushed on the frames WebSocket
+                html.Label(id=SheldonVisionConstants.FRAME_STREAM_NUMBER_LABEL_ID, hidden=self.frames_socket_route is None,
+                           style=SheldonVisionConstants.FONT_SIZE_15PX_WHITE)
+            ]),
             db_info_card_content,
             rc.custom_button_with_icon(component_id=SheldonVisionConstants.PAUSE_BUTTON_ID,
                                        icon_class_name=SheldonVisionConstants.PAUSE_BUTTON_ICON_CLASS_NAME,
@@ -788,7 +843,9 @@ class MainSheldonVisionUI:
                                  multi=True
                                  ),
 
-                    self.__create_online_graph(f"{component_id}{SheldonVisionConstants.ONLINE_ID}", feed_source),
+                    self.__create_online_graph(f"{component_id}{SheldonVisionConstants.ONLINE_ID}", feed_source,
+                                               self.frames_socket_route.format(view=meta_data_type.value)
+                                               if self.frames_socket_route else None),
                     self.__create_offline_graph_div(f"{component_id}{SheldonVisionConstants.OFFLINE_ID}"),
                     html.Br(),
                 ]
@@ -824,6 +881,35 @@ class MainSheldonVisionUI:
             State(SheldonVisionConstants.SEND_MAIL_BUTTON_ID, 'disabled'),
             prevent_initial_call=True
         )
+        # Layers shapes and annotations of the offline graphs are created on the client from the columnar payload in the layout meta,
+        # the payload is consumed so the updated figure doesn't trigger the callback again
+        for offline_figure_id in (SheldonVisionConstants.PRIMARY_GRAPH_OFFLINE_FIGURE_ID,
+                                  SheldonVisionConstants.SECONDARY_GRAPH_OFFLINE_FIGURE_ID):
+            app.clientside_callback(
+                """
+                function(figure) {
+                    const payload = figure && figure.layout && figure.layout.meta && figure.layout.meta.%(overlay)s;
+                    if (!payload) {
+                        return window.dash_clientside.no_update;
+                    }
+                    const rects = payload.rects;
+                    const texts = payload.texts;
+                    const shapes = rects.x0.map(function (x0, i) {
+                        return {type: 'rect', x0: x0, y0: rects.y0[i], x1: rects.x1[i], y1: rects.y1[i],
+                                line: {color: rects.color[i], width: rects.width[i]}};
+                    });
+                    const annotations = texts.x.map(function (x, i) {
+                        return {text: texts.text[i], xref: 'paper', yref: 'paper', x: x, y: texts.y[i], showarrow: false,
+                                font: {color: texts.color[i], size: texts.size[i], family: payload.font}, align: texts.align[i]};
+                    });
+                    const layout = Object.assign({}, figure.layout, {shapes: shapes, annotations: annotations, meta: {}});
+                    return Object.assign({}, figure, {layout: layout});
+                }
+                """ % {'overlay': OVERLAY_META_KEY},
+                Output(offline_figure_id, 'figure', allow_duplicate=True),
+                Input(offline_figure_id, 'figure'),
+                prevent_initial_call=True
+            )
 
         app.callback(output=[Output(CYCLE_RANGE_SLIDER_ID, 'value'),
                              Output(FRAME_INPUT_ID, 'value'),
@@ -1200,6 +1286,8 @@ class MainSheldonVisionUI:
 
         if f"{PLAY_BUTTON_ID}.n_clicks" in triggered_callback and not self.is_playing:
             self.is_playing = True
+            if self.frame_prefetcher:
+                self.frame_prefetcher.cancel()
             if self.is_decimated:
                 self.__play_decimation_thread = threading.Thread(target=self.__play_decimation, args=(frame_id,)).start()
             else:
@@ -1226,8 +1314,9 @@ class MainSheldonVisionUI:
         frame_id = self.meta_data_handler.get_decimation_value(current_frame, is_next_frame=True)
         self.clear_frames_queue_method_callback(True)
         while self.is_playing:
-            self.send_set_frame_message_method_callback(frame_id - 1)
-            self.send_get_current_frame_method_callback()
+            with self.__player_lock:
+                self.send_set_frame_message_method_callback(frame_id - 1)
+                self.send_get_current_frame_method_callback(frame_id)
             if frame_id == prev_frame_id:
                 self.is_playing = False
             prev_frame_id = frame_id
@@ -1298,27 +1387,87 @@ class MainSheldonVisionUI:
                         )
 
     @staticmethod
-    def __create_online_graph(component_id, src):
+    def __create_online_graph(component_id, src, socket_src=None):
+        # assets/frame_stream.js renders the frames pushed on socket_src instead of the MJPEG source
+        source_attributes = {'data-frame-socket': socket_src} if socket_src else {'src': src}
         return html.Div(id=f"{component_id}{SheldonVisionConstants.GRAPH_DIV_ID}", hidden=False,
-                        children=html.Img(id=component_id, src=src, width=SheldonVisionConstants.PLOT_WIDTH,
-                                          height=SheldonVisionConstants.PLOT_HEIGHT))
+                        children=html.Img(id=component_id, width=SheldonVisionConstants.PLOT_WIDTH,
+                                          height=SheldonVisionConstants.PLOT_HEIGHT, **source_attributes))
 
-    def create_online_graph(self, frame, current_frame_number: int, meta_data_type: MetaDataType = MetaDataType.PRIMARY):
+    def create_online_graph(self, frame, current_frame_number: int, meta_data_type: MetaDataType = MetaDataType.PRIMARY,
+                            jpeg_quality: int | None = None, scale: float = 1.0):
         try:
-            frame_with_layers = Image.open(io.BytesIO(frame))
             plot_player = self.primary_plot_layer if meta_data_type == MetaDataType.PRIMARY else self.secondary_plot_layer
-            for layer in plot_player.keys():
-                if plot_player[layer].active():
-                    plot_player[layer].set_frame_data(frame_with_layers, current_frame_number)
-                    frame_with_layers = plot_player[layer].add_layers_to_frame(True, meta_data_type)
-
-            buffer = io.BytesIO()
-            frame_with_layers.save(buffer, format='JPEG')
-            return buffer.getvalue()
+            active_layers = [plot_player[layer] for layer in plot_player.keys() if plot_player[layer].active()]
+            if not active_layers and jpeg_quality is None and scale == 1.0:
+                return frame_decoder.frame_to_jpeg(frame)
+            # Frames of a static scene with unchanged metadata are rendered once
+            fingerprint = frame_fingerprint(frame)
+            frame_metadata = [layer.meta_data_handler.get_data_by_frame_number(current_frame_number)[meta_data_type.value]
+                              for layer in active_layers]
+            render_key = (tuple(layer.layer_name() for layer in active_layers), jpeg_quality, scale)
+            static_frame_output = self.static_frames[meta_data_type].get_output(fingerprint, frame_metadata, render_key)
+            if static_frame_output is not None:
+                return static_frame_output
+            decode_start = pipeline_metrics.now()
+            if frame_decoder.is_raw_frame(frame) and frame.channels == 3 and \
+                    frame_decoder.fits_size(frame, SheldonVisionConstants.PLOT_SIZE):
+                # Raw frames are drawn on their pixels array, so the frame is encoded exactly once, on output
+                pixels = frame.to_rgb_array()
+                pipeline_metrics.observe_since(PipelineStage.DECODE, decode_start)
+                overlay = self.__get_layers_overlay(active_layers, current_frame_number, meta_data_type, (frame.width, frame.height))
+                draw_start = pipeline_metrics.now()
+                frame_with_layers = Image.fromarray(overlay.composite_array(pixels))
+            else:
+                # The layers are scaled to the plot size, so larger frames are decoded straight to it
+                frame_with_layers = frame_decoder.decode_frame(frame, SheldonVisionConstants.PLOT_SIZE)
+                # Image.open is lazy, load the pixels here so the decode isn't timed as part of the first layer
+                frame_with_layers.load()
+                pipeline_metrics.observe_since(PipelineStage.DECODE, decode_start)
+                overlay = self.__get_layers_overlay(active_layers, current_frame_number, meta_data_type, frame_with_layers.size)
+                draw_start = pipeline_metrics.now()
+                frame_with_layers = overlay.composite(frame_with_layers)
+            pipeline_metrics.observe_since(PipelineStage.DRAW, draw_start)
+
+            encode_start = pipeline_metrics.now()
+            output = frame_decoder.encode_jpeg(frame_with_layers, jpeg_quality, scale)
+            pipeline_metrics.observe_since(PipelineStage.ENCODE, encode_start)
+            self.static_frames[meta_data_type].put_output(fingerprint, frame_metadata, render_key, output)
+            return output
         except PIL.UnidentifiedImageError:
             self.log_method(logging.WARN, "Failed to create online graph due to invalid frame data")
             self.log_method(logging.WARN, f"Frame number: {current_frame_number} | frame: {frame} | meta_data_type: {meta_data_type.value}")
             return bytes()
+        except FrameOverwritten as error:
+            self.log_method(logging.WARN, f"Failed to create online graph: {error}")
+            return bytes()
+
+    def __get_layers_overlay(self, active_layers: list, frame_number: int, meta_data_type: MetaDataType,
+                             size: tuple[int, int]) -> LayersOverlay:
+        """
+        The overlay of a frame depends only on the metadata, the frame number and the active layers, so it is rendered once
+        """
+        overlay_key = (meta_data_type.value, self.meta_data_handler.metadata_version, frame_number,
+                       tuple(layer.layer_name() for layer in active_layers), size)
+        overlay = self.overlays_cache.get(overlay_key)
+        if overlay is not None:
+            return overlay
+        # All the layers GUI elements are collected and drawn together with a single draw context
+        display_list = LayersDisplayList()
+        with self.layers_locks[meta_data_type]:
+            for layer in active_layers:
+                layer_start = pipeline_metrics.now()
+                layer.set_frame_metadata(frame_number)
+                layer.add_to_display_list(display_list, meta_data_type)
+                pipeline_metrics.observe_layer_since(layer.layer_name(), layer_start)
+        overlay = LayersOverlay(display_list, size)
+        # An overlay rendered while a metadata file is loading may be based on part of the file
+        if not self.meta_data_handler.loading_metadata:
+            self.overlays_cache.put(overlay_key, overlay)
+        return overlay
+
+    def get_static_frames_stats(self) -> dict[str, dict]:
+        return {meta_data_type.value: static_frames.get_stats() for meta_data_type, static_frames in self.static_frames.items()}
 
     def create_meta_data_general(self, meta_data_type: MetaDataType = MetaDataType.PRIMARY):
         layers_metadata = []
@@ -1336,46 +1485,151 @@ class MainSheldonVisionUI:
 
         return layers_metadata
 
+    def create_offline_views(self, current_frame_number, meta_data_types: tuple[MetaDataType, ...] = tuple(MetaDataType)) -> \
+            dict[MetaDataType, tuple]:
+        """
+        The frame is fetched once for all the views, then every view renders its figure and its metadata panel on its own worker,
+        so a step takes as long as the slower view
+        :return: (offline graph patch, metadata general) of every view
+        """
+        fetched_frame = self.__fetch_offline_frame(current_frame_number) if self.previous_video_file_name else None
+        views_futures = {meta_data_type: self.offline_render_pool.submit(self.__create_offline_view, current_frame_number,
+                                                                         meta_data_type, fetched_frame)
+                         for meta_data_type in meta_data_types}
+        return {meta_data_type: view_future.result() for meta_data_type, view_future in views_futures.items()}
+
+    def __create_offline_view(self, current_frame_number, meta_data_type: MetaDataType, fetched_frame: tuple | None) -> tuple:
+        # The metadata panel is read from the layers state of the frame, so it follows the figure on the same worker
+        offline_graph = self.create_offline_graph(current_frame_number, meta_data_type, as_patch=True, fetched_frame=fetched_frame)
+        return offline_graph, self.create_meta_data_general(meta_data_type)
+
+    def __fetch_offline_frame(self, current_frame_number) -> tuple:
+        """
+        Move the player to the frame unless the frame is already displayed or is loaded from the frames cache
+        :return: (frame data, frame number)
+        """
+        frame_to_set = current_frame_number - 1 if current_frame_number is not None and current_frame_number > 0 else 0
+        if frame_to_set + 1 != self.get_current_frame_number_method_callback() and not self.__load_cached_frame(frame_to_set + 1):
+            self.__set_frame_number(frame_to_set)
+        return self.get_current_frame_method_callback(), self.get_current_frame_number_method_callback()
+
     def create_offline_graph(self, current_frame_number, meta_data_type: MetaDataType = MetaDataType.PRIMARY,
-                             click_event_rect: GUIRect = None, closest_layer_name: str = None):
+                             click_event_rect: GUIRect = None, closest_layer_name: str = None, as_patch: bool = False,
+                             fetched_frame: tuple | None = None):
+        """
+        :param as_patch: Return only the frame image and layers of an existing figure as a dash.Patch, for stepping between frames.
+                         The whole figure is returned when the figure is created
+        :param fetched_frame: (frame data, frame number) already fetched for another view, the frame is fetched when None
+        """
         if not self.previous_video_file_name:
             return dash.no_update
-        frame_to_set = current_frame_number - 1 if current_frame_number is not None and current_frame_number > 0 else 0
-        if frame_to_set + 1 != self.get_current_frame_number_method_callback():
-            self.__set_frame_number(frame_to_set)
-        frame_data = self.get_current_frame_method_callback()
-        frame_number = self.get_current_frame_number_method_callback()
-        if frame_data:
+        frame_data, frame_number = fetched_frame or self.__fetch_offline_frame(current_frame_number)
+        if frame_data and frame_decoder.is_frame_valid(frame_data):
             logging.info(f"going to create offline fig current_frame_number on queue:{frame_number}"
                          f", frame data length:{len(frame_data)}\n")
-            image = Image.open(io.BytesIO(frame_data))
-            if self.fig[meta_data_type] is None:
+            is_new_figure = self.fig[meta_data_type] is None
+            plot_layer = self.primary_plot_layer if meta_data_type == MetaDataType.PRIMARY else self.secondary_plot_layer
+            # Stepping back to a frame reuses its image and layers, a selected box is always drawn again
+            figure_key = None if is_new_figure or click_event_rect or frame_number != current_frame_number else \
+                self.__get_offline_figure_key(plot_layer, meta_data_type, frame_number)
+            figure_update = self.offline_figures_cache.get(figure_key) if figure_key else None
+            if figure_update is not None:
+                # The frame image may have been evicted since the figure was cached, the figure keeps its URL served
+                if figure_update.get('frame_image') and self.put_frame_image_method_callback:
+                    self.put_frame_image_method_callback(figure_update['source'], figure_update['frame_image'])
+                self.__apply_offline_figure_update(self.fig[meta_data_type], figure_update)
+                return self.__create_offline_graph_patch(figure_update) if as_patch else go.Figure(self.fig[meta_data_type])
+
+            # Cached frames are referenced by URL and cached by the browser, other frames are embedded in the figure
+            frame_image = self.encode_frame_image_method_callback(frame_number) if self.encode_frame_image_method_callback else None
+            frame_url = frame_image[0] if frame_image else None
+            if is_new_figure:
+                image = frame_decoder.decode_frame(frame_data, SheldonVisionConstants.PLOT_SIZE)
                 self.fig[meta_data_type] = px.imshow(image, width=SheldonVisionConstants.PLOT_WIDTH, height=SheldonVisionConstants.PLOT_HEIGHT)
                 self.fig[meta_data_type].update_xaxes(showticklabels=False).update_yaxes(showticklabels=False)
                 self.fig[meta_data_type].update_layout(width=SheldonVisionConstants.PLOT_WIDTH, height=SheldonVisionConstants.PLOT_HEIGHT,
                                                        margin=dict(l=0, r=0, b=0, t=0))
+                if frame_url:
+                    self.fig[meta_data_type].data[0]['source'] = frame_url
             else:
-                data = io.BytesIO()
-                image.save(data, "JPEG")
-                data64 = base64.b64encode(data.getvalue())
-                self.fig[meta_data_type].data[0]['source'] = u'data:image/png;base64,' + data64.decode('utf-8')
+                self.fig[meta_data_type].data[0]['source'] = frame_url or \
+                    frame_decoder.frame_to_data_uri(frame_data, SheldonVisionConstants.PLOT_SIZE)
                 self.fig[meta_data_type].update_layout(width=SheldonVisionConstants.PLOT_WIDTH, height=SheldonVisionConstants.PLOT_HEIGHT,
                                                        margin=dict(l=0, r=0, b=10, t=0))
 
             self.fig[meta_data_type].layout['shapes'] = []
             self.fig[meta_data_type].layout['annotations'] = []
 
-            plot_layer = self.primary_plot_layer if meta_data_type == MetaDataType.PRIMARY else self.secondary_plot_layer
-            for layer in plot_layer.keys():
-                if plot_layer[layer].active():
-                    plot_layer[layer].set_frame_data(self.fig[meta_data_type], current_frame_number)
-                    if plot_layer[layer].layer_name() == closest_layer_name and click_event_rect:
-                        self.fig[meta_data_type] = plot_layer[layer].handle_selected_box_by_click_event(click_event_rect, meta_data_type)
-                    else:
-                        self.fig[meta_data_type] = plot_layer[layer].add_layers_to_frame(False, meta_data_type)
-
+            if click_event_rect:
+                self.fig[meta_data_type].layout['meta'] = {OVERLAY_META_KEY: None}
+                with self.layers_locks[meta_data_type]:
+                    for layer in plot_layer.keys():
+                        if plot_layer[layer].active():
+                            plot_layer[layer].set_frame_data(self.fig[meta_data_type], current_frame_number)
+                            if plot_layer[layer].layer_name() == closest_layer_name:
+                                self.fig[meta_data_type] = plot_layer[layer].handle_selected_box_by_click_event(click_event_rect, meta_data_type)
+                            else:
+                                self.fig[meta_data_type] = plot_layer[layer].add_layers_to_frame(False, meta_data_type)
+            else:
+                # The layers elements are turned into shapes and annotations on the client, see __create_callbacks
+                self.fig[meta_data_type].layout['meta'] = {OVERLAY_META_KEY: self.__get_layers_shapes_payload(plot_layer, meta_data_type,
+                                                                                                               current_frame_number)}
+
+            figure_update = None if is_new_figure else self.__get_offline_figure_update(self.fig[meta_data_type])
+            if figure_update is not None:
+                figure_update['frame_image'] = frame_image[1] if frame_image else None
+            # A figure rendered while a metadata file is loading may be based on part of the file
+            if figure_key and not self.meta_data_handler.loading_metadata:
+                self.offline_figures_cache.put(figure_key, figure_update)
+            if as_patch and figure_update is not None:
+                return self.__create_offline_graph_patch(figure_update)
             return go.Figure(self.fig[meta_data_type])
 
+    def __get_layers_shapes_payload(self, plot_layer: dict, meta_data_type: MetaDataType, frame_number: int) -> dict:
+        """
+        :return: The GUI elements of all the active layers of the frame as a compact columnar payload, no figure is copied per layer
+        """
+        shapes_payload = LayersShapesPayload()
+        with self.layers_locks[meta_data_type]:
+            for layer in plot_layer.values():
+                if layer.active():
+                    layer.set_frame_metadata(frame_number)
+                    layer.add_to_display_list(shapes_payload, meta_data_type)
+        return shapes_payload.to_dict()
+
+    def __get_offline_figure_key(self, plot_layer: dict, meta_data_type: MetaDataType, frame_number: int) -> tuple:
+        """
+        A rendered figure depends on the video, the frame, the loaded metadata, the active layers and the zoom of the figure.
+        The metadata version changes whenever a metadata file is loaded and the active layers follow the layers dropdown
+        """
+        layout = self.fig[meta_data_type].layout
+        return (self.previous_video_file_name, frame_number, meta_data_type.value, self.meta_data_handler.metadata_version,
+                tuple(name for name, layer in plot_layer.items() if layer.active()),
+                tuple(layout.xaxis.range or ()), tuple(layout.yaxis.range or ()))
+
+    @staticmethod
+    def __get_offline_figure_update(figure: go.Figure) -> dict:
+        """
+        Only the frame image and the layers change between frames, the rest of the figure is already on the client
+        """
+        return {'source': figure.data[0].source, 'margin': figure.layout.margin.to_plotly_json(), 'meta': figure.layout.meta,
+                'shapes': [shape.to_plotly_json() for shape in figure.layout.shapes],
+                'annotations': [annotation.to_plotly_json() for annotation in figure.layout.annotations]}
+
+    @staticmethod
+    def __apply_offline_figure_update(figure: go.Figure, figure_update: dict) -> None:
+        figure.data[0]['source'] = figure_update['source']
+        figure.update_layout(margin=figure_update['margin'], meta=figure_update['meta'], shapes=figure_update['shapes'],
+                             annotations=figure_update['annotations'])
+
+    @staticmethod
+    def __create_offline_graph_patch(figure_update: dict) -> dash.Patch:
+        figure_patch = dash.Patch()
+        figure_patch['data'][0]['source'] = figure_update['source']
+        for key in ('margin', 'meta', 'shapes', 'annotations'):
+            figure_patch['layout'][key] = figure_update[key]
+        return figure_patch
+
     def __update_graph_dropdown_values(self, primary_graph_dropdown_value, secondary_graph_dropdown_value):
         for key in self.primary_plot_layer.keys():
             if key not in primary_graph_dropdown_value:
@@ -1710,13 +1964,14 @@ class MainSheldonVisionUI:
                     else:
                         blob_full_path_raw_data = None
 
-                self.get_files_list_on_blob(self.verify_blob_path(blob_full_path.replace('\\', '/')))
-                files_found = [f for f in self.files_list_on_blob() if f.endswith(SheldonVisionConstants.MP4_SUFFIX)]
+                files_found = [f for f in self.get_files_list_on_blob(self.verify_blob_path(blob_full_path.replace('\\', '/')))
+                               if f.endswith(SheldonVisionConstants.MP4_SUFFIX)]
                 if files_found:
                     file_name = blob_full_path
                 elif blob_full_path_raw_data:
-                    self.get_files_list_on_blob(self.verify_blob_path(blob_full_path_raw_data.replace('\\', '/')))
-                    files_found = [f for f in self.files_list_on_blob() if f.endswith(SheldonVisionConstants.MP4_SUFFIX)]
+                    raw_data_blob_path = self.verify_blob_path(blob_full_path_raw_data.replace('\\', '/'))
+                    files_found = [f for f in self.get_files_list_on_blob(raw_data_blob_path)
+                                   if f.endswith(SheldonVisionConstants.MP4_SUFFIX)]
                     if files_found:
                         file_name = blob_full_path_raw_data
 
@@ -1739,6 +1994,8 @@ class MainSheldonVisionUI:
             else:
                 self.previous_video_file_name = file_name
             self.frames_range = self.get_frames_range_callback()
+            if self.frame_prefetcher:
+                self.frame_prefetcher.cancel()
             self.clear_frames_queue_method_callback()
             self.fps = self.configurations.get_item(SheldonVisionConstants.CONFIG_FPS)
             if self.fps:
@@ -1863,11 +2120,33 @@ class MainSheldonVisionUI:
         self.meta_data_handler.create_multiple_recordings_to_export(table_data, file_name)
         return dash.no_update
 
+    def __load_cached_frame(self, frame_number: int) -> bool:
+        return bool(self.load_cached_frame_method_callback) and self.load_cached_frame_method_callback(frame_number)
+
     def __set_frame_number(self, frame_number):
-        self.clear_frames_queue_method_callback(True)
-        self.send_set_frame_message_method_callback(frame_number)
-        self.send_get_current_frame_method_callback()
-        self.__check_frame_number_validity(int(frame_number) + 1)
+        with self.__player_lock:
+            self.clear_frames_queue_method_callback(True)
+            self.send_set_frame_message_method_callback(frame_number)
+            self.send_get_current_frame_method_callback(int(frame_number) + 1)
+            self.__check_frame_number_validity(int(frame_number) + 1)
+
+    def __prefetch_frame(self, frame_number: int) -> bool:
+        # Only sending the request moves the player, user steps aren't held back while the prefetched frame is awaited
+        with self.__player_lock:
+            if self.is_playing or self.is_frame_cached_method_callback(max(frame_number, 1)):
+                return True
+            prefetch_request = self.send_prefetch_frame_method_callback(max(frame_number, 1))
+        return self.wait_prefetched_frame_method_callback(prefetch_request)
+
+    def __is_frame_cached(self, frame_number: int) -> bool:
+        # Frame 0 is displayed by fetching the first frame, same as create_offline_graph does
+        return self.is_frame_cached_method_callback(max(frame_number, 1))
+
+    def __get_step_frame_number(self, frame_number: int, is_forward: bool) -> int | None:
+        if self.is_decimated:
+            return self.meta_data_handler.get_decimation_step_value(frame_number, is_next_frame=is_forward)
+        step_frame_number = frame_number + SheldonVisionConstants.MAX_NUM_FRAMES_SELECTED * (1 if is_forward else -1)
+        return step_frame_number if self.frames_range[0] < step_frame_number < self.frames_range[1] else None
 
     def __collect_clip_data_and_all_range_marks(self, debug_data_table, row_selected):
         base_video_file_name = debug_data_table[row_selected]['Video Location']
@@ -2040,10 +2319,9 @@ class MainSheldonVisionUI:
     def __on_slider_interval_tick(self, pause_button_n_clicks, frames_slider_value):
         current_frame_number = self.get_current_frame_number_method_callback()
         if pause_button_n_clicks is not None or not self.is_playing:
-            offline_graph = self.create_offline_graph(frames_slider_value, MetaDataType.PRIMARY)
-            offline_graph_secondary = self.create_offline_graph(frames_slider_value, MetaDataType.SECONDARY)
-            primary_metadata_general = self.create_meta_data_general(MetaDataType.PRIMARY)
-            secondary_metadata_general = self.create_meta_data_general(MetaDataType.SECONDARY)
+            offline_views = self.create_offline_views(frames_slider_value)
+            offline_graph, primary_metadata_general = offline_views[MetaDataType.PRIMARY]
+            offline_graph_secondary, secondary_metadata_general = offline_views[MetaDataType.SECONDARY]
 
             main_ui_output_callbacks = sheldon_helpers.prepare_main_ui_output_callbacks(
                 slider_value=current_frame_number,
@@ -2070,10 +2348,9 @@ class MainSheldonVisionUI:
         return main_ui_output_callbacks
 
     def __on_back_forward_button_click(self, frames_slider_value):
-        offline_graph = self.create_offline_graph(frames_slider_value, MetaDataType.PRIMARY)
-        offline_graph_secondary = self.create_offline_graph(frames_slider_value, MetaDataType.SECONDARY)
-        primary_metadata_general = self.create_meta_data_general(MetaDataType.PRIMARY)
-        secondary_metadata_general = self.create_meta_data_general(MetaDataType.SECONDARY)
+        offline_views = self.create_offline_views(frames_slider_value)
+        offline_graph, primary_metadata_general = offline_views[MetaDataType.PRIMARY]
+        offline_graph_secondary, secondary_metadata_general = offline_views[MetaDataType.SECONDARY]
 
         main_ui_output_callbacks = sheldon_helpers.prepare_main_ui_output_callbacks(
             slider_value=frames_slider_value,
@@ -2097,17 +2374,17 @@ class MainSheldonVisionUI:
             main_ui_output_callbacks.extend(self.__get_graphs_div_display_status())
             return main_ui_output_callbacks
 
-        def verify_graph_created_successfully(metadata_type: MetaDataType, num_of_retries: int = 5):
-            offline_graph = self.create_offline_graph(frames_number, metadata_type)
+        def verify_views_created_successfully(num_of_retries: int = 5):
+            offline_views = self.create_offline_views(frames_number)
             if verify_callback_necessity():
-                return dash.no_update, False
+                return None, False
 
-            while offline_graph is None and num_of_retries > 0:
+            while any(offline_graph is None for offline_graph, _ in offline_views.values()) and num_of_retries > 0:
                 num_of_retries -= 1
-                offline_graph = self.create_offline_graph(frames_number, metadata_type)
+                offline_views = self.create_offline_views(frames_number)
                 if verify_callback_necessity():
-                    return dash.no_update, False
-            return offline_graph, True
+                    return None, False
+            return offline_views, True
 
         if self.is_playing:
             self.__set_frame_number(frames_number)
@@ -2119,22 +2396,17 @@ class MainSheldonVisionUI:
         secondary_metadata_general = dash.no_update
         match meta_data_type:
             case MetaDataType.PRIMARY:
-                offline_graph_update = self.create_offline_graph(frames_number, MetaDataType.PRIMARY)
-                primary_metadata_general = self.create_meta_data_general(MetaDataType.PRIMARY)
+                offline_graph_update, primary_metadata_general = \
+                    self.create_offline_views(frames_number, (MetaDataType.PRIMARY,))[MetaDataType.PRIMARY]
             case MetaDataType.SECONDARY:
-                offline_graph_secondary_update = self.create_offline_graph(frames_number, MetaDataType.SECONDARY)
-                secondary_metadata_general = self.create_meta_data_general(MetaDataType.SECONDARY)
+                offline_graph_secondary_update, secondary_metadata_general = \
+                    self.create_offline_views(frames_number, (MetaDataType.SECONDARY,))[MetaDataType.SECONDARY]
             case _:
-                offline_graph_update, is_ok = verify_graph_created_successfully(MetaDataType.PRIMARY, 5)
-                if not is_ok:
-                    return exit_callback()
-                offline_graph_secondary_update, is_ok = verify_graph_created_successfully(MetaDataType.SECONDARY, 5)
+                offline_views, is_ok = verify_views_created_successfully(5)
                 if not is_ok:
                     return exit_callback()
-                primary_metadata_general = self.create_meta_data_general(MetaDataType.PRIMARY)
-                if verify_callback_necessity():
-                    return exit_callback()
-                secondary_metadata_general = self.create_meta_data_general(MetaDataType.SECONDARY)
+                offline_graph_update, primary_metadata_general = offline_views[MetaDataType.PRIMARY]
+                offline_graph_secondary_update, secondary_metadata_general = offline_views[MetaDataType.SECONDARY]
 
         main_ui_output_callbacks = sheldon_helpers.prepare_main_ui_output_callbacks(
             slider_value=int(frames_number),
@@ -0,0 +1,267 @@
+import argparse
+import logging
+import os
+import sys
+import time
+import traceback
+from threading import Event, Lock, Thread
+from typing import Callable
+
+import cv2
+from PyPluginBase.SigmundPluginBase import SigmundPluginBase
+from PyPluginBase.Transport import ISigmundTransport
+
+from PluginSheldonVision.Constants import CAMERA_FRAMES_MESSAGE_TYPE, TOTAL_VIDEO_FRAMES_MSG_NAME, PATH_STATUS_MSG, \
+    FPS_STATUS_MESSAGE, GET_TOTAL_VIDEO_FRAMES_MSG_NAME, PLAY_MESSAGE, SET_FRAME_MESSAGE, PAUSE_MESSAGE, PREVIOUS_FRAME_MESSAGE, \
+    NEXT_FRAME_MESSAGE, STOP_MESSAGE, LOAD_REQUEST_MESSAGE, GET_CURRENT_FRAME_MESSAGE, SET_FRAME_PER_SECOND, GET_FRAME_PER_SECOND, \
+    DEFAULT_FPS, PathStatus, FrameEncoding
+from PluginSheldonVision.FrameDecoder import RawFrame
+from PluginSheldonVision.KeyframeIndex import KeyframeIndexedVideoReader
+
+FRAME_SOURCE_NAME = 'PythonFrameSource'
+JPEG_EXTENSION = '.jpg'
+
+
+class OpenCvVideoReader:
+    """
+    Sequential video reader, seeking sets PosFrames which decodes from the previous keyframe on every seek
+    """
+
+    def __init__(self):
+        self.__capture: cv2.VideoCapture | None = None
+
+    @property
+    def frames_count(self) -> int:
+        return int(self.__capture.get(cv2.CAP_PROP_FRAME_COUNT)) if self.__capture else 0
+
+    @property
+    def fps(self) -> float:
+        return self.__capture.get(cv2.CAP_PROP_FPS) if self.__capture else 0
+
+    @property
+    def position(self) -> int:
+        return int(self.__capture.get(cv2.CAP_PROP_POS_FRAMES)) if self.__capture else 0
+
+    def open(self, file_path: str) -> bool:
+        capture = cv2.VideoCapture(file_path)
+        if not capture.isOpened():
+            return False
+        self.release()
+        self.__capture = capture
+        return True
+
+    def set_position(self, frame_number: int) -> None:
+        if self.__capture:
+            self.__capture.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+
+    def read(self):
+        """
+        :return: BGR image of the frame at the current position, None at the end of the video
+        """
+        if self.__capture is None:
+            return None
+        is_read, image = self.__capture.read()
+        return image if is_read else None
+
+    def release(self) -> None:
+        if self.__capture is not None:
+            self.__capture.release()
+            self.__capture = None
+
+
+class VideoFileFrameSource:
+    """
+    Pure Python video file player speaking the CameraListenerPlugin (VideoFileCapture) messages contract.
+    Requests are handled by handle_message and replies are sent through the given send_message method, so the same
+    source can run in process with direct calls or behind a Sigmund plugin.
+    Frames are sent as JPEG with the player position after the read as metadata, same as the C# player.
+    An in process source can hand over the BGR image arrays as RawFrame instead, skipping the JPEG encode and decode.
+    Videos are read with an OpenCvVideoReader, or a KeyframeIndexedVideoReader for fast random access.
+    """
+    INPUT_TYPES = [PLAY_MESSAGE, STOP_MESSAGE, NEXT_FRAME_MESSAGE, PREVIOUS_FRAME_MESSAGE, PAUSE_MESSAGE, SET_FRAME_MESSAGE,
+                   GET_TOTAL_VIDEO_FRAMES_MSG_NAME, LOAD_REQUEST_MESSAGE, GET_CURRENT_FRAME_MESSAGE, SET_FRAME_PER_SECOND,
+                   GET_FRAME_PER_SECOND]
+    OUTPUT_TYPES = [CAMERA_FRAMES_MESSAGE_TYPE, TOTAL_VIDEO_FRAMES_MSG_NAME, PATH_STATUS_MSG, FPS_STATUS_MESSAGE]
+
+    def __init__(self, send_message: Callable[[str, bytes | str, str], None], log_method: Callable[[int, str], None] | None = None,
+                 fps: int = DEFAULT_FPS, reader_factory: Callable[[], OpenCvVideoReader | KeyframeIndexedVideoReader] = OpenCvVideoReader,
+                 raw_frames: bool = False):
+        """
+        :param send_message: Called with the reply message type, message and metadata
+        :param log_method: Called with the log level and message
+        :param fps: Playing rate until SET_FRAME_PER_SECOND is received
+        :param reader_factory: Creates the reader of every loaded video
+        :param raw_frames: Send the frames as BGR RawFrame, only when send_message is an in process call
+        """
+        self.__raw_frames = raw_frames
+        self.__send_message = send_message
+        self.__log_method = log_method or (lambda level, message: logging.log(level, message))
+        self.__delay_between_frames_seconds = 1 / fps
+        self.__reader_factory = reader_factory
+        self.__reader: OpenCvVideoReader | KeyframeIndexedVideoReader | None = None
+        self.__reader_lock = Lock()
+        self.__play_event = Event()
+        self.__is_running = False
+        self.__playing_thread: Thread | None = None
+        self.frames_count = 0
+        self.__handlers = {
+            PLAY_MESSAGE: lambda message: self.play(),
+            PAUSE_MESSAGE: lambda message: self.pause(),
+            STOP_MESSAGE: lambda message: self.stop(),
+            NEXT_FRAME_MESSAGE: lambda message: self.next_frame(),
+            PREVIOUS_FRAME_MESSAGE: lambda message: self.previous_frame(),
+            SET_FRAME_MESSAGE: lambda message: self.set_frame(int(float(message))),
+            GET_TOTAL_VIDEO_FRAMES_MSG_NAME: lambda message: self.__send_message(TOTAL_VIDEO_FRAMES_MSG_NAME, str(self.frames_count), ''),
+            LOAD_REQUEST_MESSAGE: lambda message: self.load_request(message),
+            GET_CURRENT_FRAME_MESSAGE: lambda message: self.send_current_frame(),
+            SET_FRAME_PER_SECOND: lambda message: self.set_fps(int(message)),
+            GET_FRAME_PER_SECOND: lambda message: self.__send_message(FPS_STATUS_MESSAGE, str(self.get_fps()), ''),
+        }
+
+    def handle_message(self, msg_type: str, message) -> bool:
+        """
+        :return: False if the message type isn't part of the player contract
+        """
+        handler = self.__handlers.get(msg_type)
+        if handler is None:
+            return False
+        try:
+            handler(message.decode('utf-8') if isinstance(message, bytes) else message)
+        except:
+            self.__log_method(logging.ERROR, f'{msg_type} handling cause some error: {traceback.format_exc()}')
+        return True
+
+    def load_request(self, file_path: str) -> None:
+        if not os.path.isfile(file_path):
+            self.__log_method(logging.ERROR, f'{file_path} Not exists, only local video files are supported')
+            self.__send_message(PATH_STATUS_MSG, PathStatus.Invalid.value, '')
+            return
+        self.pause()
+        reader = self.__reader_factory()
+        if not reader.open(file_path):
+            self.__log_method(logging.ERROR, f"Couldn't open video stream {file_path}")
+            self.__send_message(PATH_STATUS_MSG, PathStatus.Invalid.value, '')
+            return
+        with self.__reader_lock:
+            self.__release_reader()
+            self.__reader = reader
+            self.frames_count = reader.frames_count
+        self.__start_playing_thread()
+        self.__send_message(PATH_STATUS_MSG, PathStatus.Valid.value, '')
+
+    def play(self) -> None:
+        self.__play_event.set()
+
+    def pause(self) -> None:
+        self.__play_event.clear()
+
+    def stop(self) -> None:
+        self.pause()
+        self.__is_running = False
+        # Wake the playing thread so it can exit
+        self.__play_event.set()
+        with self.__reader_lock:
+            self.__release_reader()
+        self.__play_event.clear()
+
+    def set_frame(self, frame_number: int) -> None:
+        with self.__reader_lock:
+            if self.__reader:
+                self.__reader.set_position(frame_number)
+
+    def next_frame(self) -> None:
+        self.pause()
+        if self.__get_position() < self.frames_count:
+            self.send_current_frame()
+            self.set_frame(self.__get_position() + 1)
+
+    def previous_frame(self) -> None:
+        self.pause()
+        current_frame = self.__get_position()
+        if self.__reader is not None and current_frame > 0:
+            self.set_frame(current_frame - 1)
+            self.send_current_frame()
+
+    def send_current_frame(self) -> bool:
+        with self.__reader_lock:
+            if self.__reader is None:
+                return False
+            image = self.__reader.read()
+            frame_number = self.__reader.position
+        if image is None:
+            self.__log_method(logging.ERROR, 'Video stream return empty frame')
+            self.pause()
+            return False
+        if self.__raw_frames:
+            self.__send_message(CAMERA_FRAMES_MESSAGE_TYPE, RawFrame(image, image.shape, FrameEncoding.RawBgr.value), str(frame_number))
+            return True
+        is_encoded, encoded_image = cv2.imencode(JPEG_EXTENSION, image)
+        if not is_encoded:
+            self.__log_method(logging.ERROR, f'Failed to encode frame {frame_number}')
+            return False
+        self.__send_message(CAMERA_FRAMES_MESSAGE_TYPE, encoded_image.tobytes(), str(frame_number))
+        return True
+
+    def set_fps(self, fps: int) -> None:
+        self.__delay_between_frames_seconds = 1 / fps
+
+    def get_fps(self) -> int:
+        with self.__reader_lock:
+            return int(self.__reader.fps) if self.__reader else 0
+
+    def __get_position(self) -> int:
+        with self.__reader_lock:
+            return self.__reader.position if self.__reader else 0
+
+    def __release_reader(self) -> None:
+        if self.__reader is not None:
+            self.__reader.release()
+            self.__reader = None
+            self.frames_count = 0
+
+    def __start_playing_thread(self) -> None:
+        if self.__playing_thread and self.__playing_thread.is_alive():
+            return
+        self.__is_running = True
+        self.__playing_thread = Thread(target=self.__playing_loop, name=FRAME_SOURCE_NAME, daemon=True)
+        self.__playing_thread.start()
+
+    def __playing_loop(self) -> None:
+        while self.__is_running:
+            self.__play_event.wait()
+            if not self.__is_running:
+                return
+            if self.send_current_frame():
+                time.sleep(self.__delay_between_frames_seconds)
+
+
+class FrameSourcePlugin(SigmundPluginBase):
+    """
+    Run the Python frame source as a standalone Sigmund plugin, a drop-in replacement of the C# CameraListenerPlugin
+    """
+
+    def __init__(self, plugin_name, input_types, output_types, sigmund_transport: ISigmundTransport = None, fps: int = DEFAULT_FPS,
+                 use_keyframe_index: bool = False):
+        SigmundPluginBase.__init__(self, plugin_name, input_types, output_types, sigmund_transport=sigmund_transport)
+        self.frame_source = VideoFileFrameSource(self.send_message, self.send_log, fps,
+                                                 KeyframeIndexedVideoReader if use_keyframe_index else OpenCvVideoReader)
+
+    def plugin_logic(self):
+        message = self.get_next_message()
+        self.frame_source.handle_message(message.msg_type, message.get_string_message())
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description='Python frame source plugin arguments')
+    parser.add_argument('-n', '--name', default=FRAME_SOURCE_NAME, help='Plugin name')
+    parser.add_argument('--fps', type=int, default=DEFAULT_FPS, help='Playing rate until a SetFramePerSecond message is received')
+    parser.add_argument('--keyframe_index', action='store_true',
+                        help='Read videos through a persisted keyframe index, random access decodes at most a single GOP')
+    return parser.parse_args(args)
+
+
+if __name__ == '__main__':
+    parsed_args = parse_args(sys.argv[1:])
+    plugin = FrameSourcePlugin(parsed_args.name, VideoFileFrameSource.INPUT_TYPES, VideoFileFrameSource.OUTPUT_TYPES,
+                               fps=parsed_args.fps, use_keyframe_index=parsed_args.keyframe_index)
+    plugin.start_plugin()
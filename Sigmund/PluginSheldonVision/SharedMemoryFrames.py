@@ -0,0 +1,182 @@
+import json
+import struct
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from threading import Condition, Lock
+from typing import Iterator
+
+from PluginSheldonVision.Constants import SHARED_MEMORY_SLOTS_COUNT, SHARED_MEMORY_SLOT_SIZE, FrameEncoding
+from PluginSheldonVision.Exceptions import FrameOverwritten
+
+# Ring header: slots count, slot size
+RING_HEADER = struct.Struct('<II')
+# Slot header: sequence number of the written frame, frame size
+SLOT_HEADER = struct.Struct('<QI')
+
+
+class FrameDescriptor:
+    """
+    Small message describing a frame written to the shared memory ring, sent instead of the frame itself
+    """
+
+    def __init__(self, slot: int, sequence: int, frame_number: int, size: int, shape: tuple | None = None,
+                 encoding: str = FrameEncoding.Jpeg.value):
+        self.slot = slot
+        self.sequence = sequence
+        self.frame_number = frame_number
+        self.size = size
+        self.shape = tuple(shape) if shape else None
+        self.encoding = encoding
+
+    def to_message(self) -> str:
+        return json.dumps({'slot': self.slot, 'sequence': self.sequence, 'frame_number': self.frame_number, 'size': self.size,
+                           'shape': self.shape, 'encoding': self.encoding})
+
+    @staticmethod
+    def from_message(message: str) -> 'FrameDescriptor':
+        descriptor = json.loads(message)
+        return FrameDescriptor(descriptor['slot'], descriptor['sequence'], descriptor['frame_number'], descriptor['size'],
+                               descriptor.get('shape'), descriptor.get('encoding', FrameEncoding.Jpeg.value))
+
+
+class SharedMemoryFrameRing:
+    """
+    Fixed number of frame slots on a named shared memory block, written by the capture source and mapped by the UI.
+    Every slot starts with the sequence number of the frame written to it, so a reader can detect a slot which was
+    overwritten by the producer after its descriptor was sent.
+    """
+
+    def __init__(self, name: str | None = None, slots_count: int = SHARED_MEMORY_SLOTS_COUNT,
+                 slot_size: int = SHARED_MEMORY_SLOT_SIZE, create: bool = False):
+        """
+        :param name: Shared memory block name, None generates a unique name (create only)
+        :param slots_count: Number of frame slots, used only when creating the ring
+        :param slot_size: Maximal frame size in bytes, used only when creating the ring
+        :param create: Create the shared memory block, otherwise attach to an existing one
+        """
+        if create:
+            self.__shared_memory = shared_memory.SharedMemory(name=name, create=True,
+                                                              size=RING_HEADER.size + slots_count * (SLOT_HEADER.size + slot_size))
+            RING_HEADER.pack_into(self.__shared_memory.buf, 0, slots_count, slot_size)
+        else:
+            self.__shared_memory = shared_memory.SharedMemory(name=name)
+        self.slots_count, self.slot_size = RING_HEADER.unpack_from(self.__shared_memory.buf, 0)
+        self.__is_owner = create
+        # The block can't be unmapped while views on it are exported, close waits for the mapped frames to be released
+        self.__condition = Condition()
+        self.__mapped_count = 0
+        self.__is_closed = False
+
+    @property
+    def name(self) -> str:
+        return self.__shared_memory.name
+
+    def __slot_offset(self, slot: int) -> int:
+        return RING_HEADER.size + slot * (SLOT_HEADER.size + self.slot_size)
+
+    def write(self, slot: int, sequence: int, frame: bytes | memoryview) -> None:
+        if len(frame) > self.slot_size:
+            raise ValueError(f'Frame of {len(frame)} bytes exceeds the shared memory slot size of {self.slot_size} bytes')
+        offset = self.__slot_offset(slot)
+        # Invalidate the slot first, so a concurrent reader never accepts a half written frame
+        SLOT_HEADER.pack_into(self.__shared_memory.buf, offset, 0, 0)
+        self.__shared_memory.buf[offset + SLOT_HEADER.size:offset + SLOT_HEADER.size + len(frame)] = frame
+        SLOT_HEADER.pack_into(self.__shared_memory.buf, offset, sequence, len(frame))
+
+    def read(self, descriptor: FrameDescriptor) -> memoryview | None:
+        """
+        Map the described frame without copying it
+        :return: View on the frame slot, None if the slot was already overwritten with a newer frame
+        """
+        offset = self.__slot_offset(descriptor.slot)
+        sequence, size = SLOT_HEADER.unpack_from(self.__shared_memory.buf, offset)
+        if sequence != descriptor.sequence or size != descriptor.size:
+            return None
+        return self.__shared_memory.buf[offset + SLOT_HEADER.size:offset + SLOT_HEADER.size + size]
+
+    @contextmanager
+    def mapped(self, descriptor: FrameDescriptor) -> Iterator[memoryview | None]:
+        """
+        View on the described frame which is released on exit, None if the slot was overwritten or the ring was closed
+        """
+        with self.__condition:
+            frame_view = None if self.__is_closed else self.read(descriptor)
+            if frame_view is not None:
+                self.__mapped_count += 1
+        try:
+            yield frame_view
+        finally:
+            if frame_view is not None:
+                frame_view.release()
+                with self.__condition:
+                    self.__mapped_count -= 1
+                    self.__condition.notify_all()
+
+    def is_valid(self, descriptor: FrameDescriptor) -> bool:
+        """
+        :return: True if the described frame wasn't overwritten since it was read, False once the ring is closed
+        """
+        with self.__condition:
+            if self.__is_closed:
+                return False
+            sequence, _ = SLOT_HEADER.unpack_from(self.__shared_memory.buf, self.__slot_offset(descriptor.slot))
+            return sequence == descriptor.sequence
+
+    def close(self) -> None:
+        with self.__condition:
+            if self.__is_closed:
+                return
+            self.__is_closed = True
+            self.__condition.wait_for(lambda: self.__mapped_count == 0)
+        self.__shared_memory.close()
+        if self.__is_owner:
+            self.__shared_memory.unlink()
+
+
+class SharedMemoryFrame:
+    """
+    Frame left on its shared memory ring slot instead of being copied when its descriptor is received.
+    The slot is mapped only while the frame is decoded, as the producer overwrites it once the ring wraps around.
+    """
+
+    def __init__(self, frame_ring: SharedMemoryFrameRing, descriptor: FrameDescriptor):
+        self.frame_ring = frame_ring
+        self.descriptor = descriptor
+
+    def __len__(self) -> int:
+        return self.descriptor.size
+
+    def is_valid(self) -> bool:
+        return self.frame_ring.is_valid(self.descriptor)
+
+    @contextmanager
+    def view(self) -> Iterator[memoryview]:
+        """
+        :raise FrameOverwritten: if the slot was overwritten before or while the frame was used
+        """
+        with self.frame_ring.mapped(self.descriptor) as frame_view:
+            if frame_view is None:
+                raise FrameOverwritten(f'Frame {self.descriptor.frame_number} was overwritten on the shared memory')
+            yield frame_view
+        if not self.is_valid():
+            raise FrameOverwritten(f'Frame {self.descriptor.frame_number} was overwritten on the shared memory while it was read')
+
+
+class SharedMemoryFrameProducer:
+    """
+    Write frames round robin to the shared memory ring and build their descriptors.
+    Used by a Python capture source and as a stand in for the capture plugin on tests.
+    """
+
+    def __init__(self, frame_ring: SharedMemoryFrameRing):
+        self.__frame_ring = frame_ring
+        self.__lock = Lock()
+        self.__sequence = 0
+
+    def write_frame(self, frame: bytes | memoryview, frame_number: int, shape: tuple | None = None,
+                    encoding: str = FrameEncoding.Jpeg.value) -> FrameDescriptor:
+        with self.__lock:
+            self.__sequence += 1
+            slot = (self.__sequence - 1) % self.__frame_ring.slots_count
+            self.__frame_ring.write(slot, self.__sequence, frame)
+            return FrameDescriptor(slot, self.__sequence, frame_number, len(frame), shape, encoding)
@@ -0,0 +1,86 @@
+import io
+from threading import Lock
+from typing import Hashable
+
+from PIL import Image, ImageChops, ImageStat
+
+from PluginSheldonVision.Constants import STATIC_FRAME_FINGERPRINT_SIZE, STATIC_FRAME_DIFF_THRESHOLD
+from PluginSheldonVision.FrameDecoder import RawFrame, is_raw_frame, is_shared_memory_frame, mapped_frame
+from PluginSheldonVision.SharedMemoryFrames import SharedMemoryFrame
+
+JPEG_DRAFT_SCALE = 8
+
+
+def frame_fingerprint(frame: bytes | RawFrame | SharedMemoryFrame, fingerprint_size: int = STATIC_FRAME_FINGERPRINT_SIZE) -> Image.Image:
+    """
+    Tiny grayscale thumbnail of the frame. JPEG frames are decoded at 1/8 of their resolution (DCT scaling), so computing the
+    fingerprint costs a small fraction of a full decode
+    :raise PIL.UnidentifiedImageError: if an encoded frame isn't a valid image
+    :raise FrameOverwritten: if a shared memory frame was overwritten before it was decoded
+    """
+    if is_shared_memory_frame(frame):
+        with frame.view() as frame_view:
+            return frame_fingerprint(mapped_frame(frame, frame_view), fingerprint_size)
+    if is_raw_frame(frame):
+        image = frame.to_image()
+    else:
+        image = Image.open(io.BytesIO(frame))
+        image.draft('L', (image.width // JPEG_DRAFT_SCALE, image.height // JPEG_DRAFT_SCALE))
+    return image.convert('L').resize((fingerprint_size, fingerprint_size), Image.BILINEAR)
+
+
+class StaticFrameDetector:
+    """
+    Reuse the rendered output of a view while its frames and their metadata don't change, e.g. static background recordings.
+    A frame is static when the mean difference of its fingerprint from the fingerprint of the rendered frame is below the
+    threshold. The rendered frame stays the reference, so a slow drift is eventually rendered.
+    Outputs are kept per render key (active layers, JPEG quality, scale), as every stream client may render differently.
+    """
+
+    def __init__(self, threshold: float = STATIC_FRAME_DIFF_THRESHOLD):
+        """
+        :param threshold: Mean absolute gray level difference (0-255) of two fingerprints considered the same frame
+        """
+        self.__threshold = threshold
+        self.__reference_fingerprint: Image.Image | None = None
+        self.__reference_metadata = None
+        self.__outputs: dict[Hashable, bytes] = {}
+        self.__lock = Lock()
+        self.frames_count = 0
+        self.skipped_count = 0
+
+    def get_output(self, fingerprint: Image.Image, metadata, render_key: Hashable) -> bytes | None:
+        """
+        :param metadata: Metadata the frame is rendered with, compared by value
+        :return: The output rendered for an identical frame and metadata, None if the frame has to be rendered
+        """
+        with self.__lock:
+            self.frames_count += 1
+            output = self.__outputs.get(render_key)
+            if output is None or metadata != self.__reference_metadata or not self.__is_same_frame(fingerprint):
+                return None
+            self.skipped_count += 1
+            return output
+
+    def put_output(self, fingerprint: Image.Image, metadata, render_key: Hashable, output: bytes) -> None:
+        with self.__lock:
+            if metadata != self.__reference_metadata or not self.__is_same_frame(fingerprint):
+                self.__reference_fingerprint = fingerprint
+                self.__reference_metadata = metadata
+                self.__outputs.clear()
+            self.__outputs[render_key] = output
+
+    def reset(self) -> None:
+        with self.__lock:
+            self.__reference_fingerprint = None
+            self.__reference_metadata = None
+            self.__outputs.clear()
+
+    def get_stats(self) -> dict:
+        return {'frames': self.frames_count, 'skipped': self.skipped_count,
+                'skip_rate': self.skipped_count / self.frames_count if self.frames_count else 0.0}
+
+    def __is_same_frame(self, fingerprint: Image.Image) -> bool:
+        if self.__reference_fingerprint is None:
+            return False
+        return ImageStat.Stat(ImageChops.difference(fingerprint, self.__reference_fingerprint)).mean[0] <= self.__threshold
@@ -0,0 +1,125 @@
+import json
+import logging
+import math
+import os
+import traceback
+from importlib.util import find_spec
+from threading import Event, Lock, Thread
+
+from PIL import Image
+
+from PluginSheldonVision.Constants import VIDEO_CACHE_PATH, THUMBNAIL_SPRITE_MAX_THUMBNAILS, THUMBNAIL_SPRITE_COLUMNS, \
+    THUMBNAIL_WIDTH, THUMBNAIL_SPRITE_JPEG_QUALITY
+from PluginSheldonVision.KeyframeIndex import get_video_hash
+
+THUMBNAIL_SPRITE_VERSION = 1
+THUMBNAIL_SPRITE_SUFFIX = '.sprite.jpg'
+THUMBNAIL_SPRITE_INDEX_SUFFIX = '.sprite.json'
+
+
+class ThumbnailSpriteGenerator:
+    """
+    Timeline preview of the loaded video: every Nth frame is downscaled into a single sprite sheet (JPEG) with an index file,
+    both cached on disk by the video hash. Generated by a background job when a video is loaded, served as static files.
+    """
+
+    def __init__(self, cache_path: str = VIDEO_CACHE_PATH, max_thumbnails: int = THUMBNAIL_SPRITE_MAX_THUMBNAILS,
+                 columns: int = THUMBNAIL_SPRITE_COLUMNS, thumbnail_width: int = THUMBNAIL_WIDTH):
+        """
+        :param max_thumbnails: The sampling interval is chosen so the sprite holds at most this number of thumbnails
+        """
+        self.__cache_path = cache_path
+        self.__max_thumbnails = max_thumbnails
+        self.__columns = columns
+        self.__thumbnail_width = thumbnail_width
+        self.__cancel_event: Event | None = None
+        self.__lock = Lock()
+
+    def get_sprite_path(self, video_hash: str) -> str:
+        return os.path.join(self.__cache_path, video_hash + THUMBNAIL_SPRITE_SUFFIX)
+
+    def get_index_path(self, video_hash: str) -> str:
+        return os.path.join(self.__cache_path, video_hash + THUMBNAIL_SPRITE_INDEX_SUFFIX)
+
+    def get_index(self, video_path: str) -> dict | None:
+        """
+        :return: The sprite index of the video, None if the sprite wasn't generated yet
+        """
+        if not video_path or not os.path.isfile(video_path):
+            return None
+        try:
+            with open(self.get_index_path(get_video_hash(video_path)), 'r') as index_file:
+                index = json.load(index_file)
+        except (OSError, ValueError):
+            return None
+        return index if index.get('version') == THUMBNAIL_SPRITE_VERSION else None
+
+    def generate_async(self, video_path: str) -> None:
+        """
+        Generate the sprite of a local video file in the background, a previous generation is cancelled
+        """
+        if find_spec('av') is None:
+            logging.warning(f'PyAV is not installed, no thumbnails are generated for {video_path}')
+            return
+        cancel_event = Event()
+        with self.__lock:
+            if self.__cancel_event:
+                self.__cancel_event.set()
+            self.__cancel_event = cancel_event
+        Thread(target=self.__generate_safe, args=(video_path, cancel_event), name='ThumbnailSpriteGenerator', daemon=True).start()
+
+    def generate(self, video_path: str, cancel_event: Event | None = None) -> dict | None:
+        """
+        :return: The sprite index, None if the video couldn't be read or the generation was cancelled
+        """
+        index = self.get_index(video_path)
+        if index is not None:
+            return index
+        from PluginSheldonVision.KeyframeIndex import KeyframeIndexedVideoReader
+
+        reader = KeyframeIndexedVideoReader(self.__cache_path, gop_cache_size=1)
+        if not reader.open(video_path):
+            logging.error(f"Couldn't open {video_path} for thumbnails")
+            return None
+        try:
+            interval = max(1, math.ceil(reader.frames_count / self.__max_thumbnails))
+            frame_numbers = list(range(0, reader.frames_count, interval))
+            thumbnails = []
+            # Each sample seeks to its nearest keyframe, at most a single GOP is decoded per thumbnail
+            for frame_number in frame_numbers:
+                if cancel_event and cancel_event.is_set():
+                    return None
+                image = reader.get_frame(frame_number)
+                if image is None:
+                    break
+                thumbnail = Image.fromarray(image[:, :, ::-1])
+                thumbnail_height = max(1, round(thumbnail.height * self.__thumbnail_width / thumbnail.width))
+                thumbnails.append(thumbnail.resize((self.__thumbnail_width, thumbnail_height), Image.BILINEAR))
+        finally:
+            reader.release()
+        if not thumbnails:
+            return None
+        return self.__save(video_path, frame_numbers[:len(thumbnails)], interval, thumbnails)
+
+    def __save(self, video_path: str, frame_numbers: list[int], interval: int, thumbnails: list[Image.Image]) -> dict:
+        thumbnail_width, thumbnail_height = thumbnails[0].size
+        columns = min(self.__columns, len(thumbnails))
+        rows = math.ceil(len(thumbnails) / columns)
+        sprite = Image.new('RGB', (columns * thumbnail_width, rows * thumbnail_height))
+        for thumbnail_index, thumbnail in enumerate(thumbnails):
+            sprite.paste(thumbnail, ((thumbnail_index % columns) * thumbnail_width, (thumbnail_index // columns) * thumbnail_height))
+        video_hash = get_video_hash(video_path)
+        index = {'version': THUMBNAIL_SPRITE_VERSION, 'video_hash': video_hash, 'interval': interval, 'frames': frame_numbers,
+                 'columns': columns, 'thumbnail_width': thumbnail_width, 'thumbnail_height': thumbnail_height}
+        os.makedirs(self.__cache_path, exist_ok=True)
+        sprite.save(self.get_sprite_path(video_hash), format='JPEG', quality=THUMBNAIL_SPRITE_JPEG_QUALITY)
+        # The index is written last, an existing index means the sprite is complete
+        with open(self.get_index_path(video_hash), 'w') as index_file:
+            json.dump(index, index_file)
+        return index
+
+    def __generate_safe(self, video_path: str, cancel_event: Event) -> None:
+        try:
+            self.generate(video_path, cancel_event)
+        except:
+            logging.error(f'Thumbnails generation of {video_path} cause some error: {traceback.format_exc()}')
@@ -0,0 +1,74 @@
+// Render frames pushed on the frames WebSocket into the online frame views.
+// Every message is a fixed size header followed by a JPEG frame, see FrameStreamProtocol.py
+(function () {
+    const HEADER_SIZE = 26;
+    const MAGIC = 'SVFR';
+    const VERSION = 1;
+    const RECONNECT_DELAY_MS = 1000;
+    const FRAME_NUMBER_LABEL_ID = 'FrameStreamNumberLabel';
+
+    const frameStream = window.sheldonFrameStream = window.sheldonFrameStream || {
+        frameNumber: null,
+        views: {}
+    };
+
+    function parseHeader(buffer) {
+        const view = new DataView(buffer, 0, HEADER_SIZE);
+        const magic = String.fromCharCode(view.getUint8(0), view.getUint8(1), view.getUint8(2), view.getUint8(3));
+        if (magic !== MAGIC || view.getUint8(4) !== VERSION) {
+            return null;
+        }
+        return {
+            view: view.getUint8(5),
+            frameNumber: view.getUint32(6, true),
+            receivedTimestamp: view.getFloat64(10, true),
+            sentTimestamp: view.getFloat64(18, true)
+        };
+    }
+
+    function connect(image) {
+        const url = (window.location.protocol === 'https:' ? 'wss://' : 'ws://') + window.location.host + image.dataset.frameSocket;
+        const socket = new WebSocket(url);
+        socket.binaryType = 'arraybuffer';
+        let previousUrl = null;
+
+        socket.onmessage = function (event) {
+            const header = parseHeader(event.data);
+            if (header === null) {
+                return;
+            }
+            const frameUrl = URL.createObjectURL(new Blob([new Uint8Array(event.data, HEADER_SIZE)], {type: 'image/jpeg'}));
+            image.src = frameUrl;
+            if (previousUrl !== null) {
+                URL.revokeObjectURL(previousUrl);
+            }
+            previousUrl = frameUrl;
+            frameStream.views[header.view] = header;
+            // The frame number of the primary view is shown from the message of the displayed frame itself.
+            // The label is display only, writing the slider would trigger a seek of the player while it plays
+            if (header.view === 0) {
+                frameStream.frameNumber = header.frameNumber;
+                const frameNumberLabel = document.getElementById(FRAME_NUMBER_LABEL_ID);
+                if (frameNumberLabel !== null) {
+                    frameNumberLabel.textContent = 'Displayed Frame: ' + header.frameNumber;
+                }
+            }
+        };
+        socket.onclose = function () {
+            delete image.dataset.frameSocketConnected;
+            setTimeout(connectAll, RECONNECT_DELAY_MS);
+        };
+    }
+
+    function connectAll() {
+        document.querySelectorAll('img[data-frame-socket]').forEach(function (image) {
+            if (!image.dataset.frameSocketConnected) {
+                image.dataset.frameSocketConnected = 'true';
+                connect(image);
+            }
+        });
+    }
+
+    // The frame views are rendered by Dash after the page is loaded
+    new MutationObserver(connectAll).observe(document.documentElement, {childList: true, subtree: true});
+})();
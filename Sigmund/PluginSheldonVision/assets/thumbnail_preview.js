@@ -0,0 +1,84 @@
+// Preview the frame under the mouse while hovering the frame slider.
+// Thumbnails are cut from the sprite sheet of the loaded video, see ThumbnailSprites.py, no frame is fetched from the server
+(function () {
+    const SLIDER_ID = 'CyclesRange';
+    const INDEX_URL = '/thumbnails';
+    const PREVIEW_OFFSET_PX = 12;
+
+    let spriteIndex = null;
+    let preview = null;
+
+    function getPreview() {
+        if (preview === null) {
+            preview = document.createElement('div');
+            preview.style.cssText = 'position: fixed; display: none; pointer-events: none; z-index: 1000; ' +
+                'border: 1px solid white; box-shadow: 0 0 4px black;';
+            document.body.appendChild(preview);
+        }
+        return preview;
+    }
+
+    function loadIndex() {
+        // Reloaded on every hover, the loaded video may have changed or its sprite may be ready by now
+        fetch(INDEX_URL).then(function (response) {
+            return response.ok ? response.json() : null;
+        }).then(function (index) {
+            spriteIndex = index;
+        }).catch(function () {
+            spriteIndex = null;
+        });
+    }
+
+    function getHoveredFrame(slider, event) {
+        const rail = slider.querySelector('.rc-slider-rail');
+        const handle = slider.querySelector('.rc-slider-handle');
+        if (rail === null || handle === null) {
+            return null;
+        }
+        const bounds = rail.getBoundingClientRect();
+        const min = Number(handle.getAttribute('aria-valuemin'));
+        const max = Number(handle.getAttribute('aria-valuemax'));
+        const position = Math.min(Math.max((event.clientX - bounds.left) / bounds.width, 0), 1);
+        return Math.round(min + position * (max - min));
+    }
+
+    function showPreview(slider, event) {
+        const frameNumber = getHoveredFrame(slider, event);
+        const thumbnailPreview = getPreview();
+        if (spriteIndex === null || frameNumber === null || slider.querySelector('.rc-slider-disabled') !== null) {
+            thumbnailPreview.style.display = 'none';
+            return;
+        }
+        const thumbnailIndex = Math.min(Math.round(frameNumber / spriteIndex.interval), spriteIndex.frames.length - 1);
+        const column = thumbnailIndex % spriteIndex.columns;
+        const row = Math.floor(thumbnailIndex / spriteIndex.columns);
+        thumbnailPreview.style.width = spriteIndex.thumbnail_width + 'px';
+        thumbnailPreview.style.height = spriteIndex.thumbnail_height + 'px';
+        thumbnailPreview.style.backgroundImage = 'url(' + spriteIndex.sprite_url + ')';
+        thumbnailPreview.style.backgroundPosition =
+            (-column * spriteIndex.thumbnail_width) + 'px ' + (-row * spriteIndex.thumbnail_height) + 'px';
+        thumbnailPreview.style.left = (event.clientX - spriteIndex.thumbnail_width / 2) + 'px';
+        thumbnailPreview.style.top = (event.clientY - spriteIndex.thumbnail_height - PREVIEW_OFFSET_PX) + 'px';
+        thumbnailPreview.style.display = 'block';
+    }
+
+    function hidePreview() {
+        getPreview().style.display = 'none';
+    }
+
+    function attach() {
+        const slider = document.getElementById(SLIDER_ID);
+        if (slider === null || slider.dataset.thumbnailPreview) {
+            return;
+        }
+        slider.dataset.thumbnailPreview = 'true';
+        slider.addEventListener('mouseenter', loadIndex);
+        slider.addEventListener('mousemove', function (event) {
+            showPreview(slider, event);
+        });
+        slider.addEventListener('mouseleave', hidePreview);
+    }
+
+    // The slider is rendered by Dash after the page is loaded
+    new MutationObserver(attach).observe(document.documentElement, {childList: true, subtree: true});
+})();
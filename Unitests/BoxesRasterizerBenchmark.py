@@ -0,0 +1,67 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "Sigmund"))
+
+from PluginSheldonVision.PlotLayers.BoxesRasterizer import draw_rects
+from PluginSheldonVision.PlotLayers.Elements import GUIRect
+
+BENCHMARK_BOXES_COUNTS = (10, 100, 1000)
+BENCHMARK_FRAME_SIZE = (1280, 720)
+BENCHMARK_REPEATS = 20
+
+
+def draw_rects_with_pil(image: Image.Image, rects: list[GUIRect]) -> Image.Image:
+    draw = ImageDraw.Draw(image)
+    for rect in rects:
+        draw.rectangle([(rect.left, rect.top), (rect.right, rect.bottom)], outline=rect.color, width=rect.line_width)
+    return image
+
+
+def create_random_rects(boxes_count: int, size: tuple[int, int], seed: int = 0) -> list[GUIRect]:
+    """
+    Overlapping rectangles, some of them partially outside the image
+    """
+    random = np.random.default_rng(seed)
+    colors = ['red', 'green', 'blue', 'white', 'yellow', 'orange']
+    rects = []
+    for _ in range(boxes_count):
+        left, top = random.uniform(-0.1, 0.9) * size[0], random.uniform(-0.1, 0.9) * size[1]
+        rect_width, rect_height = random.uniform(10, size[0] / 4), random.uniform(10, size[1] / 4)
+        rects.append(GUIRect(left, top, left + rect_width, top + rect_height, colors[random.integers(len(colors))],
+                             int(random.integers(1, 6))))
+    return rects
+
+
+def benchmark(boxes_counts: tuple[int, ...] = BENCHMARK_BOXES_COUNTS, size: tuple[int, int] = BENCHMARK_FRAME_SIZE,
+              repeats: int = BENCHMARK_REPEATS) -> dict[int, dict[str, float]]:
+    """
+    :return: Average milliseconds of drawing the rectangles of a frame with PIL and with the rasterizer, per number of rectangles
+    """
+    results = {}
+    frame = Image.new('RGB', size)
+    for boxes_count in boxes_counts:
+        rects = create_random_rects(boxes_count, size)
+        results[boxes_count] = {}
+        for name, draw_method in (('pil_ms', draw_rects_with_pil), ('numpy_ms', draw_rects)):
+            start = time.perf_counter()
+            for _ in range(repeats):
+                draw_method(frame.copy(), rects)
+            results[boxes_count][name] = (time.perf_counter() - start) / repeats * 1000
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark drawing bounding boxes with PIL and with the NumPy rasterizer')
+    parser.add_argument('--boxes', type=int, nargs='+', default=list(BENCHMARK_BOXES_COUNTS), help='Numbers of boxes per frame')
+    parser.add_argument('--width', type=int, default=BENCHMARK_FRAME_SIZE[0], help='Frame width')
+    parser.add_argument('--height', type=int, default=BENCHMARK_FRAME_SIZE[1], help='Frame height')
+    parser.add_argument('--repeats', type=int, default=BENCHMARK_REPEATS, help='Frames drawn per measurement')
+    args = parser.parse_args()
+    for boxes_count, timing in benchmark(tuple(args.boxes), (args.width, args.height), args.repeats).items():
+        print(f"{boxes_count} boxes: PIL {timing['pil_ms']:.2f} ms, NumPy {timing['numpy_ms']:.2f} ms")
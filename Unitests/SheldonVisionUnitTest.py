@@ -1,8 +1,17 @@
 import sys
 import os
+import io
+import logging
+import tempfile
+import threading
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from importlib.util import find_spec
 from unittest import mock
 
+import numpy as np
+from PIL import Image, ImageDraw
+
 sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
 
 from PyPluginBase.Transport.TestingTransport import TestingTransport
@@ -14,6 +23,28 @@ from PluginSheldonVision.MetaDataHandler import KEYS, FRAME_ID, NO_DATA_MESSAGE,
 from PluginSheldonVision.Constants import CONFIG_VIDEO_FILE_PATH, CONFIG_DEBUG_FILE_PATH, CONFIG_METADATA_FILE_PATH, \
     CONFIG_PRIMARY_SECTION, CONFIG_LAYERS_LIST, CONFIG_SECONDARY_SECTION
 from PluginSheldonVision.PluginSheldonVisionUiDashModule import MainSheldonVisionUI
+from PluginSheldonVision.FrameBroadcastBus import FrameBroadcastBus
+from PluginSheldonVision.FrameCache import FrameCache
+from PluginSheldonVision.FramePrefetcher import FramePrefetcher
+from PluginSheldonVision.FramesRingBuffer import FramesRingBuffer
+from PluginSheldonVision.MessageDispatcher import MessageDispatcher
+from PluginSheldonVision.SharedMemoryFrames import SharedMemoryFrame, SharedMemoryFrameRing, SharedMemoryFrameProducer
+from PluginSheldonVision.Exceptions import FrameOverwritten
+from PluginSheldonVision.FrameDecoder import RawFrame, decode_frame, frame_to_jpeg, frame_to_data_uri, encode_jpeg
+from PluginSheldonVision.StaticFrameDetector import StaticFrameDetector, frame_fingerprint
+from PluginSheldonVision.PipelineMetrics import PipelineMetrics, PipelineStage
+from PluginSheldonVision.OrderedRenderPipeline import OrderedRenderPipeline
+from PluginSheldonVision.PlotLayers.PlotLayerBase import PlotLayerBase, RECTS, TEXT
+from PluginSheldonVision.PlotLayers.Elements import GUIRect, GUIText
+from PluginSheldonVision.PlotLayers.LayersCompositor import LayersDisplayList, LayersOverlay, get_font
+from PluginSheldonVision.PlotLayers.BoxesRasterizer import draw_boxes, draw_rects, rects_to_arrays
+from PluginSheldonVision.PlotLayers.BoundingBoxLayer import BoundingBoxLayer
+from PluginSheldonVision.PlotLayers.LayersShapesPayload import LayersShapesPayload, payload_to_shapes, OVERLAY_META_KEY
+from PluginSheldonVision.AdaptiveStreaming import AdaptiveStreamController
+from PluginSheldonVision.FrameStreamProtocol import pack_frame_message, unpack_frame_message, FRAME_MESSAGE_HEADER
+from PluginSheldonVision.PluginRequests import PluginRequestsTracker
+from PluginSheldonVision.KeyframeIndex import KeyframeIndexedVideoReader, KEYFRAME_INDEX_SUFFIX, get_video_hash
+from PluginSheldonVision.ThumbnailSprites import ThumbnailSpriteGenerator
 from dash._callback_context import context_value
 from dash._utils import AttributeDict
 from SheldonCommon.Constants import N_CLICKS_ID, TRIGGER_INPUTS_ID
@@ -257,16 +288,828 @@ class SheldonUiPluginUnitTest(unittest.TestCase):
         send_registration_ack_message(self.plugin_name, self.transport)
 
         sigmund_msg = SigmundMsg(CAMERA_FRAMES_MESSAGE_TYPE, DEFAULT_PLUGIN_NAME, sent_frame_data, sent_frame_number)
+        subscription = FramesBus.subscribe(MetaDataType.PRIMARY.value)
 
         self.transport.send_message_to_plugin(sigmund_msg)
         send_stop_message(self.plugin_name, self.transport)
         is_reg_ask_sent = run_plugin_and_check_registration_ask(plugin, self.transport)
 
         self.assertTrue(is_reg_ask_sent)
-        (frame_data, frame_number) = FramesQueue.get()
+        (frame_data, frame_number) = subscription.get()
+        FramesBus.unsubscribe(subscription)
         self.assertTrue(sent_frame_data, frame_data)
         self.assertTrue(sent_frame_number, frame_number)
 
+    def test_shared_memory_frame_message(self):
+        """
+        Test that a frame written by a local producer to the shared memory ring is received through its descriptor without a copy
+        @return:
+        """
+        sent_frame_data = bytes([1, 2, 3])
+        frame_ring = SharedMemoryFrameRing(slots_count=1, slot_size=len(sent_frame_data), create=True)
+        producer = SharedMemoryFrameProducer(frame_ring)
+        self.transport.input_types = self.inputs
+        plugin = SheldonVisionUiPlugin(self.plugin_name, self.inputs, [], self.transport)
+        plugin.attach_shared_memory_frames(frame_ring.name)
+        subscription = FramesBus.subscribe(MetaDataType.PRIMARY.value)
+
+        descriptor = producer.write_frame(sent_frame_data, 7)
+        plugin.dispatcher.dispatch(mock.MagicMock(msg_type=SHARED_MEMORY_FRAME_MESSAGE_TYPE,
+                                                  get_string_message=mock.MagicMock(return_value=descriptor.to_message())))
+        (frame_data, frame_number) = subscription.get(timeout=EVENTS_TIMEOUT_SECONDS)
+        FramesBus.unsubscribe(subscription)
+        self.assertIsInstance(frame_data, SharedMemoryFrame)
+        self.assertEqual(frame_to_jpeg(frame_data), sent_frame_data)
+        self.assertEqual(frame_number, 7)
+        self.assertTrue(plugin.load_cached_frame(7))
+
+        producer.write_frame(bytes([4, 5, 6]), 8)
+        self.assertIsNone(plugin.shared_memory_frames.read(descriptor))
+        with self.assertRaises(FrameOverwritten):
+            frame_to_jpeg(frame_data)
+        # The overwritten frame is dropped from the frames cache, so it's requested from the player again
+        self.assertFalse(plugin.load_cached_frame(7))
+        self.assertNotIn((plugin.loaded_video_path, 7), plugin.frames_cache)
+
+        plugin.detach_shared_memory_frames()
+        self.assertIsNone(plugin.shared_memory_frames)
+        frame_ring.close()
+
+    def test_shared_memory_frame_overwritten_while_decoded(self):
+        """
+        Test that a shared memory frame whose slot is overwritten by the producer while it's decoded fails to decode
+        @return:
+        """
+        frame_ring = SharedMemoryFrameRing(slots_count=1, slot_size=3, create=True)
+        producer = SharedMemoryFrameProducer(frame_ring)
+        frame = SharedMemoryFrame(frame_ring, producer.write_frame(bytes([1, 2, 3]), 7))
+
+        with self.assertRaises(FrameOverwritten):
+            with frame.view() as frame_view:
+                self.assertEqual(frame_view.tobytes(), bytes([1, 2, 3]))
+                producer.write_frame(bytes([4, 5, 6]), 8)
+        self.assertFalse(frame.is_valid())
+        frame_ring.close()
+
+    def test_shared_memory_frames_attached_again_on_restart(self):
+        """
+        Test that the ring is closed and mapped again when the capture source restarts, and that the old frames stop decoding
+        @return:
+        """
+        frame_ring = SharedMemoryFrameRing(slots_count=2, slot_size=3, create=True)
+        self.transport.input_types = self.inputs
+        plugin = SheldonVisionUiPlugin(self.plugin_name, self.inputs, [], self.transport)
+        plugin.attach_shared_memory_frames(frame_ring.name)
+        plugin.send_log = mock.MagicMock()
+
+        def dispatch_frame(producer: SharedMemoryFrameProducer, frame_data: bytes, frame_number: int):
+            descriptor = producer.write_frame(frame_data, frame_number)
+            plugin.dispatcher.dispatch(mock.MagicMock(msg_type=SHARED_MEMORY_FRAME_MESSAGE_TYPE,
+                                                      get_string_message=mock.MagicMock(return_value=descriptor.to_message())))
+            return plugin.get_current_frame()
+
+        producer = SharedMemoryFrameProducer(frame_ring)
+        dispatch_frame(producer, bytes([1, 2, 3]), 1)
+        old_frame = dispatch_frame(producer, bytes([4, 5, 6]), 2)
+        attached_ring = plugin.shared_memory_frames
+
+        # The restarted capture source writes to the ring from the start of its sequence
+        new_frame = dispatch_frame(SharedMemoryFrameProducer(frame_ring), bytes([7, 8, 9]), 3)
+
+        self.assertIsNot(plugin.shared_memory_frames, attached_ring)
+        self.assertFalse(attached_ring.is_valid(old_frame.descriptor))
+        with self.assertRaises(FrameOverwritten):
+            frame_to_jpeg(old_frame)
+        self.assertEqual(frame_to_jpeg(new_frame), bytes([7, 8, 9]))
+
+        plugin.detach_shared_memory_frames()
+        frame_ring.close()
+
+    def test_raw_frame_encoded_once(self):
+        """
+        Test that a raw BGR frame is decoded without JPEG and that encoded frames are not encoded again
+        @return:
+        """
+        blue, green, red = 10, 20, 30
+        raw_frame = RawFrame(bytes([blue, green, red] * 4), (2, 2, 3), SheldonVisionConstants.FrameEncoding.RawBgr.value)
+
+        image = decode_frame(raw_frame)
+        self.assertEqual(image.size, (2, 2))
+        self.assertEqual(image.getpixel((0, 0)), (red, green, blue))
+
+        jpeg_frame = frame_to_jpeg(raw_frame)
+        self.assertEqual(decode_frame(jpeg_frame).format, 'JPEG')
+        self.assertIs(frame_to_jpeg(jpeg_frame), jpeg_frame)
+
+    def test_raw_frame_array_drawn_in_place(self):
+        """
+        Test that the layers overlay is blended into the pixels array of a raw BGR frame same as it's pasted on the decoded image
+        @return:
+        """
+        frame_size = (64, 48)
+        random = np.random.default_rng(0)
+        bgr_pixels = random.integers(0, 256, (frame_size[1], frame_size[0], 3), dtype=np.uint8)
+        raw_frame = RawFrame(bgr_pixels, bgr_pixels.shape, SheldonVisionConstants.FrameEncoding.RawBgr.value)
+        self.assertEqual(len(raw_frame), bgr_pixels.nbytes)
+
+        display_list = LayersDisplayList()
+        display_list.add_layer_elements([GUIRect(5, 5, 40, 30, 'red', 2), GUIRect(20, 10, 60, 45, (0, 255, 0, 128), 3)], [])
+        overlay = LayersOverlay(display_list, frame_size)
+
+        pixels = raw_frame.to_rgb_array()
+        overlay.composite_array(pixels)
+        expected_pixels = np.asarray(overlay.composite(decode_frame(raw_frame).copy()), dtype=np.int16)
+        self.assertLessEqual(np.abs(pixels.astype(np.int16) - expected_pixels).max(), 1)
+        # The frame itself may be cached and shown again, only its copy is drawn on
+        self.assertTrue(np.array_equal(raw_frame.to_rgb_array(), bgr_pixels[..., ::-1]))
+
+    @unittest.skipUnless(find_spec('cv2'), 'opencv-python is not installed')
+    def test_python_frame_source_raw_frames(self):
+        """
+        Test that the in process Python frame source hands over the BGR frames as is when raw frames are requested
+        @return:
+        """
+        import cv2
+        from PluginSheldonVision.PythonFrameSource import VideoFileFrameSource
+
+        with tempfile.TemporaryDirectory() as video_dir:
+            video_path = os.path.join(video_dir, 'clip.avi')
+            video_writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*'MJPG'), SheldonVisionConstants.DEFAULT_FPS, (64, 48))
+            for frame_index in range(5):
+                video_writer.write(np.full((48, 64, 3), frame_index * 10, np.uint8))
+            video_writer.release()
+
+            messages = []
+            frame_source = VideoFileFrameSource(lambda msg_type, msg, metadata: messages.append((msg_type, msg, metadata)),
+                                                raw_frames=True)
+            frame_source.load_request(video_path)
+            self.assertTrue(frame_source.send_current_frame())
+            frame_source.stop()
+
+        msg_type, frame, metadata = messages[-1]
+        self.assertEqual(msg_type, CAMERA_FRAMES_MESSAGE_TYPE)
+        self.assertIsInstance(frame, RawFrame)
+        self.assertEqual(frame.shape, (48, 64, 3))
+        self.assertEqual(frame.encoding, SheldonVisionConstants.FrameEncoding.RawBgr.value)
+        self.assertEqual(decode_frame(frame).size, (64, 48))
+        self.assertEqual(metadata, '1')
+
+    def test_full_hd_frame_decoded_to_plot_size(self):
+        """
+        Test that frames larger than the plot are decoded straight to the plot size and smaller frames are kept as is
+        @return:
+        """
+        full_hd_image = Image.new('RGB', (1920, 1080), (40, 80, 120))
+        full_hd_image.paste((200, 0, 0), (960, 540, 1920, 1080))
+        full_hd_frame = encode_jpeg(full_hd_image)
+
+        image = decode_frame(full_hd_frame, SheldonVisionConstants.PLOT_SIZE)
+        self.assertEqual(image.size, SheldonVisionConstants.PLOT_SIZE)
+        # The bottom right quarter of the frame is the bottom right quarter of the plot, as the layers coordinates are scaled
+        red, green, blue = image.getpixel((3 * SheldonVisionConstants.PLOT_WIDTH // 4, 3 * SheldonVisionConstants.PLOT_HEIGHT // 4))
+        self.assertGreater(red, 150)
+        self.assertLess(blue, 50)
+        self.assertEqual(decode_frame(frame_to_jpeg(full_hd_frame, SheldonVisionConstants.PLOT_SIZE)).size, SheldonVisionConstants.PLOT_SIZE)
+
+        raw_frame = RawFrame(full_hd_image.tobytes(), (1080, 1920, 3))
+        self.assertEqual(decode_frame(raw_frame, SheldonVisionConstants.PLOT_SIZE).size, SheldonVisionConstants.PLOT_SIZE)
+
+        plot_frame = encode_jpeg(Image.new('RGB', SheldonVisionConstants.PLOT_SIZE))
+        self.assertEqual(decode_frame(plot_frame, SheldonVisionConstants.PLOT_SIZE).size, SheldonVisionConstants.PLOT_SIZE)
+        self.assertIs(frame_to_jpeg(plot_frame, SheldonVisionConstants.PLOT_SIZE), plot_frame)
+
+    def test_static_frame_output_reused(self):
+        """
+        Test that a static frame with unchanged metadata reuses the rendered output and a changed frame or metadata doesn't
+        @return:
+        """
+        static_frames = StaticFrameDetector()
+        background_frame = encode_jpeg(Image.new('RGB', (320, 240), (40, 80, 120)))
+        moving_frame = encode_jpeg(Image.new('RGB', (320, 240), (200, 80, 120)))
+        metadata = [{'objects': []}]
+        render_key = (('BoundingBoxLayer',), None, 1.0)
+
+        self.assertIsNone(static_frames.get_output(frame_fingerprint(background_frame), metadata, render_key))
+        static_frames.put_output(frame_fingerprint(background_frame), metadata, render_key, b'rendered')
+        self.assertEqual(static_frames.get_output(frame_fingerprint(encode_jpeg(decode_frame(background_frame))), metadata, render_key),
+                         b'rendered')
+        self.assertIsNone(static_frames.get_output(frame_fingerprint(background_frame), [{'objects': [1]}], render_key))
+        self.assertIsNone(static_frames.get_output(frame_fingerprint(background_frame), metadata, (render_key[0], 40, 1.0)))
+        self.assertIsNone(static_frames.get_output(frame_fingerprint(moving_frame), metadata, render_key))
+        self.assertDictEqual(static_frames.get_stats(), {'frames': 5, 'skipped': 1, 'skip_rate': 0.2})
+
+    def test_layers_display_list_draws_like_layers(self):
+        """
+        Test that drawing all the layers GUI elements with a display list gives the same image as drawing them one by one
+        @return:
+        """
+        rects = [GUIRect(10, 20, 110, 120, SheldonVisionConstants.Color.Red, 5), GUIRect(60, 70, 200, 150, SheldonVisionConstants.Color.Blue, 3)]
+        texts = [GUIText('ID: 1', 10, 5, SheldonVisionConstants.Color.White, 20), GUIText('ID: 2', 60, 150, SheldonVisionConstants.Color.White, 20)]
+        expected_image = Image.new('RGB', (SheldonVisionConstants.PLOT_WIDTH, SheldonVisionConstants.PLOT_HEIGHT))
+        for rect in rects:
+            PlotLayerBase.create_rect_in_pil(expected_image, rect.left, rect.right, rect.top, rect.bottom, rect.color, rect.line_width)
+        for text in texts:
+            PlotLayerBase.create_text_in_pil(expected_image, text.text_message, text.color, font_size=text.font_size, x=text.x, y=text.y)
+
+        display_list = LayersDisplayList()
+        display_list.add_layer_elements(rects, texts)
+        image = display_list.draw(Image.new('RGB', (SheldonVisionConstants.PLOT_WIDTH, SheldonVisionConstants.PLOT_HEIGHT)))
+        self.assertEqual(image.tobytes(), expected_image.tobytes())
+        self.assertIs(get_font(SheldonVisionConstants.Font.Arial, 20), get_font(SheldonVisionConstants.Font.Arial, 20))
+
+    def test_layers_overlay_composited_onto_frame(self):
+        """
+        Test that a cached layers overlay is cropped to the drawn area and composites like drawing on the frame
+        @return:
+        """
+        frame_size = (SheldonVisionConstants.PLOT_WIDTH, SheldonVisionConstants.PLOT_HEIGHT)
+        display_list = LayersDisplayList()
+        display_list.add_layer_elements([GUIRect(100, 50, 300, 200, SheldonVisionConstants.Color.Red, 5)], [])
+        expected_frame = display_list.draw(Image.new('RGB', frame_size, (40, 80, 120)))
+
+        overlay = LayersOverlay(display_list, frame_size)
+        self.assertEqual(overlay.offset, (100, 50))
+        self.assertEqual(overlay.image.size, (201, 151))
+        self.assertLess(len(overlay), frame_size[0] * frame_size[1] * 4)
+        frame = overlay.composite(Image.new('RGB', frame_size, (40, 80, 120)))
+        self.assertEqual(frame.tobytes(), expected_frame.tobytes())
+
+        empty_overlay = LayersOverlay(LayersDisplayList(), frame_size)
+        self.assertIsNone(empty_overlay.image)
+        self.assertEqual(empty_overlay.composite(frame), frame)
+
+    def test_boxes_rasterizer_draws_like_pil(self):
+        """
+        Test that the NumPy boxes rasterizer draws the same pixels as PIL, with overlapping and clipped boxes
+        @return:
+        """
+        frame_size = (SheldonVisionConstants.PLOT_WIDTH, SheldonVisionConstants.PLOT_HEIGHT)
+        rects = [GUIRect(10.7, 20.2, 110.5, 120.9, SheldonVisionConstants.Color.Red, 5),
+                 GUIRect(60, 70, 200, 150, SheldonVisionConstants.Color.Blue, 3),
+                 GUIRect(-30.6, -10, 40, 30, SheldonVisionConstants.Color.Green, 4),
+                 GUIRect(frame_size[0] - 20, frame_size[1] - 20, frame_size[0] + 50, frame_size[1] + 50, SheldonVisionConstants.Color.White, 3)]
+        for mode in ['RGB', 'RGBA']:
+            for frame_rects in [rects, self.__create_random_rects(200, frame_size)]:
+                expected_image = self.__draw_rects_with_pil(Image.new(mode, frame_size), frame_rects)
+                self.assertEqual(draw_rects(Image.new(mode, frame_size), frame_rects).tobytes(), expected_image.tobytes())
+
+        pixels = np.zeros((frame_size[1], frame_size[0], 3), dtype=np.uint8)
+        draw_boxes(pixels, *rects_to_arrays(rects, 'RGB'))
+        self.assertEqual(pixels.tobytes(), self.__draw_rects_with_pil(Image.new('RGB', frame_size), rects).tobytes())
+        self.assertIs(draw_boxes(pixels, *rects_to_arrays([], 'RGB')), pixels)
+
+    def test_boxes_rasterizer_thin_boxes_like_pil(self):
+        """
+        Test that boxes thinner than twice their line width, with integer and float coordinates, are drawn the same as PIL
+        @return:
+        """
+        frame_size = (100, 100)
+        random = np.random.default_rng(0)
+        colors = ['red', 'green', 'blue', 'white', 'yellow', 'orange']
+        for trial in range(300):
+            rects = []
+            for _ in range(int(random.integers(1, 4))):
+                left, top = random.uniform(-10, frame_size[0]), random.uniform(-10, frame_size[1])
+                right, bottom = left + random.uniform(0, 15), top + random.uniform(0, 15)
+                if trial % 2:
+                    left, top, right, bottom = int(left), int(top), int(right), int(bottom)
+                rects.append(GUIRect(left, top, right, bottom, colors[random.integers(len(colors))], int(random.integers(1, 8))))
+            expected_image = self.__draw_rects_with_pil(Image.new('RGB', frame_size), rects)
+            self.assertEqual(draw_rects(Image.new('RGB', frame_size), rects).tobytes(), expected_image.tobytes(), rects)
+
+    def test_layers_shapes_payload_matches_plotly_shapes(self):
+        """
+        Test that the columnar shapes payload expands to the same shapes and annotations as drawing the layers on the server
+        @return:
+        """
+        rects = [GUIRect(10.5, 20.5, 110, 120, SheldonVisionConstants.Color.Red, 3),
+                 GUIRect(60, 70, 200, 150, SheldonVisionConstants.Color.Blue, 5)]
+        texts = [GUIText('ID: 7', 64, 48, SheldonVisionConstants.Color.White, 12, 'left'),
+                 GUIText(3.5, 320, 240, SheldonVisionConstants.Color.Black, 20)]
+        shapes_payload = LayersShapesPayload()
+        shapes_payload.add_layer_elements(rects, texts)
+        self.assertEqual(len(shapes_payload), 4)
+
+        figure = go.Figure()
+        for rect in rects:
+            PlotLayerBase.create_rect_in_plotly(figure, rect.left, rect.right, rect.top, rect.bottom, rect.color, rect.line_width)
+        for text in texts:
+            PlotLayerBase.create_text_in_plotly(figure, text.text_message, color=text.color, font_size=text.font_size, align=text.align,
+                                                x=text.x / SheldonVisionConstants.PLOT_WIDTH, y=1 - text.y / SheldonVisionConstants.PLOT_HEIGHT)
+        shapes, annotations = payload_to_shapes(shapes_payload.to_dict())
+        self.assertListEqual(shapes, [shape.to_plotly_json() for shape in figure.layout.shapes])
+        self.assertListEqual(annotations, [annotation.to_plotly_json() for annotation in figure.layout.annotations])
+        self.assertTupleEqual(payload_to_shapes(LayersShapesPayload().to_dict()), ([], []))
+
+    def test_bounding_box_layer_rects_rasterized(self):
+        """
+        Test that the bounding boxes of a layer are drawn by the rasterizer like drawing them one by one, on both online paths
+        @return:
+        """
+        frame_number = 61
+        frame_size = (SheldonVisionConstants.PLOT_WIDTH, SheldonVisionConstants.PLOT_HEIGHT)
+        meta_data_handler = MetaDataHandler(None, None, None, None, None, mock.MagicMock())
+        meta_data_handler.load_metadata_from_file(self.meta_data_file)
+        layer = BoundingBoxLayer(meta_data_handler)
+        layer.set_frame_data(Image.new('RGB', frame_size, (40, 80, 120)), frame_number)
+        image = layer.add_layers_to_frame(True, MetaDataType.PRIMARY)
+
+        rects, texts = layer.get_all_GUI_elements()[RECTS], layer.get_all_GUI_elements()[TEXT]
+        self.assertGreater(len(rects), 0)
+        expected_image = Image.new('RGB', frame_size, (40, 80, 120))
+        for rect in rects:
+            PlotLayerBase.create_rect_in_pil(expected_image, rect.left, rect.right, rect.top, rect.bottom, rect.color, rect.line_width)
+        for text in texts:
+            PlotLayerBase.create_text_in_pil(expected_image, text.text_message, text.color, font_size=text.font_size, x=text.x, y=text.y)
+        self.assertEqual(image.tobytes(), expected_image.tobytes())
+
+        display_list = LayersDisplayList()
+        layer.set_frame_metadata(frame_number)
+        layer.add_to_display_list(display_list, MetaDataType.PRIMARY)
+        self.assertEqual(display_list.draw(Image.new('RGB', frame_size, (40, 80, 120))).tobytes(), expected_image.tobytes())
+
+    @staticmethod
+    def __draw_rects_with_pil(image: Image.Image, rects: list[GUIRect]) -> Image.Image:
+        draw = ImageDraw.Draw(image)
+        for rect in rects:
+            draw.rectangle([(rect.left, rect.top), (rect.right, rect.bottom)], outline=rect.color, width=rect.line_width)
+        return image
+
+    @staticmethod
+    def __create_random_rects(boxes_count: int, size: tuple[int, int], seed: int = 0) -> list[GUIRect]:
+        random = np.random.default_rng(seed)
+        colors = ['red', 'green', 'blue', 'white', 'yellow', 'orange']
+        rects = []
+        for _ in range(boxes_count):
+            left, top = random.uniform(-0.1, 0.9) * size[0], random.uniform(-0.1, 0.9) * size[1]
+            rect_width, rect_height = random.uniform(10, size[0] / 4), random.uniform(10, size[1] / 4)
+            rects.append(GUIRect(left, top, left + rect_width, top + rect_height, colors[random.integers(len(colors))],
+                                 int(random.integers(1, 6))))
+        return rects
+
+    @unittest.skipUnless(find_spec('cv2'), 'opencv-python is not installed')
+    def test_python_frame_source_in_process(self):
+        """
+        Test that the in process Python frame source answers the player messages with direct calls
+        @return:
+        """
+        import cv2
+
+        frames_count = 20
+        with tempfile.TemporaryDirectory() as video_dir:
+            video_path = os.path.join(video_dir, 'clip.avi')
+            video_writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*'MJPG'), SheldonVisionConstants.DEFAULT_FPS, (64, 48))
+            for frame_index in range(frames_count):
+                video_writer.write(np.full((48, 64, 3), frame_index * 10, np.uint8))
+            video_writer.release()
+
+            self.transport.input_types = self.inputs
+            plugin = SheldonVisionUiPlugin(self.plugin_name, self.inputs, [], self.transport)
+            plugin.attach_frame_source()
+
+            plugin.send_new_load_request(video_path)
+            self.assertEqual(plugin.path_status, SheldonVisionConstants.PathStatus.Valid.value)
+            self.assertTrue(plugin.validate_path())
+            self.assertListEqual(plugin.get_frames_range(), [0, frames_count])
+
+            plugin.send_set_frame_message(4)
+            plugin.send_get_current_frame(5)
+            self.assertEqual(plugin.get_current_frame_number(), 5)
+            self.assertEqual(plugin.send_get_fps(), SheldonVisionConstants.DEFAULT_FPS)
+            plugin.send_stop_message()
+
+    @staticmethod
+    def __write_h264_video(video_path: str, frames_count: int, gop_size: int):
+        import av
+
+        with av.open(video_path, 'w') as container:
+            stream = container.add_stream('libx264', rate=SheldonVisionConstants.DEFAULT_FPS)
+            stream.width, stream.height, stream.pix_fmt = 64, 48, 'yuv420p'
+            stream.options = {'g': str(gop_size), 'bf': '2'}
+            for frame_index in range(frames_count):
+                image = np.full((48, 64, 3), frame_index * 5, np.uint8)
+                for packet in stream.encode(av.VideoFrame.from_ndarray(image, format='bgr24')):
+                    container.mux(packet)
+            for packet in stream.encode():
+                container.mux(packet)
+
+    @unittest.skipUnless(find_spec('av'), 'av is not installed')
+    def test_thumbnail_sprite_cached_by_video_hash(self):
+        """
+        Test that the thumbnail sprite samples every Nth frame into a single sheet and is loaded from the disk cache afterwards
+        @return:
+        """
+        with tempfile.TemporaryDirectory() as video_dir:
+            video_path = os.path.join(video_dir, 'clip.mp4')
+            self.__write_h264_video(video_path, frames_count=45, gop_size=10)
+            thumbnail_sprites = ThumbnailSpriteGenerator(os.path.join(video_dir, 'cache'), max_thumbnails=10, columns=4,
+                                                         thumbnail_width=32)
+            self.assertIsNone(thumbnail_sprites.get_index(video_path))
+
+            index = thumbnail_sprites.generate(video_path)
+            self.assertEqual(index['interval'], 5)
+            self.assertListEqual(index['frames'], list(range(0, 45, 5)))
+            self.assertEqual((index['thumbnail_width'], index['thumbnail_height']), (32, 24))
+            with Image.open(thumbnail_sprites.get_sprite_path(get_video_hash(video_path))) as sprite:
+                self.assertEqual(sprite.size, (4 * 32, 3 * 24))
+            self.assertDictEqual(thumbnail_sprites.get_index(video_path), index)
+            self.assertDictEqual(thumbnail_sprites.generate(video_path), index)
+
+    def test_files_list_returned_from_reply(self):
+        """
+        Test that the blob files list is returned from the reply of its own request, not from a shared attribute
+        @return:
+        """
+        plugin = SheldonVisionUiPlugin(self.plugin_name, self.inputs, [], self.transport)
+        plugin.send_log = mock.MagicMock()
+        plugin.send_message = mock.MagicMock(side_effect=lambda message_type, message, metadata='':
+                                             plugin.on_files_list_on_blob_received(mock.MagicMock(msg=b'clip.mp4 clip.json')))
+        self.assertListEqual(plugin.send_get_files_list('container/folder'), ['clip.mp4', 'clip.json'])
+
+        plugin.send_message = mock.MagicMock()
+        self.assertListEqual(plugin.send_get_files_list('container/other_folder', timeout_seconds=0), [])
+        self.assertListEqual(plugin.files_list_on_blob(), ['clip.mp4', 'clip.json'])
+
+    def test_fps_returned_from_reply(self):
+        """
+        Test that the FPS is returned from the reply of its own request, and the default FPS when no reply is received
+        @return:
+        """
+        plugin = SheldonVisionUiPlugin(self.plugin_name, self.inputs, [], self.transport)
+        plugin.send_log = mock.MagicMock()
+        plugin.send_message = mock.MagicMock(side_effect=lambda message_type, message, metadata='':
+                                             plugin.on_fps_status_received(mock.MagicMock(get_string_message=mock.MagicMock(return_value='25'))))
+        self.assertEqual(plugin.send_get_fps(), 25)
+
+        plugin.send_message = mock.MagicMock()
+        self.assertEqual(plugin.send_get_fps(timeout_seconds=0), SheldonVisionConstants.DEFAULT_FPS)
+
+    def test_reload_same_video_invalidates_frames_cache(self):
+        """
+        Test that loading the same video path again drops its cached frames and keeps the frames of other videos
+        @return:
+        """
+        plugin = SheldonVisionUiPlugin(self.plugin_name, self.inputs, [], self.transport)
+        plugin.send_message = mock.MagicMock()
+        video_path, other_video_path = 'https://storage/clip.mp4', 'https://storage/other_clip.mp4'
+        plugin.set_loaded_video(video_path)
+        plugin.frames_cache.put((video_path, 3), bytes([1, 2, 3]))
+        plugin.frames_cache.put((other_video_path, 3), bytes([4, 5, 6]))
+
+        plugin.send_new_load_request(video_path)
+        self.assertNotIn((video_path, 3), plugin.frames_cache)
+        self.assertIn((other_video_path, 3), plugin.frames_cache)
+        self.assertIsNone(plugin.get_frame_url(3))
+
+    def test_frame_image_served_with_etag(self):
+        """
+        Test that cached frames of the loaded video are encoded once, served by URL with a strong ETag and revalidated
+        without the frame
+        @return:
+        """
+        plugin = SheldonVisionUiPlugin(self.plugin_name, self.inputs, [], self.transport)
+        plugin.set_loaded_video('https://storage/clip.mp4')
+        self.assertIsNone(plugin.get_frame_url(3))
+        plugin.frames_cache.put((plugin.loaded_video_path, 3), RawFrame(bytes(4 * 4 * 3), (4, 4, 3)))
+        frame_url = plugin.get_frame_url(3)
+        self.assertEqual(frame_url, f'/frame/{plugin.loaded_video_id}/3.jpg')
+
+        with mock.patch('PluginSheldonVision.PluginSheldonVisionUi.plugin', plugin):
+            client = server.test_client()
+            response = client.get(frame_url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.mimetype, 'image/jpeg')
+            self.assertIn('immutable', response.headers['Cache-Control'])
+            etag, is_weak = response.get_etag()
+            self.assertFalse(is_weak)
+            with Image.open(io.BytesIO(response.data)) as image:
+                self.assertEqual(image.size, (4, 4))
+
+            self.assertEqual(client.get(frame_url, headers={'If-None-Match': f'"{etag}"'}).status_code, 304)
+            self.assertEqual(client.get('/frame/other-video/3.jpg').status_code, 404)
+            self.assertEqual(client.get(f'/frame/{plugin.loaded_video_id}/4.jpg').status_code, 404)
+
+            # The image is encoded once and still served after its frame is evicted from the frames cache
+            plugin.frames_cache.invalidate_video(plugin.loaded_video_path)
+            with mock.patch('PluginSheldonVision.PluginSheldonVisionUi.frame_to_jpeg') as frame_to_jpeg_mock:
+                self.assertEqual(client.get(frame_url).data, response.data)
+                frame_to_jpeg_mock.assert_not_called()
+
+            # A cached offline figure publishes the image it references again
+            frame_image = plugin.frame_images.get(frame_url)
+            plugin.frame_images.invalidate(lambda key: True)
+            self.assertEqual(client.get(frame_url).status_code, 404)
+            plugin.put_frame_image(frame_url, frame_image)
+            self.assertEqual(client.get(frame_url).data, response.data)
+
+    @unittest.skipUnless(find_spec('av'), 'av is not installed')
+    def test_keyframe_index_random_access(self):
+        """
+        Test that random access seeks to the nearest keyframe and frames within a decoded GOP are served without seeking
+        @return:
+        """
+        frames_count = 45
+        gop_size = 10
+        with tempfile.TemporaryDirectory() as video_dir:
+            video_path = os.path.join(video_dir, 'clip.mp4')
+            self.__write_h264_video(video_path, frames_count, gop_size)
+
+            cache_path = os.path.join(video_dir, 'cache')
+            sequential_reader = KeyframeIndexedVideoReader(cache_path)
+            self.assertTrue(sequential_reader.open(video_path))
+            self.assertEqual(sequential_reader.frames_count, frames_count)
+            self.assertTrue(os.listdir(cache_path)[0].endswith(KEYFRAME_INDEX_SUFFIX))
+            sequential_frames = []
+            while (image := sequential_reader.read()) is not None:
+                sequential_frames.append(image)
+            self.assertEqual(len(sequential_frames), frames_count)
+            self.assertEqual(sequential_reader.seeks_count, 1)
+
+            reader = KeyframeIndexedVideoReader(cache_path)
+            self.assertTrue(reader.open(video_path))
+            self.assertTrue(np.array_equal(reader.get_frame(33), sequential_frames[33]))
+            self.assertEqual(reader.seeks_count, 1)
+            self.assertTrue(np.array_equal(reader.get_frame(31), sequential_frames[31]))
+            self.assertTrue(np.array_equal(reader.get_frame(35), sequential_frames[35]))
+            self.assertEqual(reader.seeks_count, 1)
+            self.assertEqual(reader.gop_hits, 1)
+            self.assertTrue(np.array_equal(reader.get_frame(2), sequential_frames[2]))
+            self.assertEqual(reader.seeks_count, 2)
+            self.assertIsNone(reader.get_frame(frames_count))
+            reader.release()
+            sequential_reader.release()
+
+    def test_frames_ring_buffer_drops_oldest(self):
+        """
+        Test that the frames ring buffer keeps only the newest frames and counts the dropped ones
+        @return:
+        """
+        frames_buffer = FramesRingBuffer(capacity=3)
+        for frame_number in range(1, 6):
+            frames_buffer.put(bytes([frame_number]), frame_number)
+
+        self.assertEqual(len(frames_buffer), 3)
+        self.assertEqual(frames_buffer.dropped_count, 2)
+        self.assertEqual(frames_buffer.enqueued_count, 5)
+        self.assertEqual(frames_buffer.high_water_mark, 3)
+        self.assertIsNone(frames_buffer.get_frame(2))
+        self.assertEqual(frames_buffer.get_frame(4), bytes([4]))
+        self.assertEqual(frames_buffer.get(), (bytes([3]), 3))
+        self.assertIsNone(frames_buffer.get_frame(3))
+        self.assertEqual(frames_buffer.get_latest(), (bytes([5]), 5))
+        self.assertEqual(frames_buffer.skipped_count, 1)
+        self.assertIsNone(frames_buffer.get_frame(4))
+
+    def test_frames_bus_slow_subscriber(self):
+        """
+        Test that every subscriber gets its own copy of the stream and a slow subscriber only drops its own frames
+        @return:
+        """
+        frames_bus = FrameBroadcastBus(subscriber_backlog=2)
+        primary_subscription = frames_bus.subscribe(MetaDataType.PRIMARY.value)
+        secondary_subscription = frames_bus.subscribe(MetaDataType.SECONDARY.value)
+        for frame_number in range(1, 4):
+            frames_bus.publish(bytes([frame_number]), frame_number)
+            self.assertEqual(primary_subscription.get(), (bytes([frame_number]), frame_number))
+
+        self.assertEqual(secondary_subscription.dropped_count, 1)
+        self.assertEqual(secondary_subscription.get(), (bytes([2]), 2))
+        self.assertEqual(secondary_subscription.get(), (bytes([3]), 3))
+        frames_bus.unsubscribe(secondary_subscription)
+        frames_bus.publish(bytes([4]), 4)
+        self.assertEqual(len(secondary_subscription), 0)
+        self.assertEqual(primary_subscription.get(), (bytes([4]), 4))
+
+    def test_pipeline_metrics_histograms(self):
+        """
+        Test that disabled metrics record nothing and enabled metrics are exported as Prometheus histograms and JSON percentiles
+        @return:
+        """
+        metrics = PipelineMetrics()
+        self.assertIsNone(metrics.now())
+        metrics.on_frame_received(1)
+        metrics.on_frame_dequeued(1)
+        self.assertDictEqual(metrics.get_stats()['stages'], {})
+
+        metrics.enabled = True
+        metrics.register_gauge('frames_queue_depth', 'Frames waiting', 'subscriber', lambda: {'Primary-0': 3})
+        for _ in range(10):
+            metrics.observe_since(PipelineStage.DECODE, metrics.now())
+        metrics.observe_layer_since('BoundingBoxLayer', metrics.now() - 0.2)
+        metrics.on_frame_received(2)
+        metrics.on_frame_dequeued(2)
+
+        stats = metrics.get_stats()
+        self.assertEqual(stats['stages'][PipelineStage.DECODE]['count'], 10)
+        self.assertEqual(stats['stages'][PipelineStage.QUEUE_WAIT]['count'], 1)
+        self.assertGreaterEqual(stats['layers']['BoundingBoxLayer']['p99_ms'], 200)
+        self.assertDictEqual(stats['frames_queue_depth'], {'Primary-0': 3})
+
+        prometheus_text = metrics.to_prometheus()
+        self.assertIn(f'sheldon_vision_stage_seconds_count{{stage="{PipelineStage.DECODE}"}} 10', prometheus_text)
+        self.assertIn('sheldon_vision_layer_seconds_bucket{layer="BoundingBoxLayer",le="0.1"} 0', prometheus_text)
+        self.assertIn('sheldon_vision_layer_seconds_bucket{layer="BoundingBoxLayer",le="+Inf"} 1', prometheus_text)
+        self.assertIn('sheldon_vision_frames_queue_depth{subscriber="Primary-0"} 3', prometheus_text)
+
+    def test_render_pipeline_keeps_frames_order(self):
+        """
+        Test that frames are rendered concurrently up to the pipeline depth and returned in the order they were submitted
+        @return:
+        """
+        depth = 4
+        all_renders_started = threading.Barrier(depth, timeout=5)
+
+        def render(frame_number):
+            # Every render waits for all the others, so the pipeline hangs unless the frames are rendered concurrently
+            all_renders_started.wait()
+            return f'frame {frame_number}'
+
+        with ThreadPoolExecutor(max_workers=depth) as executor:
+            render_pipeline = OrderedRenderPipeline(executor, depth)
+            frame_number = 0
+            while not render_pipeline.is_full:
+                render_pipeline.submit(frame_number, render, frame_number)
+                frame_number += 1
+            self.assertEqual(len(render_pipeline), depth)
+            self.assertEqual([render_pipeline.get_next() for _ in range(depth)], [(f'frame {n}', n) for n in range(depth)])
+            self.assertEqual(len(render_pipeline), 0)
+
+            render_pipeline.submit(0, lambda: 1 / 0)
+            with self.assertRaises(ZeroDivisionError):
+                render_pipeline.get_next()
+        self.assertRaises(ValueError, OrderedRenderPipeline, executor, 0)
+
+    def test_take_frame_wakes_every_viewer(self):
+        """
+        Test that two viewers of the same view waiting for a frame are both woken up by a single published frame
+        @return:
+        """
+        subscriptions = [FramesBus.subscribe(MetaDataType.PRIMARY.value) for _ in range(2)]
+        streams = [AdaptiveStreamController(MetaDataType.PRIMARY.value, is_adaptive=False) for _ in subscriptions]
+        taken_frames = [None] * len(subscriptions)
+
+        def take_viewer_frame(viewer_index):
+            taken_frames[viewer_index] = take_frame(subscriptions[viewer_index], streams[viewer_index])
+
+        viewers = [threading.Thread(target=take_viewer_frame, args=(viewer_index,)) for viewer_index in range(len(subscriptions))]
+        for viewer in viewers:
+            viewer.start()
+        FramesBus.publish(bytes([1, 2, 3]), 7)
+        for viewer in viewers:
+            viewer.join(EVENTS_TIMEOUT_SECONDS)
+        for subscription in subscriptions:
+            FramesBus.unsubscribe(subscription)
+        for taken_frame in taken_frames:
+            self.assertIsNotNone(taken_frame)
+            self.assertEqual(taken_frame[:2], (bytes([1, 2, 3]), 7))
+        self.assertIsNone(take_frame(subscriptions[0], streams[0], block=False))
+
+    def test_adaptive_stream_skips_stale_frames(self):
+        """
+        Test that a slow client gets the newest frame and a lower quality, then resolution, and recovers when it keeps up
+        @return:
+        """
+        subscription = FramesBus.subscribe(MetaDataType.PRIMARY.value, backlog=5)
+        for frame_number in range(4):
+            subscription.put(bytes([frame_number]), frame_number)
+        (frame_data, frame_number) = subscription.get_latest()
+        FramesBus.unsubscribe(subscription)
+        self.assertEqual(frame_number, 3)
+        self.assertEqual(subscription.skipped_count, 3)
+        self.assertEqual(len(subscription), 0)
+
+        stream = AdaptiveStreamController(MetaDataType.PRIMARY.value, min_quality=55, max_quality=75, quality_step=10,
+                                          min_scale=0.5, scale_step=0.5, recovery_frames=2)
+        self.assertIsNone(stream.jpeg_quality)
+        for _ in range(3):
+            stream.on_frame_received(skipped_frames=1)
+        self.assertEqual(stream.jpeg_quality, 55)
+        self.assertEqual(stream.scale, 0.5)
+
+        for _ in range(6):
+            stream.on_frame_received(skipped_frames=0)
+        self.assertIsNone(stream.jpeg_quality)
+        self.assertEqual(stream.scale, 1.0)
+
+    def test_frame_socket_message_carries_frame_number(self):
+        """
+        Test that a frame socket message carries the frame number and view with the frame
+        @return:
+        """
+        sent_frame_data = bytes([1, 2, 3])
+        message = pack_frame_message(MetaDataType.SECONDARY, 42, sent_frame_data, received_timestamp=10.5, sent_timestamp=11.0)
+        self.assertEqual(len(message), FRAME_MESSAGE_HEADER.size + len(sent_frame_data))
+
+        header, frame_data = unpack_frame_message(message)
+        self.assertEqual(header.view, MetaDataType.SECONDARY)
+        self.assertEqual(header.frame_number, 42)
+        self.assertEqual(header.received_timestamp, 10.5)
+        self.assertEqual(header.sent_timestamp, 11.0)
+        self.assertEqual(frame_data, sent_frame_data)
+        self.assertRaises(ValueError, unpack_frame_message, b'XXXX' + message[4:])
+
+    def test_frame_cache_lru_eviction(self):
+        """
+        Test that the frame cache evicts the least recently used frames when the memory cap is reached
+        @return:
+        """
+        video_file = "c:\\test.mp4"
+        frame_cache = FrameCache(max_bytes=30)
+        for frame_number in range(1, 4):
+            frame_cache.put((video_file, frame_number), bytes(10))
+        self.assertIsNotNone(frame_cache.get((video_file, 1)))
+        frame_cache.put((video_file, 4), bytes(10))
+
+        self.assertIsNone(frame_cache.get((video_file, 2)))
+        self.assertIsNotNone(frame_cache.get((video_file, 1)))
+        self.assertEqual(frame_cache.size_bytes, 30)
+        self.assertEqual(frame_cache.get_stats()['evictions'], 1)
+        self.assertEqual(frame_cache.get_stats()['hits'], 2)
+        self.assertEqual(frame_cache.get_stats()['misses'], 1)
+        self.assertEqual(frame_cache.invalidate_video(video_file), 3)
+        self.assertEqual(frame_cache.size_bytes, 0)
+
+    def test_frame_prefetcher_plan_follows_direction(self):
+        """
+        Test that the prefetch plan reads ahead in the stepping direction first and stops on the frames range edge
+        @return:
+        """
+        frames_range = [0, 20]
+
+        def get_step_frame_number(frame_number, is_forward):
+            step_frame_number = frame_number + 1 if is_forward else frame_number - 1
+            return step_frame_number if frames_range[0] < step_frame_number < frames_range[1] else None
+
+        frame_prefetcher = FramePrefetcher(mock.MagicMock(), mock.MagicMock(return_value=False), get_step_frame_number,
+                                           frames_ahead=3, frames_behind=1)
+
+        self.assertListEqual(frame_prefetcher.get_prefetch_plan(10, is_forward=True), [11, 12, 13, 9])
+        self.assertListEqual(frame_prefetcher.get_prefetch_plan(10, is_forward=False), [9, 8, 7, 11])
+        self.assertListEqual(frame_prefetcher.get_prefetch_plan(18, is_forward=True), [19, 17])
+
+    def test_plugin_requests_resolved_by_key(self):
+        """
+        Test that a reply resolves only the requests waiting for its key and the oldest request accepting any key
+        @return:
+        """
+        requests_tracker = PluginRequestsTracker()
+        frame_request = requests_tracker.create_request(CAMERA_FRAMES_MESSAGE_TYPE, key=5)
+        first_any_frame_request = requests_tracker.create_request(CAMERA_FRAMES_MESSAGE_TYPE)
+        second_any_frame_request = requests_tracker.create_request(CAMERA_FRAMES_MESSAGE_TYPE)
+
+        resolved_requests = requests_tracker.resolve(CAMERA_FRAMES_MESSAGE_TYPE, 'frame 4', key=4)
+        self.assertListEqual(resolved_requests, [first_any_frame_request])
+        self.assertFalse(frame_request.done())
+
+        requests_tracker.resolve(CAMERA_FRAMES_MESSAGE_TYPE, 'frame 5', key=5)
+        self.assertEqual(requests_tracker.wait(frame_request, 0), 'frame 5')
+        self.assertEqual(requests_tracker.wait(second_any_frame_request, 0), 'frame 5')
+
+        fps_request = requests_tracker.create_request(FPS_STATUS_MESSAGE)
+        self.assertEqual(requests_tracker.wait(fps_request, 0.01, default=-1), -1)
+        self.assertEqual(requests_tracker.timeouts_count, 1)
+        self.assertEqual(requests_tracker.pending_count(), 0)
+
+    def test_message_dispatcher_slow_handler_does_not_block_frames(self):
+        """
+        Test that a slow asynchronous handler doesn't delay inline handlers, that a status stream drops its oldest pending
+        messages when full and that replies are never dropped
+        @return:
+        """
+        handler_started = Event()
+        release_handler = Event()
+        received_frames = []
+
+        def slow_handler(message):
+            handler_started.set()
+            release_handler.wait(EVENTS_TIMEOUT_SECONDS)
+
+        dispatcher = MessageDispatcher(queue_size=1)
+        dispatcher.register(FPS_STATUS_MESSAGE, slow_handler, is_async=True, drop_oldest=True)
+        dispatcher.register(FILES_LIST_IN_BLOB_RESPONSE, slow_handler, is_async=True)
+        dispatcher.register(CAMERA_FRAMES_MESSAGE_TYPE, lambda message: received_frames.append(message.msg))
+
+        dispatcher.dispatch(mock.MagicMock(msg_type=FPS_STATUS_MESSAGE))
+        dispatcher.dispatch(mock.MagicMock(msg_type=FILES_LIST_IN_BLOB_RESPONSE))
+        self.assertTrue(handler_started.wait(EVENTS_TIMEOUT_SECONDS))
+        for _ in range(3):
+            dispatcher.dispatch(mock.MagicMock(msg_type=FPS_STATUS_MESSAGE))
+            dispatcher.dispatch(mock.MagicMock(msg_type=FILES_LIST_IN_BLOB_RESPONSE))
+        dispatcher.dispatch(mock.MagicMock(msg_type=CAMERA_FRAMES_MESSAGE_TYPE, msg=b'frame'))
+        stats = dispatcher.get_stats()
+        release_handler.set()
+        dispatcher.stop()
+
+        self.assertListEqual(received_frames, [b'frame'])
+        self.assertEqual(stats['message_types'][FPS_STATUS_MESSAGE]['received'], 4)
+        self.assertLessEqual(stats['message_types'][FPS_STATUS_MESSAGE]['queued'], 1)
+        # Replies are never dropped, a waiter would only see a timeout
+        self.assertEqual(stats['message_types'][FILES_LIST_IN_BLOB_RESPONSE]['received'], 4)
+        self.assertEqual(stats['message_types'][FILES_LIST_IN_BLOB_RESPONSE]['dropped'], 0)
+        self.assertGreaterEqual(stats['message_types'][FILES_LIST_IN_BLOB_RESPONSE]['queued'], 3)
+        self.assertEqual(stats['message_types'][CAMERA_FRAMES_MESSAGE_TYPE]['handled'], 1)
+        self.assertEqual(stats['transport']['dispatched'], 9)
+
     def test_ui_output_callbacks_on_play_button(self):
         """
         Test that the ui output callbacks are called on play button
@@ -400,6 +1243,102 @@ class SheldonUiPluginUnitTest(unittest.TestCase):
         self.assertFalse(main_sheldon_ui.configurations.get_item(CONFIG_METADATA_FILE_PATH, CONFIG_SECONDARY_SECTION))
         self.assertFalse(main_sheldon_ui.configurations.get_item(CONFIG_LAYERS_LIST, CONFIG_SECONDARY_SECTION))
 
+    @mock.patch('PluginSheldonVision.PluginSheldonVisionUiDashModule.set_app_instance')
+    def test_offline_graph_step_sends_patch(self, set_app):
+        """
+        Test that stepping between frames of an existing offline figure sends only the frame image and layers as a dash.Patch
+        @return:
+        """
+        json_config_path = os.path.abspath(os.path.join(self.configurations_path, 'configuration_single.json'))
+        frames = {1: encode_jpeg(Image.new('RGB', SheldonVisionConstants.PLOT_SIZE, (40, 80, 120))),
+                  2: encode_jpeg(Image.new('RGB', SheldonVisionConstants.PLOT_SIZE, (200, 80, 120)))}
+        displayed_frame_number = [1]
+        main_sheldon_ui = MainSheldonVisionUI(None, lambda: frames[displayed_frame_number[0]], None, None, None,
+                                              lambda: displayed_frame_number[0], None, None, None, None, None, None, None, None, None,
+                                              None, None, None, None, None, None, None, None, None, None, json_config_path, None, None)
+        main_sheldon_ui.previous_video_file_name = 'clip.mp4'
+
+        figure = main_sheldon_ui.create_offline_graph(1, MetaDataType.PRIMARY, as_patch=True)
+        self.assertIsInstance(figure, go.Figure)
+        displayed_frame_number[0] = 2
+        figure_patch = main_sheldon_ui.create_offline_graph(2, MetaDataType.PRIMARY, as_patch=True)
+        self.assertIsInstance(figure_patch, dash.Patch)
+        operations = {tuple(operation['location']): operation['params']['value'] for operation in figure_patch.to_plotly_json()['operations']}
+        self.assertEqual(set(operations), {('data', 0, 'source'), ('layout', 'margin'), ('layout', 'meta'), ('layout', 'shapes'),
+                                           ('layout', 'annotations')})
+        self.assertIn(OVERLAY_META_KEY, operations[('layout', 'meta')])
+        self.assertEqual(operations[('data', 0, 'source')], frame_to_data_uri(frames[2]))
+        self.assertNotEqual(operations[('data', 0, 'source')], figure.data[0].source)
+        self.assertIsInstance(main_sheldon_ui.create_offline_graph(2, MetaDataType.PRIMARY), go.Figure)
+
+    @mock.patch('PluginSheldonVision.PluginSheldonVisionUiDashModule.set_app_instance')
+    def test_offline_figures_cache_keyed_by_frame_and_layers(self, set_app):
+        """
+        Test that stepping back to a rendered frame reuses its figure, until the active layers or the metadata change
+        @return:
+        """
+        json_config_path = os.path.abspath(os.path.join(self.configurations_path, 'configuration_single.json'))
+        frames = {1: encode_jpeg(Image.new('RGB', SheldonVisionConstants.PLOT_SIZE, (40, 80, 120))),
+                  2: encode_jpeg(Image.new('RGB', SheldonVisionConstants.PLOT_SIZE, (200, 80, 120)))}
+        displayed_frame_number = [1]
+        main_sheldon_ui = MainSheldonVisionUI(None, lambda: frames[displayed_frame_number[0]], None, None, None,
+                                              lambda: displayed_frame_number[0], None, None, None, None, None, None, None, None, None,
+                                              None, None, None, None, None, None, None, None, None, None, json_config_path, None, None)
+        main_sheldon_ui.previous_video_file_name = 'clip.mp4'
+        figures_cache = main_sheldon_ui.offline_figures_cache
+        main_sheldon_ui.create_offline_graph(1, MetaDataType.PRIMARY, as_patch=True)
+        self.assertEqual(len(figures_cache), 0)
+
+        figure_patches = {}
+        for frame_number in [2, 1, 2, 1]:
+            displayed_frame_number[0] = frame_number
+            figure_patch = main_sheldon_ui.create_offline_graph(frame_number, MetaDataType.PRIMARY, as_patch=True)
+            self.assertEqual(figure_patches.setdefault(frame_number, figure_patch.to_plotly_json()), figure_patch.to_plotly_json())
+        self.assertEqual((figures_cache.hits, figures_cache.misses), (2, 2))
+        self.assertEqual(main_sheldon_ui.fig[MetaDataType.PRIMARY].data[0].source, frame_to_data_uri(frames[1]))
+
+        first_layer = next(iter(main_sheldon_ui.primary_plot_layer.values()))
+        first_layer.set_layer_state(False)
+        main_sheldon_ui.create_offline_graph(1, MetaDataType.PRIMARY, as_patch=True)
+        self.assertEqual(figures_cache.misses, 3)
+        first_layer.set_layer_state(True)
+        main_sheldon_ui.create_offline_graph(1, MetaDataType.PRIMARY, as_patch=True)
+        self.assertEqual(figures_cache.hits, 3)
+        main_sheldon_ui.meta_data_handler.metadata_version += 1
+        main_sheldon_ui.create_offline_graph(1, MetaDataType.PRIMARY, as_patch=True)
+        self.assertEqual(figures_cache.misses, 4)
+
+    @mock.patch('PluginSheldonVision.PluginSheldonVisionUiDashModule.set_app_instance')
+    def test_offline_views_share_frame_and_render_concurrently(self, set_app):
+        """
+        Test that the primary and secondary views of a step fetch the frame once and are rendered at the same time
+        @return:
+        """
+        json_config_path = os.path.abspath(os.path.join(self.configurations_path, 'configuration.json'))
+        frames = {1: encode_jpeg(Image.new('RGB', SheldonVisionConstants.PLOT_SIZE, (40, 80, 120))),
+                  2: encode_jpeg(Image.new('RGB', SheldonVisionConstants.PLOT_SIZE, (200, 80, 120)))}
+        displayed_frame_number = [1]
+        get_current_frame = mock.MagicMock(side_effect=lambda: frames[displayed_frame_number[0]])
+        main_sheldon_ui = MainSheldonVisionUI(None, get_current_frame, None, None, None,
+                                              lambda: displayed_frame_number[0], None, None, None, None, None, None, None, None, None,
+                                              None, None, None, None, None, None, None, None, None, None, json_config_path, None, None)
+        main_sheldon_ui.previous_video_file_name = 'clip.mp4'
+        offline_views = main_sheldon_ui.create_offline_views(1)
+        self.assertTrue(all(isinstance(offline_graph, go.Figure) for offline_graph, _ in offline_views.values()))
+
+        get_current_frame.reset_mock()
+        displayed_frame_number[0] = 2
+        views_barrier = threading.Barrier(len(MetaDataType))
+        with mock.patch.object(main_sheldon_ui, 'create_meta_data_general',
+                               side_effect=lambda meta_data_type: (views_barrier.wait(5), [])[1]):
+            offline_views = main_sheldon_ui.create_offline_views(2)
+        self.assertEqual(get_current_frame.call_count, 1)
+        self.assertSetEqual(set(offline_views), set(MetaDataType))
+        for offline_graph, metadata_general in offline_views.values():
+            self.assertIsInstance(offline_graph, dash.Patch)
+            self.assertListEqual(metadata_general, [])
+        self.assertFalse(views_barrier.broken)
+
     @mock.patch('PluginSheldonVision.PluginSheldonVisionUiDashModule.set_app_instance')
     def test_configurations_incomplete_layer(self, set_app):
         json_config_path = os.path.abspath(os.path.join(self.configurations_path, 'configuration_incomplete_layer.json'))